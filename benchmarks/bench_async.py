@@ -0,0 +1,101 @@
+"""
+Compare sync (WSGI, thread-per-request) and async (ASGI) summarization throughput.
+
+Both runs go through Django's real request handlers. By default they call
+a local stub LLM server over HTTP (exercising the OpenAI client and its
+connection pool); --backend stub uses the in-process StubBackend instead,
+which isolates the Django layer. The sync run models a WSGI worker with a
+fixed number of threads; the async run drives the ASGI handler from one
+event loop with many requests in flight.
+
+    python -m benchmarks.bench_async --requests 400 --threads 8 --concurrency 200
+    python -m benchmarks.bench_async --backend stub --latency-ms 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import latency_summary, sample_text, setup_django
+from benchmarks.stub_llm import start_stub_server
+
+ENDPOINTS = {
+    'summarize': ('/summarize', '/async/summarize'),
+    'webhook': ('/webhook', '/async/webhook'),
+}
+
+
+def build_payload(endpoint, index):
+    text = sample_text(words=200, seed=index)
+    if endpoint == 'webhook':
+        return {'message': text, 'user_id': f'user_{index}', 'conversation_id': f'conv_{index}'}
+    return {'text': text, 'options': {'length': 'short'}}
+
+
+def run_sync(path, endpoint, total, threads):
+    from django.test import Client
+
+    def one(index):
+        started = time.perf_counter()
+        response = Client().post(path, data=json.dumps(build_payload(endpoint, index)), content_type='application/json')
+        assert response.status_code == 200, response.content
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(one, range(total)))
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+async def run_async(path, endpoint, total, concurrency):
+    from django.test import AsyncClient
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await AsyncClient().post(path, data=json.dumps(build_payload(endpoint, index)), content_type='application/json')
+            assert response.status_code == 200, response.content
+            return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one(index) for index in range(total)))
+    return latency_summary(list(latencies), time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='summarize')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads for the sync run')
+    parser.add_argument('--concurrency', type=int, default=200, help='in-flight requests for the async run')
+    parser.add_argument('--latency-ms', type=float, default=200, help='stub LLM response time')
+    parser.add_argument('--backend', choices=['http', 'stub'], default='http',
+                        help='stub LLM over HTTP, or the in-process stub backend')
+    args = parser.parse_args()
+
+    server = None
+    if args.backend == 'http':
+        server, base_url = start_stub_server(args.latency_ms)
+        setup_django(OPENAI_BASE_URL=base_url)
+    else:
+        setup_django(SUMMARIZER_LLM_BACKEND='stub', SUMMARIZER_STUB_LATENCY_MS=args.latency_ms)
+
+    sync_path, async_path = ENDPOINTS[args.endpoint]
+    results = {
+        'config': vars(args),
+        'sync_wsgi': run_sync(sync_path, args.endpoint, args.requests, args.threads),
+        'async_asgi': asyncio.run(run_async(async_path, args.endpoint, args.requests, args.concurrency)),
+    }
+    if server is not None:
+        server.shutdown()
+
+    results['speedup'] = round(results['async_asgi']['rps'] / results['sync_wsgi']['rps'], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
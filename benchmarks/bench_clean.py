@@ -0,0 +1,106 @@
+"""
+Cost of TextProcessor.clean_text for plain text, light HTML and heavy HTML.
+
+"legacy" is the previous implementation (BeautifulSoup with html.parser on
+every input, then a regex whitespace pass); "current" is clean_text, which
+skips parsing for plain text and strips markup with a linear scanner
+(summarizer.markup) otherwise.
+Both must produce the same text.
+
+    python -m benchmarks.bench_clean --sizes 10000 1000000 10000000
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+
+from bs4 import BeautifulSoup
+
+from benchmarks.bench_extractive import synthetic_document
+from summarizer.utils import TextProcessor
+
+TAGS = ('p', 'div', 'span', 'b', 'i', 'a', 'li', 'td', 'em', 'strong', 'code')
+ENTITIES = ('&amp;', '&lt;', '&gt;', '&quot;', '&nbsp;', '&#8212;')
+
+
+def legacy_clean_text(text):
+    text = BeautifulSoup(text, 'html.parser').get_text()
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def plain_document(size, seed=0):
+    return synthetic_document(size // 7 + 1, seed=seed)[:size]
+
+
+def light_html(size, seed=0):
+    """Paragraph tags and the odd link, like a pasted article"""
+    rng = random.Random(seed)
+    sentences = plain_document(size, seed).split('. ')
+    parts = []
+    for sentence in sentences:
+        if rng.random() < 0.1:
+            sentence = f'<a href="https://example.com/{rng.randint(1, 999)}">{sentence}</a>'
+        parts.append(f'<p>{sentence}.</p>\n')
+    return ''.join(parts)[:size]
+
+
+def heavy_html(size, seed=0):
+    """Nested markup, attributes, entities, scripts and comments around every few words"""
+    rng = random.Random(seed)
+    words = plain_document(size, seed).split()
+    parts = ['<!DOCTYPE html><html><head><style>p { margin: 0 }</style></head><body>']
+    length = len(parts[0])
+    index = 0
+    while index < len(words) and length < size:
+        tag = rng.choice(TAGS)
+        chunk = ' '.join(words[index:index + rng.randint(1, 6)])
+        index += len(chunk.split())
+        row = f'<div class="row"><{tag} class="c{rng.randint(1, 9)}" data-id="{index}">{chunk}</{tag}>'
+        if rng.random() < 0.3:
+            row += rng.choice(ENTITIES)
+        if rng.random() < 0.02:
+            row += '<script>window.track && track("view");</script><!-- ad slot -->'
+        row += '</div>\n'
+        parts.append(row)
+        length += len(row)
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def measure(fn, text, repeat):
+    timings_ms = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        timings_ms.append((time.perf_counter() - started) * 1000)
+    return round(min(timings_ms), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 1000000, 10000000], help='input sizes in characters')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        for kind, build in (('plain', plain_document), ('light_html', light_html), ('heavy_html', heavy_html)):
+            text = build(size, seed=size)
+            assert legacy_clean_text(text) == TextProcessor.clean_text(text), kind
+            legacy_ms = measure(legacy_clean_text, text, args.repeat)
+            current_ms = measure(TextProcessor.clean_text, text, args.repeat)
+            results.append({
+                'input': kind,
+                'chars': len(text),
+                'legacy_ms': legacy_ms,
+                'current_ms': current_ms,
+                'speedup': round(legacy_ms / current_ms, 1) if current_ms else None,
+            })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Latency of the extractive summarizer against document size.
+
+Documents are synthetic prose with a Zipf-like vocabulary, so term overlap
+between sentences (and therefore the similarity graph) looks like real text.
+Each size is summarized several times and the percentiles are reported,
+alongside the old first-N-sentences baseline and the machine they were
+measured on.
+
+    python -m benchmarks.bench_extractive --sizes 1000 5000 20000 100000
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks.common import machine, percentile
+from summarizer.extractive import ExtractiveSummarizer, split_sentences
+
+
+def synthetic_document(words, seed=0, vocabulary_size=5000):
+    """Sentences of 8-30 words drawn from a Zipf-distributed vocabulary"""
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    vocabulary = [''.join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(vocabulary_size)]
+    weights = [1 / rank for rank in range(1, vocabulary_size + 1)]
+
+    sentences = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 30))
+        sentence = ' '.join(rng.choices(vocabulary, weights, k=length))
+        sentences.append(sentence[0].upper() + sentence[1:] + '.')
+        remaining -= length
+    return ' '.join(sentences)
+
+
+def time_runs(fn, repeat):
+    latencies_ms = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+    return {
+        'p50_ms': round(percentile(latencies_ms, 50), 2),
+        'p95_ms': round(percentile(latencies_ms, 95), 2),
+        'max_ms': round(max(latencies_ms), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000, 100000], help='document sizes in words')
+    parser.add_argument('--sentences', type=int, default=5, help='sentences to extract')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    summarizer = ExtractiveSummarizer()
+    # First call pays for NumPy/BLAS initialisation
+    summarizer.summarize(synthetic_document(500), args.sentences)
+
+    results = []
+    for words in args.sizes:
+        text = synthetic_document(words, seed=words)
+        results.append({
+            'words': words,
+            'sentences': len(split_sentences(text)),
+            'extractive': time_runs(lambda: summarizer.summarize(text, args.sentences), args.repeat),
+            'lead': time_runs(lambda: text.split('. ')[:args.sentences], args.repeat),
+        })
+
+    print(json.dumps({'machine': machine(), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Time, peak allocation and output size of the log digest for large logs.
+
+The synthetic log mixes access, cache, slow-query and job-failure lines with
+UUIDs, hex IDs, IPs and stack traces, plus one burst of connection timeouts.
+"prompt_tokens" compares the estimated size of what the LLM would be sent
+without and with the digest.
+
+    python -m benchmarks.bench_logdigest --lines 10000 100000 500000
+"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from summarizer.logdigest import build_log_digest
+from summarizer.utils import TextProcessor
+
+
+def synthetic_log(lines, seed=7):
+    rng = random.Random(seed)
+    users = ['alice', 'bob', 'carol', 'dave', 'erin']
+    burst = range(lines * 2 // 5, lines * 2 // 5 + 300)
+    out = []
+    clock = 0
+    for number in range(lines):
+        clock += rng.randint(0, 3)
+        stamp = '2024-03-%02dT%02d:%02d:%02d.%03dZ' % (
+            1 + clock // 86400, clock // 3600 % 24, clock // 60 % 60, clock % 60, rng.randint(0, 999)
+        )
+        roll = rng.random()
+        if number in burst and roll < 0.7:
+            out.append(
+                f"{stamp} ERROR db-pool Connection to 10.0.{rng.randint(0, 9)}.{rng.randint(1, 254)}:5432 "
+                f"timed out after {rng.randint(1000, 5000)}ms (attempt {rng.randint(1, 3)})"
+            )
+        elif roll < 0.55:
+            out.append(f"{stamp} INFO api GET /api/items/{rng.randint(1, 99999)} 200 {rng.randint(1, 900)}ms user={rng.choice(users)}")
+        elif roll < 0.8:
+            out.append(f"{stamp} INFO api POST /api/orders 201 {rng.randint(5, 1500)}ms order_id={rng.getrandbits(64):016x}")
+        elif roll < 0.9:
+            out.append(f"{stamp} DEBUG cache hit key=item:{rng.randint(1, 99999)} ttl={rng.randint(1, 600)}")
+        elif roll < 0.97:
+            out.append(f"{stamp} WARN api Slow query took {rng.randint(1000, 9000)}ms on table {rng.choice(['orders', 'items', 'users'])}")
+        elif roll < 0.995:
+            job = '%08x-%04x-4%03x-a%03x-%012x' % tuple(rng.getrandbits(bits) for bits in (32, 16, 12, 12, 48))
+            out.append(f"{stamp} ERROR worker Job {job} failed: KeyError: 'customer'")
+        else:
+            out.append(f"{stamp} ERROR worker Traceback (most recent call last):")
+            out.append(f"  File \"/app/worker.py\", line {rng.randint(10, 500)}, in run")
+            out.append("    result = handler(payload)")
+    return '\n'.join(out) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, nargs='+', default=[10000, 100000], help='log sizes in lines')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for lines in args.lines:
+        text = synthetic_log(lines, seed=lines)
+        timings_ms = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            digest, stats = build_log_digest(text)
+            timings_ms.append((time.perf_counter() - started) * 1000)
+
+        tracemalloc.start()
+        build_log_digest(text)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results.append({
+            'lines': lines,
+            'log_mb': round(len(text) / 1e6, 2),
+            'best_ms': round(min(timings_ms), 2),
+            'peak_alloc_mb': round(peak / 1e6, 2),
+            'digest': stats,
+            'prompt_tokens': {
+                'raw': TextProcessor.estimate_tokens(TextProcessor.clean_text(text)),
+                'digest': TextProcessor.estimate_tokens(digest),
+            },
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Micro-benchmarks for the text helpers on the request path.
+
+Times TextProcessor, TextStats, TextChunker and ContentValidator on plain
+text and HTML at several sizes, and records the peak Python allocation of
+one call. Every record has a unique "name" so runs can be compared with
+benchmarks.compare.
+
+    python -m benchmarks.bench_micro --sizes 1000 100000 1000000 --output micro.json
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from benchmarks.bench_clean import heavy_html, plain_document
+from benchmarks.common import percentile
+
+
+def _label(size):
+    for unit, scale in (('MB', 1000000), ('KB', 1000)):
+        if size >= scale:
+            return f'{size // scale}{unit}'
+    return f'{size}B'
+
+
+def cases(size):
+    """(name, callable) pairs for one input size"""
+    from summarizer.utils import ContentValidator, TextChunker, TextProcessor, TextStats
+
+    plain = plain_document(size, seed=size)
+    html = heavy_html(size, seed=size)
+    cleaned = TextProcessor.clean_text(html)
+    chunker = TextChunker(max_tokens=3000, overlap_tokens=200)
+    label = _label(size)
+
+    return [
+        (f'clean_text.plain.{label}', lambda: TextProcessor.clean_text(plain)),
+        (f'clean_text.html.{label}', lambda: TextProcessor.clean_text(html)),
+        (f'text_stats.{label}', lambda: TextStats(cleaned)),
+        (f'extract_key_phrases.{label}', lambda: TextProcessor.extract_key_phrases(cleaned)),
+        (f'estimate_reading_time.{label}', lambda: TextProcessor.estimate_reading_time(cleaned)),
+        (f'calculate_compression_ratio.{label}', lambda: TextProcessor.calculate_compression_ratio(cleaned, cleaned[:500])),
+        (f'validate_text_length.{label}', lambda: ContentValidator.validate_text_length(cleaned)),
+        (f'is_url.{label}', lambda: ContentValidator.is_url(plain)),
+        (f'chunker_split.{label}', lambda: chunker.split(cleaned)),
+    ]
+
+
+def measure(fn, repeat):
+    timings_ms = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings_ms.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'best_ms': round(min(timings_ms), 3),
+        'p50_ms': round(percentile(timings_ms, 50), 3),
+        'peak_alloc_mb': round(peak / 1e6, 3),
+    }
+
+
+def run(sizes, repeat):
+    results = []
+    for size in sizes:
+        for name, fn in cases(size):
+            results.append(dict(measure(fn, repeat), name=f'micro.{name}', chars=size))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000], help='input sizes in characters')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write JSON results to this file as well as stdout')
+    args = parser.parse_args()
+
+    from benchmarks.common import setup_django
+    setup_django()
+    results = run(args.sizes, args.repeat)
+
+    data = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(data)
+    print(data)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Time and peak allocation of the result statistics for large inputs.
+
+"legacy" reproduces the previous per-statistic helpers, each of which split
+the whole text again (validation, word count, compression ratio, reading
+time, key phrases). "textstats" is the single-pass TextStats used by
+SummarizerService now.
+
+    python -m benchmarks.bench_textstats --sizes 100000 1000000 10000000
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections import Counter
+
+from benchmarks.bench_extractive import synthetic_document
+from summarizer.utils import KEY_PHRASE_STOP_WORDS, TextStats
+
+SUMMARY = ' '.join(['summary'] * 150)
+
+
+def legacy_statistics(text, summary=SUMMARY):
+    if len(text.split()) < 10:
+        raise ValueError('too short')
+    word_count_original = len(text.split())
+    word_count_summary = len(summary.split())
+    compression_ratio = round((1 - (len(summary.split()) / len(text.split()))) * 100, 2)
+    reading_time = max(1, round(len(text.split()) / 200))
+    words = text.lower().split()
+    meaningful_words = [word for word in words if word not in KEY_PHRASE_STOP_WORDS and len(word) > 3]
+    key_phrases = [phrase for phrase, count in Counter(meaningful_words).most_common(5)]
+    return word_count_original, word_count_summary, compression_ratio, reading_time, key_phrases
+
+
+def textstats_statistics(text, summary=SUMMARY):
+    stats = TextStats(text)
+    if stats.word_count < 10:
+        raise ValueError('too short')
+    summary_stats = TextStats(summary)
+    return (
+        stats.word_count, summary_stats.word_count, stats.compression_ratio(summary_stats),
+        stats.reading_time(), stats.key_phrases()
+    )
+
+
+def measure(fn, text, repeat):
+    timings_ms = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        timings_ms.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    fn(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'best_ms': round(min(timings_ms), 2), 'peak_alloc_mb': round(peak / 1e6, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000, 10000000], help='input sizes in characters')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        # Build about the right number of characters (~7.5 per word)
+        text = synthetic_document(size // 7 + 1, seed=size)[:size]
+        assert legacy_statistics(text) == textstats_statistics(text)
+        legacy = measure(legacy_statistics, text, args.repeat)
+        single_pass = measure(textstats_statistics, text, args.repeat)
+        results.append({
+            'chars': len(text),
+            'legacy': legacy,
+            'textstats': single_pass,
+            'speedup': round(legacy['best_ms'] / single_pass['best_ms'], 2) if single_pass['best_ms'] else None,
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
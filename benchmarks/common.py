@@ -0,0 +1,73 @@
+"""Helpers shared by the benchmark scripts"""
+
+import math
+import os
+import platform
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(**environ):
+    """Configure Django with the benchmark settings and create a fresh database"""
+    sys.path.insert(0, str(BASE_DIR))
+    for key, value in environ.items():
+        os.environ[key] = str(value)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    django.setup()
+    db_path = Path(settings.DATABASES['default']['NAME'])
+    if db_path.exists():
+        db_path.unlink()
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+def machine():
+    """What the numbers were measured on, since latencies only compare on the same hardware"""
+    cpu = platform.processor()
+    try:
+        with open('/proc/cpuinfo') as f:
+            cpu = next((line.split(':', 1)[1].strip() for line in f if line.startswith('model name')), cpu)
+    except OSError:
+        pass
+    return {
+        'cpu': cpu or platform.machine(),
+        'cpus': os.cpu_count(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+    }
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies_ms, elapsed_s):
+    """Throughput and latency percentiles for one benchmark run"""
+    return {
+        'requests': len(latencies_ms),
+        'elapsed_s': round(elapsed_s, 3),
+        'rps': round(len(latencies_ms) / elapsed_s, 2) if elapsed_s else 0.0,
+        'p50_ms': round(percentile(latencies_ms, 50), 2),
+        'p95_ms': round(percentile(latencies_ms, 95), 2),
+        'p99_ms': round(percentile(latencies_ms, 99), 2),
+    }
+
+
+def sample_text(words=200, seed=0):
+    """Deterministic filler text that passes ContentValidator"""
+    vocabulary = (
+        'the service processed requests from users across regions while the team '
+        'reviewed latency budgets deployment plans database growth and incident notes'
+    ).split()
+    return ' '.join(vocabulary[(seed + i * 7) % len(vocabulary)] for i in range(words)) + '.'
@@ -0,0 +1,74 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Takes the JSON written by benchmarks.suite, benchmarks.loadgen or
+benchmarks.bench_micro (records keyed by "name"), prints the change of
+every shared metric and exits with status 1 when any of them got worse by
+more than --threshold percent, so it can gate CI.
+
+    python -m benchmarks.compare baseline.json current.json --threshold 10
+"""
+
+import argparse
+import json
+import sys
+
+# Metrics where a larger value is worse; rps is the one where smaller is worse
+LOWER_IS_BETTER = ('best_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'errors', 'peak_rss_mb', 'rss_growth_mb', 'peak_alloc_mb')
+HIGHER_IS_BETTER = ('rps',)
+
+# Below these absolute values, changes are timer and allocator noise
+NOISE_FLOOR = {'best_ms': 0.05, 'p50_ms': 0.05, 'peak_alloc_mb': 0.05}
+
+
+def load_results(path):
+    with open(path) as f:
+        data = json.load(f)
+    records = data['results'] if isinstance(data, dict) else data
+    return {record['name']: record for record in records}
+
+
+def compare(baseline, current, threshold):
+    """Rows of (name, metric, before, after, change_pct, regressed)"""
+    rows = []
+    for name in sorted(baseline.keys() & current.keys()):
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            before = baseline[name].get(metric)
+            after = current[name].get(metric)
+            if before is None or after is None:
+                continue
+            if before == 0:
+                change = 0.0 if after == 0 else float('inf')
+            else:
+                change = (after - before) / before * 100
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            regressed = worse > threshold and max(before, after) > NOISE_FLOOR.get(metric, 0)
+            rows.append((name, metric, before, after, round(change, 1), regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed change in percent before a metric counts as regressed')
+    parser.add_argument('--all', action='store_true', help='print every metric, not only regressions')
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline)
+    current = load_results(args.current)
+    rows = compare(baseline, current, args.threshold)
+
+    regressions = [row for row in rows if row[5]]
+    for name, metric, before, after, change, regressed in (rows if args.all else regressions):
+        flag = 'REGRESSION' if regressed else ''
+        print(f'{name:45} {metric:14} {before:>12} -> {after:<12} {change:+7.1f}% {flag}')
+
+    for name in sorted(baseline.keys() - current.keys()):
+        print(f'{name:45} missing from {args.current}')
+    print(f'{len(regressions)} regression(s) in {len(rows)} metrics (threshold {args.threshold}%)')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+End-to-end load generator for /webhook, /summarize and /quick-summarize.
+
+Replays the texts of a JSONL file (one request per line; the "text",
+"message" or "title"/"body" fields are used; benchmarks/corpus.jsonl by
+default) against each endpoint at a fixed concurrency and reports
+p50/p95/p99 latency, requests per second, error count and memory per
+endpoint. Memory is sampled from /proc/self/statm while the endpoint runs
+(Linux only): peak_rss_mb is the highest resident size seen and
+rss_growth_mb how far above the size at the start of the run it went, so
+an endpoint is not charged for what the ones before it used.
+
+By default requests go through Django's handlers in this process with the
+stub LLM backend (SUMMARIZER_LLM_BACKEND=stub), so the numbers cover the
+whole service except the network and the model. --url sends them to a
+running server instead; memory is then the client's only.
+
+    python -m benchmarks.loadgen --requests 200 --concurrency 8 --output load.json
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --endpoints summarize
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import BASE_DIR, latency_summary, setup_django
+
+CORPUS = BASE_DIR / 'benchmarks' / 'corpus.jsonl'
+
+ENDPOINTS = {
+    'webhook': '/webhook',
+    'summarize': '/summarize',
+    'quick-summarize': '/quick-summarize',
+}
+
+
+def load_texts(path):
+    """Texts to replay, one per JSONL line"""
+    texts = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            text = entry.get('text') or entry.get('message') or '\n\n'.join(
+                part for part in (entry.get('title'), entry.get('body')) if part
+            )
+            if text:
+                texts.append(text)
+    if not texts:
+        raise SystemExit(f'No request texts in {path}')
+    return texts
+
+
+def build_payload(endpoint, text, index):
+    if endpoint == 'webhook':
+        return {'message': text, 'user_id': f'load_{index}', 'conversation_id': f'load_conv_{index % 16}'}
+    if endpoint == 'summarize':
+        return {'text': text, 'options': {'length': 'short'}}
+    return {'text': text}
+
+
+def rss_mb():
+    """Resident set size of this process now, or None where /proc/self/statm does not exist"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+class RssSampler:
+    """Highest resident set size seen while the block runs, sampled on a background thread"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start_mb = None
+        self.peak_mb = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = rss_mb()
+        if self.start_mb is not None:
+            self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._sample()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        current = rss_mb()
+        if current is not None and current > self.peak_mb:
+            self.peak_mb = current
+
+
+def in_process_sender():
+    from django.test import Client
+
+    local = threading.local()
+
+    def send(path, payload):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        return local.client.post(path, data=json.dumps(payload), content_type='application/json').status_code
+
+    return send
+
+
+def http_sender(base_url, concurrency):
+    import httpx
+
+    client = httpx.Client(
+        base_url=base_url,
+        timeout=120,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    )
+
+    def send(path, payload):
+        return client.post(path, json=payload).status_code
+
+    return send
+
+
+def run_endpoint(send, endpoint, texts, total, concurrency, distinct, warmup):
+    path = ENDPOINTS[endpoint]
+    errors = []
+
+    # Untimed requests first, so lazy imports and first connections are not measured
+    for index in range(warmup):
+        send(path, build_payload(endpoint, texts[index % len(texts)], index))
+
+    def one(index):
+        text = texts[index % len(texts)]
+        if distinct:
+            # A unique suffix defeats the summary cache and request coalescing
+            text = f'{text}\n\nRequest {index}.'
+        started = time.perf_counter()
+        status = send(path, build_payload(endpoint, text, index))
+        if status >= 400:
+            errors.append(status)
+        return (time.perf_counter() - started) * 1000
+
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one, range(total)))
+        elapsed = time.perf_counter() - started
+    result = dict(latency_summary(latencies, elapsed), name=f'load.{endpoint}')
+    result['errors'] = len(errors)
+    if rss.start_mb is not None:
+        result['peak_rss_mb'] = round(rss.peak_mb, 1)
+        result['rss_growth_mb'] = round(rss.peak_mb - rss.start_mb, 1)
+    if tracemalloc.is_tracing():
+        result['peak_alloc_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+    return result
+
+
+def run(endpoints, texts, total, concurrency, url=None, distinct=False, warmup=5):
+    send = http_sender(url, concurrency) if url else in_process_sender()
+    return [run_endpoint(send, endpoint, texts, total, concurrency, distinct, warmup) for endpoint in endpoints]
+
+
+def add_arguments(parser):
+    parser.add_argument('--requests-file', default=str(CORPUS), help='JSONL file of requests to replay')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=50, help='stub LLM response time (in-process only)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of failing stub LLM calls (in-process only)')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per endpoint before measuring')
+    parser.add_argument('--distinct', action='store_true', help='make every request text unique')
+    parser.add_argument('--url', help='base URL of a running server instead of in-process requests')
+    parser.add_argument('--tracemalloc', action='store_true', help='also report peak Python allocation (slows requests)')
+
+
+def setup(args):
+    """Configure Django for an in-process run (not needed against --url)"""
+    if not args.url:
+        setup_django(
+            SUMMARIZER_LLM_BACKEND='stub',
+            SUMMARIZER_STUB_LATENCY_MS=args.latency_ms,
+            SUMMARIZER_STUB_ERROR_RATE=args.error_rate,
+        )
+    if args.tracemalloc:
+        tracemalloc.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument('--output', help='write JSON results to this file as well as stdout')
+    args = parser.parse_args()
+
+    setup(args)
+    results = run(args.endpoints, load_texts(args.requests_file), args.requests, args.concurrency, args.url, args.distinct, args.warmup)
+
+    data = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(data)
+    print(data)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Django settings for running benchmarks offline.
+
+Uses a throwaway SQLite database and never talks to the real OpenAI API.
+"""
+
+import os
+import tempfile
+
+from summarizer_agent.settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(tempfile.gettempdir(), 'summarizer_benchmark.sqlite3'),
+        # SQLITE_WAL / SQLITE_BUSY_TIMEOUT as configured for the app
+        'OPTIONS': DATABASES['default']['OPTIONS'],  # noqa: F405
+    }
+}
+
+# Create the app's tables with syncdb instead of migrations
+MIGRATION_MODULES = {'summarizer': None}
+
+OPENAI_API_KEY = 'benchmark'
+
+# Every request should reach the (stub) LLM unless a benchmark says otherwise
+SUMMARIZER_CACHE_BACKEND = os.environ.get('SUMMARIZER_CACHE_BACKEND', 'none')
+SUMMARIZER_NEAR_DUPLICATE = os.environ.get('SUMMARIZER_NEAR_DUPLICATE', 'False') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'root': {'level': 'CRITICAL'},
+}
@@ -0,0 +1,143 @@
+"""
+Local stand-in for the OpenAI chat-completions API.
+
+Answers POST .../chat/completions after a configurable delay with a
+deterministic "summary" (the first words of the prompt), so the Django
+layer can be load-tested without network noise or API costs. Requests
+with "stream": true are answered as an SSE token stream.
+
+    python -m benchmarks.stub_llm --port 8900 --latency-ms 200
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 python manage.py runserver
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency_s = 0.2
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        prompt = payload.get('messages', [{}])[-1].get('content', '')
+        words = prompt.split()
+        content = ' '.join(words[:40]) or 'Empty input.'
+
+        if payload.get('stream'):
+            self._stream(payload, content)
+            return
+
+        time.sleep(self.latency_s)
+        self._send_json(200, {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': self._usage(payload, words[:40]),
+        })
+
+    @staticmethod
+    def _usage(payload, completion_words):
+        """Word counts stand in for token counts"""
+        prompt_tokens = sum(len(message.get('content', '').split()) for message in payload.get('messages', []))
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': len(completion_words),
+            'total_tokens': prompt_tokens + len(completion_words),
+        }
+
+    def _stream(self, payload, content):
+        """Send the completion as SSE chunks; the first token arrives after a quarter of the latency"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        tokens = [word + ' ' for word in content.split()]
+        time.sleep(self.latency_s / 4)
+        pause = (self.latency_s * 3 / 4) / max(1, len(tokens))
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(pause)
+            chunk = {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': payload.get('model', 'stub'),
+                'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}],
+            }
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+        if (payload.get('stream_options') or {}).get('include_usage'):
+            chunk = {
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': payload.get('model', 'stub'),
+                'choices': [],
+                'usage': self._usage(payload, tokens),
+            }
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Benchmarks open hundreds of connections at once
+    request_queue_size = 1024
+
+
+def start_stub_server(latency_ms=200, host='127.0.0.1', port=0):
+    """Start the stub in a background thread and return (server, base_url)"""
+    handler = type('ConfiguredStubLLMHandler', (StubLLMHandler,), {'latency_s': latency_ms / 1000})
+    server = StubLLMServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_address[1]}/v1'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=200)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.latency_ms, args.host, args.port)
+    print(f'Stub LLM listening on {base_url} ({args.latency_ms} ms latency)')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
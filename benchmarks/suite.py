@@ -0,0 +1,65 @@
+"""
+Run the micro-benchmarks and the load generator and save one result file.
+
+The output holds the git commit, the configuration and one record per
+benchmark, so two runs can be compared with benchmarks.compare:
+
+    python -m benchmarks.suite --output before.json
+    # ... change the code ...
+    python -m benchmarks.suite --output after.json
+    python -m benchmarks.compare before.json after.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+
+from benchmarks import bench_micro, loadgen
+from benchmarks.common import BASE_DIR, machine
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    loadgen.add_arguments(parser)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000], help='micro-benchmark input sizes in characters')
+    parser.add_argument('--repeat', type=int, default=5, help='micro-benchmark repetitions')
+    parser.add_argument('--skip-micro', action='store_true')
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--output', default='benchmark-results.json')
+    args = parser.parse_args()
+
+    loadgen.setup(args)
+    results = []
+    if not args.skip_micro:
+        results += bench_micro.run(args.sizes, args.repeat)
+    if not args.skip_load:
+        texts = loadgen.load_texts(args.requests_file)
+        results += loadgen.run(args.endpoints, texts, args.requests, args.concurrency, args.url, args.distinct, args.warmup)
+
+    data = {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'machine': machine(),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(data, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f'Saved {len(results)} results to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
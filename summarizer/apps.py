@@ -1,6 +1,32 @@
+import logging
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+logger = logging.getLogger(__name__)
 
 
 class SummarizerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'summarizer'
+
+    def ready(self):
+        from .models import SummaryTemplate
+        from .prompt_registry import invalidate_prompt_templates
+
+        # Edited prompt templates are picked up without a restart
+        post_save.connect(invalidate_prompt_templates, sender=SummaryTemplate, dispatch_uid='summarizer-template-saved')
+        post_delete.connect(invalidate_prompt_templates, sender=SummaryTemplate, dispatch_uid='summarizer-template-deleted')
+
+        if getattr(settings, 'SUMMARIZER_WARM_ON_STARTUP', False):
+            self.warm()
+
+    @staticmethod
+    def warm():
+        """Create the shared service and its LLM backend (pooled OpenAI client) ahead of the first request"""
+        from .services import get_summarizer_service
+
+        try:
+            get_summarizer_service().backend.warm()
+        except Exception as e:
+            logger.warning(f"Could not warm summarizer service: {str(e)}")
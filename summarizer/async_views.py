@@ -0,0 +1,221 @@
+import json
+import logging
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from .jobs import enqueue_job
+from .serializers import BackgroundJobSerializer, WebhookSerializer, SummaryOptionsSerializer
+from .offload import OffloadBusy
+from .services import QuickSummarizer, get_summarizer_service, summary_kwargs
+from .views import get_help_message, _busy, _job_accepted, _max_bullets
+
+logger = logging.getLogger(__name__)
+
+# Native async counterparts of the DRF views, for deployment under ASGI
+# (e.g. `uvicorn summarizer_agent.asgi:application`). The worker's event loop
+# stays free while the OpenAI call is in flight.
+
+
+def _json_body(request):
+    """Decode a JSON request body, returning None if it is not a JSON object"""
+    try:
+        data = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@csrf_exempt
+@require_POST
+async def telex_webhook(request):
+    """Async Telex.im webhook endpoint"""
+    try:
+        data = _json_body(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+        serializer = WebhookSerializer(data=data)
+        # Validating a callback_url resolves its host, which must not block the loop
+        valid = await sync_to_async(serializer.is_valid)() if data.get('callback_url') else serializer.is_valid()
+        if not valid:
+            return JsonResponse({
+                "error": "Invalid request data",
+                "details": serializer.errors
+            }, status=400)
+
+        message = serializer.validated_data['message']
+        user_id = serializer.validated_data['user_id']
+        conversation_id = serializer.validated_data['conversation_id']
+        options = serializer.validated_data.get('options', {})
+
+        logger.info(f"Received summarization request from user {user_id}")
+
+        if message.strip().lower() in ['/help', 'help']:
+            return JsonResponse({
+                "response": get_help_message(),
+                "status": "success"
+            })
+
+        # Queue the work and acknowledge immediately if asked to
+        if serializer.validated_data['background']:
+            job = await sync_to_async(enqueue_job)('webhook', {
+                'message': message,
+                'user_id': user_id,
+                'conversation_id': conversation_id,
+                'options': options,
+            }, callback_url=serializer.validated_data.get('callback_url'))
+            return JsonResponse(_job_accepted(request, job), status=202)
+
+        summarizer = get_summarizer_service()
+        response = await summarizer.aprocess_telex_message(message, user_id, conversation_id, options)
+
+        return JsonResponse({
+            "response": response,
+            "status": "success",
+            "user_id": user_id,
+            "conversation_id": conversation_id
+        })
+
+    except Exception as e:
+        logger.error(f"Error processing webhook: {str(e)}")
+        return JsonResponse({
+            "error": "Internal server error",
+            "details": str(e)
+        }, status=500)
+
+
+@csrf_exempt
+@require_POST
+async def custom_summarize(request):
+    """Async custom summarization endpoint with options"""
+    try:
+        data = _json_body(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+        text = data.get('text', '')
+        if not text:
+            return JsonResponse({"error": "No text provided"}, status=400)
+
+        options_serializer = SummaryOptionsSerializer(data=data.get('options', {}))
+        if not options_serializer.is_valid():
+            return JsonResponse({
+                "error": "Invalid options",
+                "details": options_serializer.errors
+            }, status=400)
+
+        options = options_serializer.validated_data
+
+        job_serializer = BackgroundJobSerializer(data=data)
+        # Validating a callback_url resolves its host, which must not block the loop
+        valid = await sync_to_async(job_serializer.is_valid)() if data.get('callback_url') else job_serializer.is_valid()
+        if not valid:
+            return JsonResponse({
+                "error": "Invalid request data",
+                "details": job_serializer.errors
+            }, status=400)
+
+        if job_serializer.validated_data['background']:
+            job = await sync_to_async(enqueue_job)('summarize', {
+                'text': text,
+                'options': dict(options),
+            }, callback_url=job_serializer.validated_data.get('callback_url'))
+            return JsonResponse(_job_accepted(request, job), status=202)
+
+        summarizer = get_summarizer_service()
+        result = await summarizer.agenerate_summary(text, **summary_kwargs(options))
+
+        return JsonResponse({
+            "summary": result,
+            "status": "success"
+        })
+
+    except OffloadBusy as e:
+        return _busy(e)
+    except Exception as e:
+        logger.error(f"Error in custom summarization: {str(e)}")
+        return JsonResponse({
+            "error": "Error generating summary",
+            "details": str(e)
+        }, status=500)
+
+
+def _sse(event, data):
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@csrf_exempt
+@require_POST
+async def summarize_stream(request):
+    """Stream a summary as Server-Sent Events while the LLM generates it"""
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+    text = data.get('text', '')
+    if not text:
+        return JsonResponse({"error": "No text provided"}, status=400)
+
+    options_serializer = SummaryOptionsSerializer(data=data.get('options', {}))
+    if not options_serializer.is_valid():
+        return JsonResponse({
+            "error": "Invalid options",
+            "details": options_serializer.errors
+        }, status=400)
+
+    options = options_serializer.validated_data
+    summarizer = get_summarizer_service()
+
+    async def events():
+        try:
+            async for event, payload in summarizer.astream_summary(text, **summary_kwargs(options)):
+                if event == 'delta':
+                    yield _sse('delta', {"text": payload})
+                else:
+                    yield _sse(event, payload)
+        except Exception as e:
+            logger.error(f"Error in streaming summarization: {str(e)}")
+            yield _sse('error', {
+                "error": "Error generating summary",
+                "details": str(e)
+            })
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def quick_summarize(request):
+    """Async quick summarization without AI"""
+    try:
+        data = _json_body(request)
+        if data is None:
+            return JsonResponse({"error": "Invalid JSON body"}, status=400)
+
+        text = data.get('text', '')
+        if not text:
+            return JsonResponse({"error": "No text provided"}, status=400)
+
+        method = data.get('method', 'extractive')
+        if method not in ('extractive', 'lead'):
+            return JsonResponse({"error": "method must be 'extractive' or 'lead'"}, status=400)
+
+        summary = QuickSummarizer().create_bullet_summary(text, _max_bullets(data), method)
+
+        return JsonResponse({
+            "summary": summary,
+            "status": "success"
+        })
+
+    except Exception as e:
+        logger.error(f"Error in quick summarization: {str(e)}")
+        return JsonResponse({
+            "error": "Error generating quick summary",
+            "details": str(e)
+        }, status=500)
@@ -0,0 +1,212 @@
+import asyncio
+import random
+import threading
+import time
+from collections import namedtuple
+import httpx
+import openai
+from django.conf import settings
+from .clients import get_openai_client, get_async_openai_client
+
+# What every backend returns for one call (streams yield one per delta; the last one carries usage)
+Completion = namedtuple('Completion', ['text', 'usage', 'finish_reason'])
+Usage = namedtuple('Usage', ['prompt_tokens', 'completion_tokens'])
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class OpenAIBackend:
+    """Chat completions through the pooled OpenAI clients"""
+
+    def __init__(self, client=None, model=None):
+        # An injected client is used for sync calls; async calls always use the per-loop pooled client
+        self._client = client
+        self._model = model
+
+    @property
+    def model(self):
+        return self._model or settings.OPENAI_MODEL
+
+    @property
+    def client(self):
+        return self._client or get_openai_client()
+
+    @property
+    def configured(self):
+        return bool(settings.OPENAI_API_KEY)
+
+    def warm(self):
+        self.client
+
+    def complete(self, messages, max_tokens, temperature=0.3, timeout=None):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **self._timeout(timeout)
+        )
+        return self._completion(response)
+
+    async def acomplete(self, messages, max_tokens, temperature=0.3, timeout=None):
+        response = await get_async_openai_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **self._timeout(timeout)
+        )
+        return self._completion(response)
+
+    async def astream(self, messages, max_tokens, temperature=0.3, timeout=None):
+        stream = await get_async_openai_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={'include_usage': True},
+            **self._timeout(timeout)
+        )
+        async for chunk in stream:
+            # The usage report arrives in a final chunk without choices
+            usage = getattr(chunk, 'usage', None)
+            if chunk.choices:
+                choice = chunk.choices[0]
+                yield Completion(choice.delta.content or '', usage, choice.finish_reason)
+            elif usage is not None:
+                yield Completion('', usage, None)
+
+    @staticmethod
+    def _timeout(timeout):
+        # Without a timeout the client's default (OPENAI_TIMEOUT) applies
+        return {} if timeout is None else {'timeout': timeout}
+
+    @staticmethod
+    def _completion(response):
+        choice = response.choices[0]
+        return Completion(
+            choice.message.content or '',
+            getattr(response, 'usage', None),
+            getattr(choice, 'finish_reason', None)
+        )
+
+
+class StubBackend:
+    """Local, deterministic stand-in for the LLM, for load tests and CI
+
+    The "summary" is the leading words of the text in the last message, cut
+    to max_tokens. Latency is log-normal around latency_ms (latency_sigma=0
+    makes it constant) and a seeded share of calls fail with error_rate,
+    raising the same openai errors as the real API.
+    """
+
+    model = 'stub'
+    configured = True
+    ERRORS = ('rate_limit', 'server', 'connection')
+
+    def __init__(self, latency_ms=200, latency_sigma=0.0, error_rate=0.0, errors=ERRORS, seed=0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.errors = tuple(errors)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def warm(self):
+        pass
+
+    def complete(self, messages, max_tokens, temperature=0.3, timeout=None):
+        latency_s, error = self._draw()
+        if timeout is not None and latency_s > timeout:
+            time.sleep(timeout)
+            raise self._error('timeout')
+        time.sleep(latency_s)
+        if error:
+            raise self._error(error)
+        return self._completion(messages, max_tokens)
+
+    async def acomplete(self, messages, max_tokens, temperature=0.3, timeout=None):
+        latency_s, error = self._draw()
+        if timeout is not None and latency_s > timeout:
+            await asyncio.sleep(timeout)
+            raise self._error('timeout')
+        await asyncio.sleep(latency_s)
+        if error:
+            raise self._error(error)
+        return self._completion(messages, max_tokens)
+
+    async def astream(self, messages, max_tokens, temperature=0.3, timeout=None):
+        # A quarter of the latency before the first token, the rest spread over the others
+        latency_s, error = self._draw()
+        if timeout is not None and latency_s / 4 > timeout:
+            await asyncio.sleep(timeout)
+            raise self._error('timeout')
+        await asyncio.sleep(latency_s / 4)
+        if error:
+            raise self._error(error)
+        completion = self._completion(messages, max_tokens)
+        words = completion.text.split()
+        pause = (latency_s * 3 / 4) / max(1, len(words))
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(pause)
+            yield Completion(word + ' ', None, None)
+        yield Completion('', completion.usage, completion.finish_reason)
+
+    def _draw(self):
+        """Latency and error for one call, from the seeded generator"""
+        with self._lock:
+            latency_s = self.latency_ms / 1000
+            if self.latency_sigma:
+                latency_s *= self._random.lognormvariate(0, self.latency_sigma)
+            error = None
+            if self.error_rate and self._random.random() < self.error_rate:
+                error = self._random.choice(self.errors)
+        return latency_s, error
+
+    def _completion(self, messages, max_tokens):
+        prompt = messages[-1]['content']
+        prompt_words = sum(len(message['content'].split()) for message in messages)
+        # Word counts stand in for token counts; a word is ~1.35 tokens
+        words = prompt.split()[:max(1, int(max_tokens / 1.35))]
+        return Completion(' '.join(words) or 'Empty input.', Usage(prompt_words, len(words)), 'stop')
+
+    @staticmethod
+    def _error(kind):
+        request = httpx.Request('POST', 'http://stub/v1/chat/completions')
+        if kind == 'rate_limit':
+            response = httpx.Response(429, request=request, headers={'retry-after': '1'})
+            return openai.RateLimitError('Stub rate limit', response=response, body=None)
+        if kind == 'server':
+            response = httpx.Response(500, request=request)
+            return openai.InternalServerError('Stub server error', response=response, body=None)
+        if kind == 'timeout':
+            return openai.APITimeoutError(request=request)
+        return openai.APIConnectionError(request=request)
+
+
+def build_llm_backend():
+    """Create the backend selected by SUMMARIZER_LLM_BACKEND"""
+    name = settings.SUMMARIZER_LLM_BACKEND
+    if name == 'openai':
+        return OpenAIBackend()
+    if name == 'stub':
+        return StubBackend(
+            latency_ms=settings.SUMMARIZER_STUB_LATENCY_MS,
+            latency_sigma=settings.SUMMARIZER_STUB_LATENCY_SIGMA,
+            error_rate=settings.SUMMARIZER_STUB_ERROR_RATE,
+            seed=settings.SUMMARIZER_STUB_SEED,
+        )
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+def get_llm_backend():
+    """Return the process-wide LLM backend, creating it on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = build_llm_backend()
+    return _backend
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'summarizer:summary:'
+
+
+class LRUCacheBackend:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.evictions += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    # Memory only: nothing to wait for, so the async variants never leave the event loop
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DjangoCacheBackend:
+    """Shared cache backed by Django's cache framework (see CACHES setting)"""
+
+    def __init__(self, alias='default', ttl=3600):
+        self.alias = alias
+        self.ttl = ttl
+        # Evictions happen inside the cache server and are not observable here
+        self.evictions = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.ttl)
+
+    # Django's async cache API (a thread for backends that are only synchronous, e.g. the database cache)
+    async def aget(self, key):
+        return await self.cache.aget(key)
+
+    async def aset(self, key, value):
+        await self.cache.aset(key, value, self.ttl)
+
+    def clear(self):
+        # Only some backends (e.g. django-redis) can delete by prefix
+        if hasattr(self.cache, 'delete_pattern'):
+            self.cache.delete_pattern(KEY_PREFIX + '*')
+        else:
+            self.cache.clear()
+
+
+class SummaryCache:
+    """Content-addressed cache for generated summaries"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(cleaned_text, **options):
+        """Hash of the cleaned text and every option that shapes the summary"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(cleaned_text.encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(cleaned_text, **options):
+        """Build a cache key from the cleaned text and every option that shapes the summary"""
+        return KEY_PREFIX + SummaryCache.digest(cleaned_text, **options)
+
+    def peek(self, key):
+        """Look up a key without counting a hit or miss"""
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Summary cache lookup failed: {str(e)}")
+            return None
+
+    async def apeek(self, key):
+        """Async variant of peek, for callers on an event loop"""
+        try:
+            return await self.backend.aget(key)
+        except Exception as e:
+            logger.warning(f"Summary cache lookup failed: {str(e)}")
+            return None
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Summary cache lookup failed: {str(e)}")
+            value = None
+        return self._count(value)
+
+    async def aget(self, key):
+        """Async variant of get, for callers on an event loop"""
+        try:
+            value = await self.backend.aget(key)
+        except Exception as e:
+            logger.warning(f"Summary cache lookup failed: {str(e)}")
+            value = None
+        return self._count(value)
+
+    def _count(self, value):
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, value)
+        except Exception as e:
+            logger.warning(f"Summary cache store failed: {str(e)}")
+
+    async def aset(self, key, value):
+        """Async variant of set, for callers on an event loop"""
+        try:
+            await self.backend.aset(key, value)
+        except Exception as e:
+            logger.warning(f"Summary cache store failed: {str(e)}")
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+            'bypassed': self.bypassed,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_summary_cache = None
+_summary_cache_lock = threading.Lock()
+
+
+def build_summary_cache():
+    """Create the summary cache configured by the SUMMARIZER_CACHE_* settings"""
+    backend_name = getattr(settings, 'SUMMARIZER_CACHE_BACKEND', 'locmem')
+    ttl = getattr(settings, 'SUMMARIZER_CACHE_TTL', 3600)
+
+    if backend_name == 'none':
+        return None
+    if backend_name == 'django':
+        backend = DjangoCacheBackend(
+            alias=getattr(settings, 'SUMMARIZER_CACHE_ALIAS', 'default'),
+            ttl=ttl
+        )
+    elif backend_name == 'locmem':
+        backend = LRUCacheBackend(
+            max_entries=getattr(settings, 'SUMMARIZER_CACHE_MAX_ENTRIES', 1024),
+            ttl=ttl
+        )
+    else:
+        raise ValueError(f"Unknown summary cache backend: {backend_name}")
+
+    return SummaryCache(backend)
+
+
+def get_summary_cache():
+    """Return the process-wide summary cache, or None when caching is disabled"""
+    global _summary_cache
+    if _summary_cache is None:
+        with _summary_cache_lock:
+            if _summary_cache is None:
+                _summary_cache = build_summary_cache() or False
+    return _summary_cache or None
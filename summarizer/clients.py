@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import weakref
+import httpx
+import openai
+from django.conf import settings
+
+_client = None
+_client_lock = threading.Lock()
+
+# httpx.AsyncClient connections are bound to the event loop that opened them,
+# so there is one pooled client per running loop (normally one per worker).
+_async_clients = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def _limits(pool_size):
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout():
+    return httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT)
+
+
+def build_openai_client():
+    """Create an OpenAI client with a pooled, keep-alive HTTP connection"""
+    http_client = httpx.Client(limits=_limits(settings.OPENAI_POOL_SIZE), timeout=_timeout())
+    return openai.OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        http_client=http_client,
+        # Retries, backoff and deadlines are handled by summarizer.resilience
+        max_retries=0,
+    )
+
+
+def get_openai_client():
+    """Return the process-wide OpenAI client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = build_openai_client()
+    return _client
+
+
+def build_async_openai_client():
+    """Create an AsyncOpenAI client with a pooled, keep-alive HTTP connection"""
+    http_client = httpx.AsyncClient(limits=_limits(settings.OPENAI_ASYNC_POOL_SIZE), timeout=_timeout())
+    return openai.AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        http_client=http_client,
+        # Retries, backoff and deadlines are handled by summarizer.resilience
+        max_retries=0,
+    )
+
+
+def get_async_openai_client():
+    """Return the process-wide AsyncOpenAI client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        with _async_clients_lock:
+            client = _async_clients.get(loop)
+            if client is None:
+                client = build_async_openai_client()
+                _async_clients[loop] = client
+    return client
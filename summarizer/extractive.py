@@ -0,0 +1,227 @@
+import re
+from itertools import chain
+import numpy as np
+
+# Fast extractive summarization without an LLM: sentences are scored with
+# TF-IDF and LexRank centrality over a sparse cosine-similarity graph, then
+# picked with maximal marginal relevance (MMR) so the summary is not
+# repetitive. Everything is vectorized in NumPy; a 20k-word document takes
+# a few tens of milliseconds.
+
+STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just let me more most
+my myself no nor not of off on once only or other our ours ourselves out over own same she should so
+some such than that the their theirs them themselves then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would you your
+yours yourself yourselves
+""".split())
+
+ABBREVIATIONS = frozenset("""
+mr mrs ms dr prof sr jr st vs etc eg ie al fig no vol inc ltd co corp dept est approx jan feb mar apr
+jun jul aug sep sept oct nov dec mon tue wed thu fri sat sun
+""".split())
+
+# Candidate boundary: terminal punctuation (plus closing quotes/brackets) followed by
+# whitespace and an uppercase letter, digit or opening quote; or a blank line.
+# Starting with a character class lets the regex engine skip ordinary characters
+# in C; group 1 is the rest of the punctuation after the first character.
+SENTENCE_BOUNDARY = re.compile(r'[.!?\n](?:(?<=[.!?])([.!?]*["\')\]]*)\s+(?=["\'(\[]?[A-Z0-9])|(?<=\n)\s*\n)')
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def split_sentences(text):
+    """Split text into sentences, skipping breaks after abbreviations and initials"""
+    sentences = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        punctuation = match.group(1)
+        if punctuation == '' and text[match.start()] == '.':
+            word = text[text.rfind(' ', start, match.start()) + 1:match.start()].lstrip('("\'[').lower()
+            # "Dr. Smith", "J. Doe", "U.S. Army"
+            if word.isalpha() and (word in ABBREVIATIONS or len(word) == 1) or '.' in word and word.replace('.', '').isalpha():
+                continue
+        sentence = text[start:match.start() if punctuation is None else match.end(1)].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+class ExtractiveSummarizer:
+    """TF-IDF + LexRank sentence ranking with MMR redundancy removal"""
+
+    # Terms in more sentences than this go through a dense matrix product instead
+    # of pairwise expansion, whose cost grows with the square of document frequency
+    DENSE_TERM_DF = 32
+
+    def __init__(self, similarity_threshold=0.1, damping=0.85, mmr_lambda=0.7,
+                 centrality_weight=0.7, max_df=0.5, max_graph_sentences=1500):
+        self.similarity_threshold = similarity_threshold
+        self.damping = damping
+        self.mmr_lambda = mmr_lambda
+        self.centrality_weight = centrality_weight
+        self.max_df = max_df
+        self.max_graph_sentences = max_graph_sentences
+
+    def summarize(self, text, num_sentences=5):
+        """Return the most representative sentences, in document order"""
+        sentences = split_sentences(text)
+        if len(sentences) <= num_sentences:
+            return sentences
+
+        selected = self.select(sentences, num_sentences)
+        return [sentences[index] for index in sorted(selected)]
+
+    def select(self, sentences, num_sentences):
+        """Indices of the chosen sentences, best first"""
+        rows, cols, counts = self._term_counts(sentences)
+        n = len(sentences)
+        if not len(rows):
+            return list(range(min(num_sentences, n)))
+
+        weights, df = self._tfidf(rows, cols, counts, n)
+
+        # TF-IDF density: informative sentences carry a lot of rare-term weight
+        tfidf_scores = np.bincount(rows, weights=weights, minlength=n)
+        lengths = np.bincount(rows, minlength=n)
+        tfidf_scores = tfidf_scores / np.sqrt(np.maximum(lengths, 1))
+
+        # Very long documents: only the strongest candidates enter the graph
+        candidates = np.arange(n)
+        if n > self.max_graph_sentences:
+            candidates = np.sort(np.argsort(-tfidf_scores, kind='stable')[:self.max_graph_sentences])
+            keep = np.zeros(n, dtype=bool)
+            keep[candidates] = True
+            mask = keep[rows]
+            remap = np.full(n, -1, dtype=np.int64)
+            remap[candidates] = np.arange(len(candidates))
+            rows, cols, weights = remap[rows[mask]], cols[mask], weights[mask]
+
+        m = len(candidates)
+        normalized = self._l2_normalize(rows, weights, m)
+        similarity = self._similarity(rows, cols, normalized, m, df, n)
+        centrality = self._lexrank(similarity)
+
+        scores = (
+            self.centrality_weight * self._unit_scale(centrality)
+            + (1 - self.centrality_weight) * self._unit_scale(tfidf_scores[candidates])
+        )
+        return [int(candidates[index]) for index in self._mmr(scores, similarity, num_sentences)]
+
+    @staticmethod
+    def _term_counts(sentences):
+        """Sparse (sentence, term, count) triples with stop words removed"""
+        per_sentence = [WORD.findall(sentence.lower()) for sentence in sentences]
+        words = list(chain.from_iterable(per_sentence))
+        if not words:
+            empty = np.array([], dtype=np.int64)
+            return empty, empty, empty
+
+        # Term ids in order of first use; a dict is much cheaper than sorting the words as strings
+        vocabulary = {word: index for index, word in enumerate(dict.fromkeys(words))}
+        cols = np.fromiter(map(vocabulary.__getitem__, words), dtype=np.int64, count=len(words))
+        rows = np.repeat(np.arange(len(sentences)), [len(sentence_words) for sentence_words in per_sentence])
+        useful_term = np.fromiter(
+            (word not in STOP_WORDS and len(word) > 1 for word in vocabulary),
+            dtype=bool, count=len(vocabulary)
+        )
+        mask = useful_term[cols]
+        rows, cols = rows[mask], cols[mask]
+
+        keys, counts = np.unique(rows * len(vocabulary) + cols, return_counts=True)
+        return keys // len(vocabulary), keys % len(vocabulary), counts
+
+    @staticmethod
+    def _tfidf(rows, cols, counts, n):
+        """Sublinear TF times smoothed IDF for each non-zero entry"""
+        df = np.bincount(cols)
+        idf = np.log((1 + n) / (1 + df)) + 1
+        return (1 + np.log(counts)) * idf[cols], df
+
+    @staticmethod
+    def _l2_normalize(rows, weights, n):
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n))
+        return weights / norms[rows]
+
+    def _similarity(self, rows, cols, weights, m, df, n):
+        """Cosine similarity between sentences (X @ X.T over the sparse TF-IDF matrix)"""
+        # Terms in a single sentence add nothing; near-ubiquitous terms add noise and cost
+        useful = (df[cols] > 1) & (df[cols] <= max(2, self.max_df * n))
+        rows, cols, weights = rows[useful], cols[useful], weights[useful]
+        similarity = np.zeros((m, m), dtype=np.float32)
+
+        # Frequent terms: a small dense block multiplied with BLAS
+        frequent = df[cols] > self.DENSE_TERM_DF
+        if frequent.any():
+            dense_terms, dense_cols = np.unique(cols[frequent], return_inverse=True)
+            block = np.zeros((m, len(dense_terms)), dtype=np.float32)
+            block[rows[frequent], dense_cols] = weights[frequent]
+            similarity += block @ block.T
+
+        # Rare terms: every pair of entries sharing a term contributes w_i * w_j
+        rare = ~frequent
+        if rare.any():
+            rows, cols, weights = rows[rare], cols[rare], weights[rare]
+            order = np.argsort(cols, kind='stable')
+            rows, cols, weights = rows[order], cols[order], weights[order]
+
+            _, group_start, group_size = np.unique(cols, return_index=True, return_counts=True)
+            group = np.repeat(np.arange(len(group_size)), group_size)
+            sizes = group_size[group]
+            left = np.repeat(np.arange(len(rows)), sizes)
+            offsets = np.arange(len(left)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            right = np.repeat(group_start[group], sizes) + offsets
+
+            # Scattered straight into the matrix: a dense m*m bincount would allocate and convert 8*m*m bytes
+            np.add.at(similarity.reshape(-1), rows[left] * m + rows[right], (weights[left] * weights[right]).astype(np.float32))
+
+        np.fill_diagonal(similarity, 0.0)
+        return similarity
+
+    def _lexrank(self, similarity, iterations=50, tolerance=1e-6):
+        """Stationary distribution of the thresholded similarity graph (power iteration)"""
+        m = len(similarity)
+        # Drop weak edges in place; MMR only needs the strong similarities too
+        np.multiply(similarity, similarity >= self.similarity_threshold, out=similarity)
+        out_weight = similarity.sum(axis=1)
+        dangling = out_weight == 0
+        out_weight[dangling] = 1.0
+        # The graph is symmetric, so dividing column j by node j's out-weight gives
+        # the transposed transition matrix directly
+        transition_t = similarity / out_weight
+
+        rank = np.full(m, 1.0 / m, dtype=np.float32)
+        for _ in range(iterations):
+            # Sentences with no neighbours spread their rank uniformly
+            updated = (1 - self.damping) / m + self.damping * (transition_t @ rank + rank[dangling].sum() / m)
+            if np.abs(updated - rank).sum() < tolerance:
+                return updated
+            rank = updated
+        return rank
+
+    def _mmr(self, scores, similarity, count):
+        """Greedy maximal marginal relevance selection"""
+        selected = []
+        redundancy = np.zeros(len(scores))
+        available = np.ones(len(scores), dtype=bool)
+        for _ in range(min(count, len(scores))):
+            objective = self.mmr_lambda * scores - (1 - self.mmr_lambda) * redundancy
+            objective[~available] = -np.inf
+            best = int(np.argmax(objective))
+            selected.append(best)
+            available[best] = False
+            redundancy = np.maximum(redundancy, similarity[best])
+        return selected
+
+    @staticmethod
+    def _unit_scale(values):
+        span = values.max() - values.min()
+        if span <= 0:
+            return np.zeros_like(values, dtype=float)
+        return (values - values.min()) / span
@@ -0,0 +1,242 @@
+import ipaddress
+import logging
+import random
+import socket
+import uuid
+from datetime import timedelta
+from urllib.parse import urlsplit
+import httpx
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import SummaryJob
+from .ratelimit import request_priority
+
+logger = logging.getLogger(__name__)
+
+# Database-backed job queue for /webhook and /summarize. Workers
+# (`python manage.py run_summary_worker`) claim jobs with a conditional
+# UPDATE, so no broker is needed and a job is only ever owned by one worker.
+# A claimed job is hidden from other workers until its visibility timeout
+# passes; if the worker dies, the job becomes claimable again.
+
+
+def enqueue_job(kind, payload, callback_url='', request_id=None):
+    """Store a new job and return it"""
+    return SummaryJob.objects.create(
+        request_id=request_id or str(uuid.uuid4()),
+        kind=kind,
+        payload=payload,
+        callback_url=callback_url or '',
+        max_attempts=settings.SUMMARIZER_JOB_MAX_ATTEMPTS,
+    )
+
+
+def _claimable(now):
+    return (
+        Q(status='queued', available_at__lte=now)
+        # A job whose worker died is run again only while it has attempts left
+        | Q(status='running', locked_until__lt=now, attempts__lt=F('max_attempts'))
+    )
+
+
+def _fail_abandoned(now, limit):
+    """Fail jobs whose worker died during their last attempt; they would otherwise stay running forever"""
+    abandoned = SummaryJob.objects.filter(
+        status='running', locked_until__lt=now, attempts__gte=F('max_attempts')
+    )[:limit]
+    for job in abandoned:
+        updated = SummaryJob.objects.filter(pk=job.pk, status='running', locked_until__lt=now).update(
+            status='failed',
+            error='Worker stopped responding during the last attempt',
+            locked_until=None,
+            finished_at=now,
+            updated_at=now,
+        )
+        if updated:
+            job.refresh_from_db()
+            send_callback(job)
+
+
+def claim_jobs(worker_id, limit, visibility_timeout=None):
+    """Claim up to `limit` due jobs for this worker"""
+    if limit <= 0:
+        return []
+    if visibility_timeout is None:
+        visibility_timeout = settings.SUMMARIZER_JOB_VISIBILITY_TIMEOUT
+
+    now = timezone.now()
+    _fail_abandoned(now, limit)
+    candidate_ids = list(
+        SummaryJob.objects.filter(_claimable(now))
+        .order_by('available_at')
+        .values_list('pk', flat=True)[:limit]
+    )
+
+    claimed = []
+    for pk in candidate_ids:
+        # Only one worker's conditional update can win each job
+        updated = SummaryJob.objects.filter(_claimable(now), pk=pk).update(
+            status='running',
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if updated:
+            claimed.append(SummaryJob.objects.get(pk=pk))
+    return claimed
+
+
+def run_job(job, service=None):
+    """Execute a claimed job and return its result payload"""
+    from .services import get_summarizer_service, summary_kwargs
+
+    service = service or get_summarizer_service()
+    payload = job.payload
+
+    if job.kind == 'webhook':
+        try:
+            response = service.summarize_telex_message(
+                payload['message'],
+                payload['user_id'],
+                payload['conversation_id'],
+                payload.get('options') or {},
+                request_id=job.request_id,
+            )
+        except ValueError as e:
+            # Input problems are answered, not retried (same as the sync endpoint)
+            response = f"{str(e)} Please provide longer text for summarization."
+        return {
+            "response": response,
+            "status": "success",
+            "user_id": payload['user_id'],
+            "conversation_id": payload['conversation_id'],
+        }
+
+    if job.kind == 'summarize':
+        options = payload.get('options') or {}
+        result = service.generate_summary(payload['text'], **summary_kwargs(options))
+        return {
+            "summary": result,
+            "status": "success",
+        }
+
+    raise ValueError(f"Unknown job kind: {job.kind}")
+
+
+def complete_job(job, result):
+    """Record a successful run; ignored if another worker has taken the job over"""
+    now = timezone.now()
+    updated = SummaryJob.objects.filter(pk=job.pk, locked_by=job.locked_by, status='running').update(
+        status='succeeded',
+        result=result,
+        error='',
+        locked_until=None,
+        finished_at=now,
+        updated_at=now,
+    )
+    if updated:
+        job.status, job.result, job.finished_at = 'succeeded', result, now
+        send_callback(job)
+    return bool(updated)
+
+
+def fail_job(job, error, retry=True):
+    """Record a failed run, scheduling a retry with backoff until attempts run out"""
+    now = timezone.now()
+    fields = {'error': str(error), 'locked_until': None, 'updated_at': now}
+
+    if not retry or job.attempts >= job.max_attempts:
+        fields.update(status='failed', finished_at=now)
+    else:
+        fields.update(status='queued', available_at=now + timedelta(seconds=retry_delay(job.attempts)))
+
+    updated = SummaryJob.objects.filter(pk=job.pk, locked_by=job.locked_by, status='running').update(**fields)
+    if updated:
+        job.status, job.error = fields['status'], fields['error']
+        job.finished_at = fields.get('finished_at')
+        if job.status == 'failed':
+            send_callback(job)
+    return bool(updated)
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, in seconds"""
+    ceiling = min(
+        settings.SUMMARIZER_JOB_BACKOFF_MAX,
+        settings.SUMMARIZER_JOB_BACKOFF_BASE * (2 ** max(0, attempts - 1)),
+    )
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def process_job(job, service=None):
+    """Run a claimed job and record the outcome"""
+    try:
+        # Background jobs yield shared rate-limit capacity to interactive requests
+        with request_priority('batch'):
+            result = run_job(job, service)
+    except ValueError as e:
+        # Invalid input will not succeed on a retry
+        fail_job(job, e, retry=False)
+    except Exception as e:
+        logger.warning(f"Job {job.request_id} attempt {job.attempts} failed: {str(e)}")
+        fail_job(job, e)
+    else:
+        complete_job(job, result)
+
+
+def job_status(job):
+    """Public status representation of a job"""
+    return {
+        "job_id": job.request_id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error or None,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def validate_callback_url(url):
+    """Raise ValueError unless the worker may POST to url (see SUMMARIZER_JOB_CALLBACK_ALLOWED_HOSTS)"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError("Callback URL must be an http or https URL")
+    host = parts.hostname.lower().rstrip('.')
+
+    allowed = settings.SUMMARIZER_JOB_CALLBACK_ALLOWED_HOSTS
+    if allowed:
+        if not any(host == entry or (entry.startswith('.') and host.endswith(entry)) for entry in allowed):
+            raise ValueError(f"Callback host {host} is not allowed")
+        return
+
+    # Without an allowlist, refuse anything that reaches into the worker's own network
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 443, type=socket.SOCK_STREAM)}
+    except (socket.gaierror, UnicodeError, ValueError):
+        raise ValueError(f"Callback host {host} does not resolve")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise ValueError(f"Callback host {host} resolves to a non-public address")
+
+
+def send_callback(job):
+    """POST the job outcome to its callback URL, if one was given"""
+    if not job.callback_url:
+        return
+    # Checked again at delivery: the host may resolve differently than when the job was queued
+    try:
+        validate_callback_url(job.callback_url)
+    except ValueError as e:
+        logger.warning(f"Callback for job {job.request_id} refused: {str(e)}")
+        return
+    body = job_status(job)
+    body['result'] = job.result
+    try:
+        httpx.post(job.callback_url, json=body, timeout=settings.SUMMARIZER_JOB_CALLBACK_TIMEOUT)
+    except httpx.HTTPError as e:
+        logger.warning(f"Callback for job {job.request_id} failed: {str(e)}")
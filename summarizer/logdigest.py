@@ -0,0 +1,255 @@
+import re
+from collections import Counter
+
+# Bump whenever the digest format changes so cached log summaries are not reused
+DIGEST_VERSION = 2
+
+# Leading timestamps: ISO 8601 / RFC 3339, syslog ("Jan  2 15:04:05"), Apache ("[02/Jan/2006:15:04:05 -0700]")
+TIMESTAMP = re.compile(
+    r'\[?(?:'
+    r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?'
+    r'|[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}'
+    r'|\d{2}/[A-Z][a-z]{2}/\d{4}:\d{2}:\d{2}:\d{2}(?: [+-]\d{4})?'
+    r')\]?'
+)
+LEVEL = re.compile(
+    r'\b(TRACE|DEBUG|INFO|NOTICE|WARN|WARNING|ERROR|ERR|SEVERE|CRITICAL|CRIT|FATAL|ALERT|EMERG|PANIC)\b',
+    re.IGNORECASE
+)
+# The level is looked for this far into the line, before the free-text message
+LEVEL_WINDOW = 64
+LEVEL_NAMES = {
+    'WARNING': 'WARN', 'ERR': 'ERROR', 'SEVERE': 'ERROR', 'CRIT': 'CRITICAL',
+    'ALERT': 'CRITICAL', 'EMERG': 'CRITICAL', 'PANIC': 'FATAL',
+}
+ERROR_LEVELS = frozenset({'ERROR', 'CRITICAL', 'FATAL'})
+
+# Variable fields, most specific first; one alternation so a message is scanned once
+UUID = r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b'
+IP = r'\b(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?\b'
+HEX_ID = r'\b0x[0-9a-fA-F]+\b|\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}\b'
+# A sign or decimal part is not taken from the start of one of the fields above ("9-1234abcd")
+NOT_FIELD = f'(?!{UUID}|{IP}|{HEX_ID})'
+MASKS = (
+    (UUID, '<ID>'),
+    (IP, '<IP>'),
+    (HEX_ID, '<ID>'),
+    (rf'(?<![A-Za-z])(?:[-+]{NOT_FIELD})?\d+(?:\.{NOT_FIELD}\d+)?', '<NUM>'),
+)
+# Every field starts with a sign, digit or hex letter; the lookahead skips other positions cheaply
+MASK = re.compile('(?=[-+0-9a-fA-F])(?:' + '|'.join(f'({pattern})' for pattern, _ in MASKS) + ')')
+MASK_REPLACEMENTS = (None,) + tuple(replacement for _, replacement in MASKS)
+WILDCARD = '<*>'
+# Digits 1-9 are interchangeable to LEVEL and MASK (only the 0 of 0x is special), so messages that
+# differ only in them share a level and masked form as long as no digit survives the masking
+FOLD_DIGITS = bytes.maketrans(b'23456789', b'11111111')
+DIGIT = re.compile(r'\d')
+# Level and masked form of distinct folded messages remembered per digest
+MESSAGE_CACHE_SIZE = 50000
+
+
+def mask(message):
+    """message with its numbers, IDs and IPs replaced by placeholders"""
+    return MASK.sub(lambda match: MASK_REPLACEMENTS[match.lastindex], message)
+
+
+class LogTemplate:
+    """One cluster of log lines sharing a template"""
+
+    __slots__ = ('tokens', 'count', 'level', 'first_seen', 'last_seen', 'sample')
+
+    def __init__(self, tokens, level, timestamp, sample):
+        self.tokens = tokens
+        self.count = 0
+        self.level = level
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.sample = sample
+
+    @property
+    def text(self):
+        return ' '.join(self.tokens)
+
+
+class LogDigest:
+    """Compact, deterministic description of a log: templates with counts, samples and error bursts
+
+    Tokens are masked (numbers, IDs, IPs), lines grouped by token count and first
+    token, and merged into the most similar template of their group as in
+    Drain (He et al., 2017); positions that differ become <*>. A message is
+    masked once per digit shape (see FOLD_DIGITS), and lines that are
+    identical after masking skip tokenizing and the similarity search.
+    """
+
+    def __init__(self, similarity=0.6, max_templates=2000, burst_gap=20, min_burst=5):
+        self.similarity = similarity
+        self.max_templates = max_templates
+        self.burst_gap = burst_gap
+        self.min_burst = min_burst
+        self.templates = []
+        self.levels = Counter()
+        self.lines = 0
+        self.continuation_lines = 0
+        self.unclustered = 0
+        self.first_seen = None
+        self.last_seen = None
+        self.bursts = []
+        self._groups = {}
+        self._seen = {}
+        self._messages = {}
+        self._burst = None
+
+    def add(self, line):
+        """Account for one raw log line"""
+        if not line or line.isspace():
+            return
+        if line[0] in ' \t' and self.lines:
+            # Indented lines continue the previous entry (stack traces, wrapped messages)
+            self.continuation_lines += 1
+            return
+        line = line.strip()
+        self.lines += 1
+
+        match = TIMESTAMP.match(line)
+        timestamp = None
+        message = line
+        if match:
+            timestamp = match.group().strip('[]')
+            message = line[match.end():]
+            if self.first_seen is None:
+                self.first_seen = timestamp
+            self.last_seen = timestamp
+
+        key = message.encode('utf-8', 'surrogatepass').translate(FOLD_DIGITS)
+        parsed = self._messages.get(key)
+        if parsed is None:
+            parsed = self._parse(message)
+            if len(self._messages) < MESSAGE_CACHE_SIZE and not DIGIT.search(parsed[1]):
+                self._messages[key] = parsed
+        level, masked = parsed
+        if level:
+            self.levels[level] += 1
+
+        template = self._seen.get(masked)
+        if template is None:
+            template = self._cluster(tuple(masked.split()), level, timestamp, line)
+            if template is None:
+                self.unclustered += 1
+                return
+            self._seen[masked] = template
+        template.count += 1
+        if timestamp is not None:
+            template.last_seen = timestamp
+            if template.first_seen is None:
+                template.first_seen = timestamp
+
+        if level in ERROR_LEVELS:
+            self._track_burst(template, timestamp, line)
+
+    @staticmethod
+    def _parse(message):
+        """(level or None, masked message)"""
+        match = LEVEL.search(message, 0, LEVEL_WINDOW)
+        level = None
+        if match:
+            level = match.group().upper()
+            level = LEVEL_NAMES.get(level, level)
+        return level, mask(message)
+
+    def _cluster(self, tokens, level, timestamp, line):
+        """The template tokens belong to, merged or created; None once max_templates is reached"""
+        first = tokens[0] if tokens and '<' not in tokens[0] else WILDCARD
+        group = self._groups.setdefault((len(tokens), level, first), [])
+
+        best, best_score = None, -1.0
+        for template in group:
+            same = sum(1 for a, b in zip(template.tokens, tokens) if a == b or a == WILDCARD)
+            score = same / len(tokens) if tokens else 1.0
+            if score > best_score:
+                best, best_score = template, score
+        if best is not None and best_score >= self.similarity:
+            best.tokens = [a if a == b else WILDCARD for a, b in zip(best.tokens, tokens)]
+            return best
+
+        if len(self.templates) >= self.max_templates:
+            return None
+        template = LogTemplate(list(tokens), level, timestamp, line)
+        group.append(template)
+        self.templates.append(template)
+        return template
+
+    def _track_burst(self, template, timestamp, line):
+        """Group error lines that follow each other within burst_gap lines"""
+        burst = self._burst
+        if burst is None or self.lines - burst['last_line'] > self.burst_gap:
+            self._close_burst()
+            burst = self._burst = {
+                'first_line': self.lines, 'last_line': self.lines, 'errors': 0,
+                'start': timestamp, 'end': timestamp, 'templates': Counter(), 'sample': line,
+            }
+        burst['last_line'] = self.lines
+        burst['errors'] += 1
+        burst['end'] = timestamp or burst['end']
+        burst['templates'][id(template)] += 1
+
+    def _close_burst(self):
+        if self._burst is not None and self._burst['errors'] >= self.min_burst:
+            self.bursts.append(self._burst)
+        self._burst = None
+
+    def render(self, max_templates=40, max_bursts=5, sample_chars=240):
+        """The digest as prompt text: header, level counts, templates by importance, error bursts"""
+        self._close_burst()
+        by_id = {id(template): template for template in self.templates}
+        out = [f"Log digest of {self.lines} lines ({len(self.templates)} distinct templates"
+               + (f", {self.continuation_lines} continuation lines" if self.continuation_lines else '')
+               + (f", {self.unclustered} lines not clustered" if self.unclustered else '') + ")"]
+        if self.first_seen:
+            out.append(f"Time range: {self.first_seen} to {self.last_seen}")
+        if self.levels:
+            out.append("Levels: " + ', '.join(f"{level} {count}" for level, count in self.levels.most_common()))
+
+        # Errors first however rare they are, then everything else by frequency
+        ranked = sorted(self.templates, key=lambda t: (t.level not in ERROR_LEVELS, t.level != 'WARN', -t.count))
+        shown = ranked[:max_templates]
+        out.append("")
+        out.append("Templates (count, level, first and last seen; variable fields shown as <NUM>, <ID>, <IP>, <*>):")
+        for number, template in enumerate(shown, 1):
+            seen = f", {template.first_seen} to {template.last_seen}" if template.first_seen else ''
+            out.append(f"{number}. x{template.count} {template.level or '-'}{seen}: {template.text[:sample_chars]}")
+            if WILDCARD in template.tokens or '<' in template.text:
+                out.append(f"   e.g. {template.sample[:sample_chars]}")
+        hidden = ranked[max_templates:]
+        if hidden:
+            out.append(f"... {len(hidden)} more templates covering {sum(t.count for t in hidden)} lines")
+
+        if self.bursts:
+            out.append("")
+            out.append("Error bursts:")
+            for burst in sorted(self.bursts, key=lambda b: -b['errors'])[:max_bursts]:
+                span = f" ({burst['start']} to {burst['end']})" if burst['start'] else ''
+                top = ', '.join(
+                    f"{by_id[key].text[:80]} x{count}" for key, count in burst['templates'].most_common(3)
+                )
+                out.append(f"- lines {burst['first_line']}-{burst['last_line']}{span}: {burst['errors']} errors; {top}")
+                out.append(f"  first: {burst['sample'][:sample_chars]}")
+        return '\n'.join(out)
+
+    def stats(self):
+        return {
+            'lines': self.lines,
+            'templates': len(self.templates),
+            'error_bursts': len(self.bursts),
+        }
+
+
+def build_log_digest(text, min_lines=50, max_templates=40):
+    """(digest text, stats) for text that looks like a log, or None for short or unstructured input"""
+    digest = LogDigest()
+    for line in text.splitlines():
+        digest.add(line)
+    if digest.lines < min_lines or len(digest.templates) > digest.lines // 2:
+        # Too short to be worth it, or prose: most lines would be a template of their own
+        return None
+    rendered = digest.render(max_templates=max_templates)
+    return rendered, dict(digest.stats(), digest_chars=len(rendered))
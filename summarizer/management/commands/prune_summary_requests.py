@@ -0,0 +1,172 @@
+import gzip
+import json
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from summarizer.models import SummaryRequest, SummarySignature
+
+
+class Command(BaseCommand):
+    help = "Delete (optionally archiving) old summary requests and near-duplicate signatures, and compact the original text of the rest"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.SUMMARIZER_RETENTION_DAYS,
+            help="Delete rows older than this many days (0 deletes nothing)"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Rows read and deleted per transaction"
+        )
+        parser.add_argument(
+            '--archive',
+            help="Append deleted rows to this JSON Lines file first (gzip when it ends in .gz)"
+        )
+        parser.add_argument(
+            '--compact', action='store_true',
+            help="Re-store the original text of the remaining rows as --storage"
+        )
+        parser.add_argument(
+            '--storage', choices=['compressed', 'hash'],
+            default=settings.SUMMARIZER_ORIGINAL_TEXT_STORAGE if settings.SUMMARIZER_ORIGINAL_TEXT_STORAGE != 'plain' else 'compressed',
+            help="Storage used by --compact"
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help="Seconds to sleep between batches so request writes are not starved"
+        )
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help="Run VACUUM afterwards (SQLite) so the database file actually shrinks"
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report how many rows would change"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        if options['days'] > 0:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+            deleted = self._prune(cutoff, batch_size, options)
+            verb = "Would delete" if options['dry_run'] else "Deleted"
+            self.stdout.write(f"{verb} {deleted} summary requests created before {cutoff.isoformat()}")
+            deleted = self._prune_signatures(cutoff, batch_size, options)
+            self.stdout.write(f"{verb} {deleted} near-duplicate signatures created before {cutoff.isoformat()}")
+
+        if options['compact']:
+            compacted = self._compact(options['storage'], batch_size, options)
+            verb = "Would compact" if options['dry_run'] else "Compacted"
+            self.stdout.write(f"{verb} {compacted} summary requests to {options['storage']} storage")
+
+        if options['vacuum'] and not options['dry_run']:
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    cursor.execute('VACUUM')
+                self.stdout.write("Vacuumed the database")
+            else:
+                self.stdout.write(f"--vacuum is only supported on SQLite, skipped for {connection.vendor}")
+
+        self.stdout.write(self.style.SUCCESS("Done"))
+
+    def _batches(self, queryset, batch_size):
+        """Yield lists of rows in primary key order, batch_size at a time"""
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1].pk
+            yield batch
+
+    def _prune(self, cutoff, batch_size, options):
+        queryset = SummaryRequest.objects.filter(created_at__lt=cutoff)
+        if options['dry_run']:
+            return queryset.count()
+
+        archive = None
+        if options['archive']:
+            path = options['archive']
+            archive = gzip.open(path, 'at', encoding='utf-8') if path.endswith('.gz') else open(path, 'a', encoding='utf-8')
+
+        deleted = 0
+        try:
+            for batch in self._batches(queryset, batch_size):
+                if archive is not None:
+                    # Written before the delete: a crash in between archives these rows twice rather than never
+                    for row in batch:
+                        archive.write(json.dumps(self._archive_record(row)) + '\n')
+                    archive.flush()
+                with transaction.atomic():
+                    SummaryRequest.objects.filter(pk__in=[row.pk for row in batch]).delete()
+                deleted += len(batch)
+                if options['pause']:
+                    time.sleep(options['pause'])
+        finally:
+            if archive is not None:
+                archive.close()
+        return deleted
+
+    def _prune_signatures(self, cutoff, batch_size, options):
+        queryset = SummarySignature.objects.filter(created_at__lt=cutoff)
+        if options['dry_run']:
+            return queryset.count()
+
+        deleted = 0
+        while True:
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return deleted
+            with transaction.atomic():
+                SummarySignature.objects.filter(pk__in=pks).delete()
+            deleted += len(pks)
+            if options['pause']:
+                time.sleep(options['pause'])
+
+    def _compact(self, storage, batch_size, options):
+        # Plain rows can be compressed or hashed; compressed rows can only be reduced further to a hash
+        stored = ~Q(original_text='')
+        if storage == 'hash':
+            stored |= Q(original_text_compressed__isnull=False)
+        queryset = SummaryRequest.objects.filter(stored)
+        if options['dry_run']:
+            return queryset.count()
+
+        fields = ['original_text', 'original_text_compressed', 'original_text_hash']
+        compacted = 0
+        for batch in self._batches(queryset, batch_size):
+            for row in batch:
+                for name, value in SummaryRequest.original_text_fields(row.get_original_text(), storage).items():
+                    setattr(row, name, value)
+            with transaction.atomic():
+                SummaryRequest.objects.bulk_update(batch, fields)
+            compacted += len(batch)
+            if options['pause']:
+                time.sleep(options['pause'])
+        return compacted
+
+    @staticmethod
+    def _archive_record(row):
+        return {
+            'request_id': row.request_id,
+            'user_id': row.user_id,
+            'conversation_id': row.conversation_id,
+            'original_text': row.get_original_text(),
+            'original_text_hash': row.original_text_hash,
+            'summary_type': row.summary_type,
+            'summary_length': row.summary_length,
+            'summary': row.summary,
+            'word_count_original': row.word_count_original,
+            'word_count_summary': row.word_count_summary,
+            'compression_ratio': row.compression_ratio,
+            'prompt_tokens': row.prompt_tokens,
+            'completion_tokens': row.completion_tokens,
+            'created_at': row.created_at.isoformat(),
+        }
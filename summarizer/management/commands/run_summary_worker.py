@@ -0,0 +1,89 @@
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from summarizer.jobs import claim_jobs, process_job
+
+
+class Command(BaseCommand):
+    help = "Process queued summarization jobs from the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.SUMMARIZER_WORKER_CONCURRENCY,
+            help="Jobs run at the same time by this worker (bounds LLM calls in flight)"
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help="Seconds to wait when the queue is empty"
+        )
+        parser.add_argument(
+            '--visibility-timeout', type=int, default=settings.SUMMARIZER_JOB_VISIBILITY_TIMEOUT,
+            help="Seconds a claimed job stays hidden from other workers"
+        )
+        parser.add_argument(
+            '--worker-id', default=f"{socket.gethostname()}:{os.getpid()}",
+            help="Identifier recorded on claimed jobs"
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once no jobs are due instead of polling forever"
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        worker_id = options['worker_id']
+        stopping = threading.Event()
+        in_flight = threading.Semaphore(concurrency)
+
+        def stop(signum, frame):
+            self.stdout.write("Stopping after in-flight jobs finish...")
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        def run(job):
+            try:
+                process_job(job)
+            finally:
+                close_old_connections()
+                in_flight.release()
+
+        self.stdout.write(f"Worker {worker_id} started (concurrency={concurrency})")
+        processed = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while not stopping.is_set():
+                # Block until at least one slot is free, then claim as many jobs as there are free slots
+                in_flight.acquire()
+                free = 1
+                while free < concurrency and in_flight.acquire(blocking=False):
+                    free += 1
+
+                jobs = claim_jobs(worker_id, free, options['visibility_timeout'])
+                for _ in range(free - len(jobs)):
+                    in_flight.release()
+                for job in jobs:
+                    pool.submit(run, job)
+                processed += len(jobs)
+
+                if not jobs:
+                    if options['once'] and self._idle(in_flight, concurrency):
+                        break
+                    stopping.wait(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker_id} stopped after {processed} jobs"))
+
+    @staticmethod
+    def _idle(in_flight, concurrency):
+        """True when no jobs are running in this worker"""
+        acquired = 0
+        while acquired < concurrency and in_flight.acquire(blocking=False):
+            acquired += 1
+        for _ in range(acquired):
+            in_flight.release()
+        return acquired == concurrency
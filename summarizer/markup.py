@@ -0,0 +1,242 @@
+"""
+Visible text of HTML in one left-to-right pass.
+
+The output follows BeautifulSoup(text, 'html.parser').get_text(), which
+clean_text used before: html.parser's rules for where tags, comments,
+declarations and script/style bodies end (including what it does with
+unterminated ones), and BeautifulSoup's rules for which strings are not
+text (script, style, template, rt and rp content, comments, declarations;
+CDATA is kept). Unlike either of them it does not rescan the input, so it
+takes linear time on any input, including unclosed tags and comments.
+"""
+
+import html
+import re
+import string
+
+# Elements whose strings get_text leaves out; script and style bodies are raw text
+HIDDEN_ELEMENTS = frozenset({'template', 'rt', 'rp'})
+RAW_TEXT_ELEMENTS = frozenset({'script', 'style'})
+# Closed as soon as they are opened, so never on the element stack
+VOID_ELEMENTS = frozenset({
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image', 'img',
+    'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer',
+    'track', 'wbr',
+})
+TAG_START = frozenset(string.ascii_letters)
+
+# A start tag ends at the first '>' outside an attribute value; a quote only opens
+# a value right after '=' (and then has to be closed), as in html.parser. Names
+# and bare values are matched whole, so a failed match cannot backtrack into them.
+START_TAG = re.compile(
+    r'''<([a-zA-Z][^\t\n\r\f />\x00]*)(?![^\t\n\r\f />\x00])'''
+    r'''(?:[^>=]|=\s*(?:"[^"]*"|'[^']*'|(?![\s"'])[^>\s]*(?![^>\s])))*>'''
+)
+# Tags that every reading agrees on: no '<' inside, no '>' in a quoted value, no quote
+# outside one, and not script or style. Runs of text and these are split at C speed.
+ORDINARY_TAG = (
+    r'''(?:/[^<>]*>|(?!(?i:script|style)[\t\n\r\f />\x00])[a-zA-Z][^\t\n\r\f />\x00<>"'=]*'''
+    r'''(?![^\t\n\r\f />\x00<>"'=])(?:[^<>"'=]|=\s*(?:"[^"<>]*"|'[^'<>]*'|[^\s"'=<>]+(?=[\s>])))*>)'''
+)
+ORDINARY_MARKUP = re.compile('<' + ORDINARY_TAG)
+OTHER_MARKUP = re.compile('<(?!' + ORDINARY_TAG + ')')
+TAG_NAME = re.compile(r'<[a-zA-Z][^\t\n\r\f />\x00]*')
+UNQUOTED = re.compile(r'[^>=]*')
+VALUE_START = re.compile(r'=\s*')
+BARE_VALUE = re.compile(r'[^>\s]*')
+END_TAG = re.compile(r'</\s*([a-zA-Z][-.a-zA-Z0-9:_]*)\s*>')
+END_TAG_NAME = re.compile(r'</([a-zA-Z][^\t\n\r\f />\x00]*)')
+HIDDEN_START = re.compile(r'<(?:template|rt|rp)[\t\n\r\f />\x00]', re.IGNORECASE)
+COMMENT_CLOSE = re.compile(r'--\s*>')
+SECTION_NAME = re.compile(r'[a-zA-Z][-_.a-zA-Z0-9]*\s*')
+SECTION_CLOSE = re.compile(r']\s*]\s*>')
+CONDITIONAL_CLOSE = re.compile(r']\s*>')
+RAW_TEXT_CLOSE = {name: re.compile(rf'</\s*{name}\s*>', re.IGNORECASE) for name in RAW_TEXT_ELEMENTS}
+
+
+class _Scanner:
+    """Searches over one text that remember where they came up empty
+
+    A search that finds its target ends the markup being read, so its cost
+    is paid for by what it consumes; one that finds nothing would repeat
+    the same walk to the end of the text for every later '<'.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self._absent_from = {}
+
+    def find(self, needle, start):
+        if start >= self._absent_from.get(needle, len(self.text) + 1):
+            return -1
+        found = self.text.find(needle, start)
+        if found < 0:
+            self._absent_from[needle] = start
+        return found
+
+    def search(self, pattern, start):
+        if start >= self._absent_from.get(pattern, len(self.text) + 1):
+            return None
+        match = pattern.search(self.text, start)
+        if match is None:
+            self._absent_from[pattern] = start
+        return match
+
+
+def visible_text(text):
+    """Text that BeautifulSoup's get_text would return for the HTML fragment text"""
+    scanner = _Scanner(text)
+    n = len(text)
+    parts = []
+    # Open elements, as BeautifulSoup nests them; they only matter around hidden ones
+    track = HIDDEN_START.search(text) is not None
+    stack = []
+    open_counts = {}
+    hidden = 0
+    # Characters unterminated start tags may scan past their first '>'; html.parser has no limit
+    rescan_budget = n
+    i = 0
+
+    def data(start, end, unescape=True):
+        if start < end and not hidden:
+            chunk = text[start:end]
+            parts.append(html.unescape(chunk) if unescape and '&' in chunk else chunk)
+
+    while i < n:
+        if not track:
+            # Up to the next markup that needs a closer look, strip tags without a Python step each
+            other = OTHER_MARKUP.search(text, i)
+            j = other.start() if other else n
+            if i < j:
+                parts.extend(
+                    html.unescape(piece) if '&' in piece else piece
+                    for piece in ORDINARY_MARKUP.split(text[i:j]) if piece
+                )
+                i = j
+                if i == n:
+                    break
+        j = text.find('<', i)
+        if j < 0:
+            data(i, n)
+            break
+        data(i, j)
+        i = j
+        if i + 1 == n:
+            data(i, n)
+            break
+        following = text[i + 1]
+        end = -1
+        if following in TAG_START:
+            gt = scanner.find('>', i)
+            # Most tags end at the next '>'; only a quoted value holding a '>' needs a longer look
+            match = START_TAG.match(text, i, gt + 1) if gt >= 0 else None
+            if match is None and gt >= 0 and rescan_budget > 0:
+                match, scanned_to = _long_start_tag(text, i, scanner)
+                if match is None:
+                    rescan_budget -= scanned_to - gt
+            if match is not None:
+                end = match.end()
+                name = match.group(1).lower()
+                if text[end - 2] == '/' or name in VOID_ELEMENTS:
+                    pass
+                elif name in RAW_TEXT_ELEMENTS:
+                    close = scanner.search(RAW_TEXT_CLOSE[name], end)
+                    if close is None:
+                        # html.parser never emits an unclosed script or style body
+                        break
+                    end = close.end()
+                elif track:
+                    stack.append(name)
+                    open_counts[name] = open_counts.get(name, 0) + 1
+                    if name in HIDDEN_ELEMENTS:
+                        hidden += 1
+        elif following == '/':
+            gt = scanner.find('>', i + 1)
+            if gt >= 0:
+                end = gt + 1
+                if track:
+                    match = END_TAG.match(text, i, end) or END_TAG_NAME.match(text, i, end)
+                    name = match.group(1).lower() if match else None
+                    if open_counts.get(name):
+                        # Close it and everything opened inside it
+                        while True:
+                            popped = stack.pop()
+                            open_counts[popped] -= 1
+                            if popped in HIDDEN_ELEMENTS:
+                                hidden -= 1
+                            if popped == name:
+                                break
+        elif text.startswith('<!--', i):
+            close = scanner.search(COMMENT_CLOSE, i + 4)
+            if close is not None:
+                end = close.end()
+        elif following == '?':
+            gt = scanner.find('>', i + 2)
+            if gt >= 0:
+                end = gt + 1
+        elif following == '!':
+            if text.startswith('<![', i):
+                end = _marked_section(text, i, scanner, parts)
+            else:
+                gt = scanner.find('>', i + 2)
+                if gt >= 0:
+                    end = gt + 1
+        else:
+            # Not markup: a literal '<'
+            data(i, i + 1)
+            i += 1
+            continue
+
+        if end < 0:
+            # Unterminated markup is kept as is up to the next '>' (or '<'), then parsing goes on
+            gt = scanner.find('>', i + 1)
+            if gt >= 0:
+                end = gt + 1
+            else:
+                end = text.find('<', i + 1)
+                if end < 0:
+                    end = i + 1
+            data(i, end, unescape=False)
+        i = end
+
+    return ''.join(parts)
+
+
+def _long_start_tag(text, i, scanner):
+    """Match of the start tag at i read past quoted values, or None and where the scan gave up"""
+    k = TAG_NAME.match(text, i).end()
+    while True:
+        k = UNQUOTED.match(text, k).end()
+        if k == len(text):
+            return None, k
+        if text[k] == '>':
+            return START_TAG.match(text, i, k + 1), k
+        k = VALUE_START.match(text, k).end()
+        quote = text[k:k + 1]
+        if quote in ('"', "'"):
+            close = scanner.find(quote, k + 1)
+            if close < 0:
+                return None, k
+            k = close + 1
+        else:
+            k = BARE_VALUE.match(text, k).end()
+
+
+def _marked_section(text, i, scanner, parts):
+    """End of the <![...]> section at i, or -1; CDATA content is kept as text"""
+    name = SECTION_NAME.match(text, i + 3)
+    keyword = name.group().strip().lower() if name else None
+    if keyword in ('cdata', 'temp', 'ignore', 'include', 'rcdata'):
+        close = scanner.search(SECTION_CLOSE, i + 3)
+    elif keyword in ('if', 'else', 'endif'):
+        close = scanner.search(CONDITIONAL_CLOSE, i + 3)
+    else:
+        gt = scanner.find('>', i + 2)
+        return gt + 1 if gt >= 0 else -1
+    if close is None:
+        return -1
+    content = text[i + 3:close.start()]
+    if content.upper().startswith('CDATA['):
+        # BeautifulSoup turns an empty section into a space, like any blank string
+        parts.append(content[len('CDATA['):] or ' ')
+    return close.end()
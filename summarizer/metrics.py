@@ -0,0 +1,196 @@
+import bisect
+import contextlib
+import threading
+import time
+from django.conf import settings
+
+# Upper bounds (milliseconds) for latency histograms
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# Prefix of every metric name on the /metrics endpoint
+PROMETHEUS_PREFIX = 'summarizer_'
+
+
+class Histogram:
+    """Fixed-bucket histogram with count and sum"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = []
+            running = 0
+            for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+                running += count
+                cumulative.append((bound, running))
+            return {
+                'count': self.count,
+                'sum': round(self.sum, 3),
+                'buckets': cumulative,
+            }
+
+
+class MetricsRegistry:
+    """Process-wide collection of labelled counters, gauges and histograms"""
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        histogram.observe(value)
+
+    def snapshot(self):
+        """JSON-friendly view of every metric"""
+        with self._lock:
+            counters = list(self.counters.items())
+            gauges = list(self.gauges.items())
+            histograms = list(self.histograms.items())
+        return {
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in counters
+            ],
+            'gauges': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in gauges
+            ],
+            'histograms': [
+                dict(histogram.snapshot(), name=name, labels=dict(labels))
+                for (name, labels), histogram in histograms
+            ],
+        }
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+
+class Span:
+    """Times a block and records it in the stage_ms histogram"""
+
+    __slots__ = ('labels', 'started')
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.observe('stage_ms', (time.perf_counter() - self.started) * 1000, **self.labels)
+
+
+registry = MetricsRegistry()
+
+# Returned by span() when metrics are off; reusable and free to enter
+_NOOP_SPAN = contextlib.nullcontext()
+
+
+def inc(name, amount=1, **labels):
+    if settings.SUMMARIZER_METRICS:
+        registry.inc(name, amount, **labels)
+
+
+def set_gauge(name, value, **labels):
+    if settings.SUMMARIZER_METRICS:
+        registry.set_gauge(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    if settings.SUMMARIZER_METRICS:
+        registry.observe(name, value, **labels)
+
+
+def span(stage, **labels):
+    """Context manager timing one stage of a request (a no-op when SUMMARIZER_METRICS is off)"""
+    if not settings.SUMMARIZER_METRICS:
+        return _NOOP_SPAN
+    return Span(dict(labels, stage=stage))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in sorted(labels.items())
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def render_prometheus(snapshot=None):
+    """Every metric in the Prometheus text exposition format"""
+    if snapshot is None:
+        snapshot = registry.snapshot()
+    lines = []
+
+    counters = sorted(snapshot['counters'], key=lambda counter: counter['name'])
+    previous = None
+    for counter in counters:
+        name = f"{PROMETHEUS_PREFIX}{counter['name']}_total"
+        if name != previous:
+            lines.append(f'# TYPE {name} counter')
+            previous = name
+        lines.append(f"{name}{_format_labels(counter['labels'])} {counter['value']}")
+
+    gauges = sorted(snapshot.get('gauges', ()), key=lambda gauge: gauge['name'])
+    previous = None
+    for gauge in gauges:
+        name = PROMETHEUS_PREFIX + gauge['name']
+        if name != previous:
+            lines.append(f'# TYPE {name} gauge')
+            previous = name
+        lines.append(f"{name}{_format_labels(gauge['labels'])} {gauge['value']}")
+
+    histograms = sorted(snapshot['histograms'], key=lambda histogram: histogram['name'])
+    previous = None
+    for histogram in histograms:
+        name = PROMETHEUS_PREFIX + histogram['name']
+        if name != previous:
+            lines.append(f'# TYPE {name} histogram')
+            previous = name
+        labels = histogram['labels']
+        for bound, count in histogram['buckets']:
+            lines.append(f"{name}_bucket{_format_labels(dict(labels, le=bound))} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    return '\n'.join(lines) + '\n'
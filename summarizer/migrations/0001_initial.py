@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('request_id', models.CharField(max_length=255, unique=True)),
+                ('user_id', models.CharField(max_length=255)),
+                ('conversation_id', models.CharField(max_length=255)),
+                ('original_text', models.TextField()),
+                ('summary_type', models.CharField(choices=[('general', 'General Summary'), ('meeting', 'Meeting Notes'), ('news', 'News Article'), ('technical', 'Technical Document'), ('conversation', 'Conversation Thread'), ('log', 'API/System Logs')], default='general', max_length=20)),
+                ('summary_length', models.CharField(default='medium', max_length=20)),
+                ('summary', models.TextField()),
+                ('word_count_original', models.IntegerField()),
+                ('word_count_summary', models.IntegerField()),
+                ('compression_ratio', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'summary_requests',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SummaryTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('system_prompt', models.TextField()),
+                ('user_prompt_template', models.TextField()),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'db_table': 'summary_templates',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0002_summaryjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summaryrequest',
+            name='completion_tokens',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='summaryrequest',
+            name='prompt_tokens',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0003_summaryrequest_token_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summaryrequest',
+            name='original_text_compressed',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='summaryrequest',
+            name='original_text_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='summaryrequest',
+            name='original_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddIndex(
+            model_name='summaryrequest',
+            index=models.Index(fields=['user_id', 'conversation_id', 'created_at'], name='summary_req_user_id_cfb45e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='summaryrequest',
+            index=models.Index(fields=['conversation_id', 'created_at'], name='summary_req_convers_b96232_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='summaryrequest',
+            index=models.Index(fields=['created_at'], name='summary_req_created_a73114_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0004_summaryrequest_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('conversation_id', models.CharField(max_length=255, unique=True)),
+                ('user_id', models.CharField(max_length=255)),
+                ('summary_type', models.CharField(default='conversation', max_length=20)),
+                ('summary_length', models.CharField(default='medium', max_length=20)),
+                ('summary', models.TextField()),
+                ('watermark', models.BigIntegerField(default=0)),
+                ('message_count', models.IntegerField(default=0)),
+                ('version', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'conversation_summaries',
+            },
+        ),
+    ]
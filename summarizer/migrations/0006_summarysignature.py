@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0005_conversationsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummarySignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_key', models.CharField(max_length=64, unique=True)),
+                ('options_key', models.CharField(max_length=64)),
+                ('signature', models.BinaryField()),
+                ('summary', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'summary_signatures',
+                'indexes': [models.Index(fields=['created_at'], name='summary_sig_created_159bf0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0006_summarysignature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationsummary',
+            name='word_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
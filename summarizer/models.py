@@ -1,4 +1,8 @@
+import hashlib
+import zlib
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 
@@ -15,18 +19,84 @@ class SummaryRequest(models.Model):
     request_id = models.CharField(max_length=255, unique=True)
     user_id = models.CharField(max_length=255)
     conversation_id = models.CharField(max_length=255)
-    original_text = models.TextField()
+    original_text = models.TextField(blank=True, default='')  # empty when stored compressed or hash-only
+    original_text_compressed = models.BinaryField(null=True, blank=True)  # zlib
+    original_text_hash = models.CharField(max_length=64, blank=True, default='')  # sha256 hex
     summary_type = models.CharField(max_length=20, choices=SUMMARY_TYPES, default='general')
     summary_length = models.CharField(max_length=20, default='medium')  # short, medium, long
     summary = models.TextField()
     word_count_original = models.IntegerField()
     word_count_summary = models.IntegerField()
     compression_ratio = models.FloatField()
+    prompt_tokens = models.IntegerField(null=True, blank=True)  # as reported by the API, all calls
+    completion_tokens = models.IntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'summary_requests'
         ordering = ['-created_at']
+        indexes = [
+            # Conversation history, newest first; the created_at index also serves the default ordering and pruning
+            models.Index(fields=['user_id', 'conversation_id', 'created_at']),
+            models.Index(fields=['conversation_id', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+    
+    @staticmethod
+    def original_text_fields(text, storage=None):
+        """original_text* field values for text under SUMMARIZER_ORIGINAL_TEXT_STORAGE (plain, compressed or hash)"""
+        if storage is None:
+            storage = settings.SUMMARIZER_ORIGINAL_TEXT_STORAGE
+        fields = {
+            'original_text': '',
+            'original_text_compressed': None,
+            'original_text_hash': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+        }
+        if storage == 'compressed':
+            fields['original_text_compressed'] = zlib.compress(text.encode('utf-8'))
+        elif storage != 'hash':
+            fields['original_text'] = text
+        return fields
+    
+    def get_original_text(self):
+        """The original text, decompressed if needed; None when only its hash was kept"""
+        if self.original_text_compressed is not None:
+            return zlib.decompress(bytes(self.original_text_compressed)).decode('utf-8')
+        if self.original_text or not self.original_text_hash:
+            return self.original_text
+        return None
+
+class ConversationSummary(models.Model):
+    """Rolling summary of a conversation, covering its SummaryRequest rows up to the watermark"""
+    conversation_id = models.CharField(max_length=255, unique=True)
+    user_id = models.CharField(max_length=255)
+    summary_type = models.CharField(max_length=20, default='conversation')
+    summary_length = models.CharField(max_length=20, default='medium')
+    summary = models.TextField()
+    watermark = models.BigIntegerField(default=0)  # pk of the last SummaryRequest folded into summary
+    message_count = models.IntegerField(default=0)
+    word_count = models.IntegerField(default=0)  # words of all the messages summary covers
+    version = models.IntegerField(default=0)  # bumped on every update; concurrent updates compare it
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'conversation_summaries'
+
+class SummarySignature(models.Model):
+    """MinHash signature of a summarized text and its summary, for near-duplicate lookups (see neardup.py)"""
+    source_key = models.CharField(max_length=64, unique=True)  # cache digest of the text and options
+    options_key = models.CharField(max_length=64)  # digest of the options alone; only equal options match
+    signature = models.BinaryField()
+    summary = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'summary_signatures'
+        indexes = [
+            # Loading the newest signatures, and pruning
+            models.Index(fields=['created_at']),
+        ]
 
 class SummaryTemplate(models.Model):
     name = models.CharField(max_length=100)
@@ -37,4 +107,39 @@ class SummaryTemplate(models.Model):
     
     class Meta:
         db_table = 'summary_templates'
-    
\ No newline at end of file
+    
+
+class SummaryJob(models.Model):
+    """Background summarization job, keyed by the request_id of the SummaryRequest it produces"""
+    KINDS = [
+        ('webhook', 'Telex Webhook'),
+        ('summarize', 'Custom Summarize'),
+    ]
+    STATUSES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    request_id = models.CharField(max_length=255, unique=True)
+    kind = models.CharField(max_length=20, choices=KINDS)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUSES, default='queued')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=255, blank=True, default='')
+    callback_url = models.URLField(max_length=1000, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'summary_jobs'
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
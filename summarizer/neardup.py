@@ -0,0 +1,225 @@
+import logging
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from . import metrics
+from .models import SummarySignature
+
+logger = logging.getLogger(__name__)
+
+# One-permutation MinHash over SHINGLE_SIZE-word shingles, NUM_HASHES bins indexed as BANDS bands of ROWS.
+# Two texts with Jaccard similarity s share a band with probability 1 - (1 - s**ROWS)**BANDS: 0.99 at 0.85, 0.6 at 0.7
+SHINGLE_SIZE = 5
+NUM_HASHES = 128
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+# The low 7 bits of a shingle hash pick its bin and the other 25 are its value in the bin;
+# a bin borrowed by densification carries the distance it was borrowed over in the top 7 bits
+_BIN_BITS = 7
+_VALUE_BITS = 32 - _BIN_BITS
+_MIX = 0x9E3779B1
+_MASK = 0xFFFFFFFF
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def minhash_signature(text, min_words=1, max_words=None):
+    """MinHash signature (array of NUM_HASHES uint32) of text's word shingles, or None outside min_words..max_words"""
+    words = text.lower().split()
+    if len(words) < max(min_words, 1) or (max_words and len(words) > max_words):
+        return None
+    size = min(SHINGLE_SIZE, len(words))
+    hashes = {
+        (zlib.crc32(' '.join(words[i:i + size]).encode('utf-8')) * _MIX) & _MASK
+        for i in range(len(words) - size + 1)
+    }
+    # Keep the smallest value per bin: in descending order the last one written wins
+    bins = {h & (NUM_HASHES - 1): h >> _BIN_BITS for h in sorted(hashes, reverse=True)}
+
+    signature = array('I', bytes(4 * NUM_HASHES))
+    for position in range(NUM_HASHES):
+        # Empty bins (short texts) take the nearest filled bin to their right, as in Shrivastava & Li (2014)
+        for distance in range(NUM_HASHES):
+            value = bins.get((position + distance) % NUM_HASHES)
+            if value is not None:
+                signature[position] = value | (distance << _VALUE_BITS)
+                break
+    return signature
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return sum(1 for a, b in zip(first, second) if a == b) / NUM_HASHES
+
+
+class SignatureEntry:
+    """One indexed summary"""
+
+    __slots__ = ('source_key', 'options_key', 'signature', 'summary', 'bands')
+
+    def __init__(self, source_key, options_key, signature, summary, bands):
+        self.source_key = source_key
+        self.options_key = options_key
+        self.signature = signature
+        self.summary = summary
+        self.bands = bands
+
+
+class NearDuplicateIndex:
+    """Bounded in-memory LSH index of summarized texts, persisted as SummarySignature rows
+
+    Lookups only touch memory. Each band of a signature, combined with the
+    options key, is a bucket; entries sharing a bucket with the query are
+    candidates and the most similar one is returned if it reaches threshold.
+    At most max_entries are kept, least recently used evicted first. Rows
+    are written and read on one background thread, never on the request
+    path (which may be an event loop): new entries are stored as they are
+    added, and rows stored by other workers are read every refresh_interval
+    seconds, starting with the newest max_entries.
+    """
+
+    def __init__(self, threshold=0.9, max_entries=5000, refresh_interval=30.0, persist=True):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._last_pk = 0
+        self._refreshed_at = None
+        self._refreshing = False
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix='near-duplicate') if persist else None
+
+    @staticmethod
+    def _band_keys(options_key, signature):
+        data = signature.tobytes()
+        width = ROWS * signature.itemsize
+        return [hash((options_key, band, data[band * width:(band + 1) * width])) for band in range(BANDS)]
+
+    def lookup(self, options_key, signature):
+        """(entry, similarity) of the most similar indexed text with the same options, or None below threshold"""
+        self.maybe_refresh()
+        bands = self._band_keys(options_key, signature)
+        best, best_score = None, 0.0
+        with self._lock:
+            candidates = set()
+            for key in bands:
+                candidates.update(self._buckets.get(key, ()))
+            for source_key in candidates:
+                entry = self._entries[source_key]
+                if entry.options_key != options_key:
+                    continue
+                score = similarity(signature, entry.signature)
+                if score > best_score:
+                    best, best_score = entry, score
+            if best is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best.source_key)
+        return best, best_score
+
+    def add(self, source_key, options_key, signature, summary):
+        """Index a summary in memory only; False if source_key is already indexed"""
+        entry = SignatureEntry(source_key, options_key, signature, summary, self._band_keys(options_key, signature))
+        with self._lock:
+            if source_key in self._entries:
+                self._entries.move_to_end(source_key)
+                return False
+            self._entries[source_key] = entry
+            for key in entry.bands:
+                self._buckets.setdefault(key, set()).add(source_key)
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                for key in evicted.bands:
+                    bucket = self._buckets[key]
+                    bucket.discard(evicted.source_key)
+                    if not bucket:
+                        del self._buckets[key]
+                self.evictions += 1
+            size = len(self._entries)
+        metrics.set_gauge('near_duplicate_entries', size)
+        return True
+
+    def remember(self, source_key, options_key, signature, summary):
+        """Index a freshly generated summary and store it in the background"""
+        if self.add(source_key, options_key, signature, summary) and self._db is not None:
+            self._db.submit(self._store, source_key, options_key, signature.tobytes(), summary)
+
+    def maybe_refresh(self):
+        """Queue a read of the signatures stored since the last one, when refresh_interval has passed"""
+        if self._db is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._refreshing or (self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval):
+                return
+            self._refreshing = True
+        self._db.submit(self._refresh)
+
+    def _store(self, source_key, options_key, signature, summary):
+        close_old_connections()
+        try:
+            SummarySignature.objects.bulk_create([SummarySignature(
+                source_key=source_key, options_key=options_key, signature=signature, summary=summary
+            )], ignore_conflicts=True)
+        except Exception as e:
+            logger.warning(f"Failed to store near-duplicate signature: {str(e)}")
+            metrics.inc('near_duplicate_store_failures')
+
+    def _refresh(self):
+        close_old_connections()
+        try:
+            # Newest first, so a long gap (or the first load) keeps the most recent max_entries
+            rows = list(
+                SummarySignature.objects.filter(pk__gt=self._last_pk).order_by('-pk')
+                .values_list('pk', 'source_key', 'options_key', 'signature', 'summary')[:self.max_entries]
+            )
+            for pk, source_key, options_key, signature, summary in reversed(rows):
+                self.add(source_key, options_key, array('I', bytes(signature)), summary)
+            if rows:
+                self._last_pk = rows[0][0]
+        except Exception as e:
+            logger.warning(f"Failed to load near-duplicate signatures: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._refreshed_at = time.monotonic()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def get_near_duplicate_index():
+    """Return the process-wide NearDuplicateIndex, or None when SUMMARIZER_NEAR_DUPLICATE is off"""
+    global _index
+    if not settings.SUMMARIZER_NEAR_DUPLICATE:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NearDuplicateIndex(
+                    threshold=settings.SUMMARIZER_NEAR_DUPLICATE_THRESHOLD,
+                    max_entries=settings.SUMMARIZER_NEAR_DUPLICATE_MAX_ENTRIES,
+                    refresh_interval=settings.SUMMARIZER_NEAR_DUPLICATE_REFRESH,
+                )
+    return _index
@@ -0,0 +1,150 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from django.conf import settings
+from . import metrics
+from .logdigest import build_log_digest
+from .utils import TextProcessor, TextStats
+
+logger = logging.getLogger(__name__)
+
+_offloader = None
+_offloader_lock = threading.Lock()
+
+
+class OffloadBusy(Exception):
+    """Every worker process is busy and the wait for one timed out"""
+
+
+def _process(text, log_digest=None):
+    """(cleaned text, TextStats, log digest or None); the digest is built from the raw lines
+
+    The cleaned text keeps its paragraph breaks, which is where map-reduce
+    chunks a long document.
+    """
+    digest = build_log_digest(text, **log_digest) if log_digest is not None else None
+    cleaned = TextProcessor.clean_paragraphs(text)
+    return cleaned, TextStats(cleaned), digest
+
+
+def _clean_and_measure(name, size, log_digest=None):
+    """Worker process: clean the UTF-8 text in shared memory block name and compute its statistics
+
+    The cleaned text is written back into the same block when it fits (it
+    nearly always does, cleaning only removes characters) and its length in
+    bytes is returned; otherwise the text itself is returned.
+    """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        cleaned, stats, digest = _process(bytes(block.buf[:size]).decode('utf-8'), log_digest)
+        stats = stats.trimmed()
+        data = cleaned.encode('utf-8')
+        if len(data) <= block.size:
+            block.buf[:len(data)] = data
+            return len(data), stats, digest
+        return cleaned, stats, digest
+    finally:
+        block.close()
+
+
+class CPUOffloader:
+    """Bounded process pool for the CPU-heavy preprocessing of very large inputs
+
+    Cleaning and counting the words of a multi-megabyte text holds the GIL
+    for up to seconds, stalling every other request of the worker; in a
+    separate process it only blocks the request that sent it. The text goes
+    through shared memory instead of being pickled both ways. At most
+    max_workers + max_queue texts are in flight; beyond that a caller waits
+    up to queue_timeout seconds for a slot and then gets OffloadBusy.
+    """
+
+    def __init__(self, max_workers=2, min_chars=1000000, max_queue=2, queue_timeout=5.0):
+        self.max_workers = max_workers
+        self.min_chars = min_chars
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_workers > 0
+
+    def wants(self, text):
+        """Whether text is large enough to be worth the trip to another process"""
+        return self.enabled and len(text) >= self.min_chars
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # Forking a threaded server is unsafe; spawned workers only import the text helpers
+                    self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _reset(self, pool):
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def clean_and_measure(self, text, log_digest=None):
+        """(cleaned text, TextStats, log digest) computed in a worker process; raises OffloadBusy when saturated"""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            metrics.inc('offload_rejections')
+            raise OffloadBusy(f"All {self.max_workers} preprocessing workers are busy, try again shortly.")
+        metrics.inc('offload_tasks')
+        data = text.encode('utf-8')
+        block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        try:
+            block.buf[:len(data)] = data
+            del data
+            pool = self._executor()
+            try:
+                cleaned, stats, digest = pool.submit(_clean_and_measure, block.name, block.size, log_digest).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool next time and do this one here
+                logger.error("Preprocessing worker pool broke, processing inline")
+                metrics.inc('offload_failures')
+                self._reset(pool)
+                return _process(text, log_digest)
+            if isinstance(cleaned, int):
+                cleaned = bytes(block.buf[:cleaned]).decode('utf-8')
+            return cleaned, stats, digest
+        finally:
+            block.close()
+            block.unlink()
+            self._slots.release()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._reset(self._pool)
+
+
+def get_offloader():
+    """Return the process-wide CPUOffloader, creating it on first use"""
+    global _offloader
+    if _offloader is None:
+        with _offloader_lock:
+            if _offloader is None:
+                _offloader = CPUOffloader(
+                    max_workers=settings.SUMMARIZER_OFFLOAD_WORKERS,
+                    min_chars=settings.SUMMARIZER_OFFLOAD_MIN_CHARS,
+                    max_queue=settings.SUMMARIZER_OFFLOAD_MAX_QUEUE,
+                    queue_timeout=settings.SUMMARIZER_OFFLOAD_QUEUE_TIMEOUT,
+                )
+    return _offloader
+
+
+def clean_and_measure(text, log_digest=None):
+    """Cleaned text, its TextStats and, when log_digest options are given, the log digest of text
+
+    Done in a worker process when text is large, inline otherwise.
+    """
+    offloader = get_offloader()
+    if offloader.wants(text):
+        return offloader.clean_and_measure(text, log_digest)
+    return _process(text, log_digest)
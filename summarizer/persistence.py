@@ -0,0 +1,151 @@
+import atexit
+import logging
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from . import metrics
+from .models import SummaryRequest
+
+logger = logging.getLogger(__name__)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class SummaryWriter:
+    """Write-behind buffer for SummaryRequest rows
+
+    Rows are kept in memory and written with one bulk_create by a background
+    thread, every flush_interval seconds or as soon as batch_size rows are
+    waiting. Rows still buffered when the process is killed (not shut down)
+    are lost: at most batch_size rows or flush_interval seconds' worth.
+    When max_buffer rows are waiting (e.g. the database is down), record()
+    writes synchronously instead of growing the buffer. created_at is the
+    time of the write, up to flush_interval after the request.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=1.0, max_buffer=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='summary-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def record(self, fields):
+        """Queue one SummaryRequest row for writing"""
+        if self._append(fields):
+            # The background thread is not keeping up; make the caller pay instead of holding more in memory
+            self.flush()
+
+    async def arecord(self, fields):
+        """Async variant of record(); a flush it has to do runs in a worker thread, off the event loop"""
+        if self._append(fields):
+            await sync_to_async(self.flush)()
+
+    def _append(self, fields):
+        """Buffer one row; True when the buffer is full and the caller has to flush"""
+        row = SummaryRequest(**fields)
+        with self._lock:
+            self._buffer.append(row)
+            waiting = len(self._buffer)
+        metrics.set_gauge('summary_writer_buffered', waiting)
+        if waiting >= self.max_buffer:
+            return True
+        if waiting >= self.batch_size:
+            self._wakeup.set()
+        return False
+
+    def flush(self):
+        """Write every buffered row; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            started = time.perf_counter()
+            try:
+                SummaryRequest.objects.bulk_create(rows, batch_size=self.batch_size)
+            except Exception as e:
+                logger.error(f"Failed to write {len(rows)} summary records: {str(e)}")
+                metrics.inc('summary_writer_failures')
+                with self._lock:
+                    # Keep them for the next flush unless that would exceed the buffer limit
+                    room = max(0, self.max_buffer - len(self._buffer))
+                    self._buffer[:0] = rows[-room:] if room else []
+                    dropped = len(rows) - min(room, len(rows))
+                if dropped:
+                    logger.error(f"Dropped {dropped} summary records")
+                    metrics.inc('summary_writer_dropped', dropped)
+                return 0
+            metrics.observe('summary_writer_flush_ms', (time.perf_counter() - started) * 1000)
+            metrics.inc('summary_writer_rows', len(rows))
+            metrics.set_gauge('summary_writer_buffered', len(self._buffer))
+            return len(rows)
+
+    def stop(self):
+        """Stop the background thread and write what is left"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(5.0, self.flush_interval * 2))
+        self.flush()
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self.flush()
+        finally:
+            connection.close()
+
+    def __len__(self):
+        return len(self._buffer)
+
+
+def get_summary_writer():
+    """Return the process-wide SummaryWriter (started), or None unless SUMMARIZER_PERSISTENCE is 'write_behind'"""
+    global _writer
+    if settings.SUMMARIZER_PERSISTENCE != 'write_behind':
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                writer = SummaryWriter(
+                    batch_size=settings.SUMMARIZER_PERSIST_BATCH_SIZE,
+                    flush_interval=settings.SUMMARIZER_PERSIST_FLUSH_INTERVAL,
+                    max_buffer=settings.SUMMARIZER_PERSIST_MAX_BUFFER,
+                )
+                writer.start()
+                _writer = writer
+    return _writer
+
+
+def save_summary_request(fields):
+    """Persist one SummaryRequest row now, or buffer it in write-behind mode"""
+    writer = get_summary_writer()
+    if writer is None:
+        SummaryRequest.objects.create(**fields)
+    else:
+        writer.record(fields)
+
+
+async def asave_summary_request(fields):
+    """Async variant of save_summary_request"""
+    writer = get_summary_writer()
+    if writer is None:
+        await SummaryRequest.objects.acreate(**fields)
+    else:
+        await writer.arecord(fields)
@@ -0,0 +1,212 @@
+import hashlib
+import logging
+import string
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from . import metrics
+from .models import SummaryRequest, SummaryTemplate
+from .prompts import SUMMARY_PROMPTS, PROMPT_VERSION, INCREMENTAL_PROMPT
+
+logger = logging.getLogger(__name__)
+
+STAMP_KEY = 'summarizer:prompt-templates:stamp'
+BULLET_POINTS_INSTRUCTION = "\nPlease use bullet points for better readability."
+
+# Template names become summary types, which SummaryRequest has to store
+_TYPE_MAX_LENGTH = SummaryRequest._meta.get_field('summary_type').max_length
+# Stamp that never matches, so a failed load is retried at the next check
+_RETRY = object()
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def compile_template(template, fields=('text', 'length')):
+    """Parse a str.format-style template once into (literal, field) segments; raises ValueError if unusable"""
+    segments = []
+    used = set()
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            segments.append((literal, None))
+        if field is None:
+            continue
+        if field not in fields:
+            raise ValueError(f"Unsupported placeholder {{{field}}}; use only {', '.join('{' + f + '}' for f in fields)}")
+        if spec or conversion:
+            raise ValueError(f"Placeholder {{{field}}} cannot take a conversion or format spec")
+        used.add(field)
+        segments.append(('', field))
+    if 'text' not in used:
+        raise ValueError("The template has no {text} placeholder")
+    return tuple(segments)
+
+
+def render_template(segments, suffix='', **values):
+    """Fill compiled segments in one join, so each value (the text) is copied once"""
+    parts = [literal if field is None else values[field] for literal, field in segments]
+    if suffix:
+        parts.append(suffix)
+    return ''.join(parts)
+
+
+INCREMENTAL_SEGMENTS = compile_template(INCREMENTAL_PROMPT, ('summary', 'text', 'length'))
+
+
+class PromptTemplate:
+    """System prompt and compiled user prompt of one summary type
+
+    version identifies the prompt text (and PROMPT_VERSION), for cache keys
+    and metrics; equal versions compare equal across reloads.
+    """
+
+    def __init__(self, name, system, user, source='builtin'):
+        self.name = name
+        self.system = system
+        self.user = user
+        self.source = source
+        self.segments = compile_template(user)
+        self.version = hashlib.sha256(f"{PROMPT_VERSION}\0{system}\0{user}".encode('utf-8')).hexdigest()[:12]
+
+    def render(self, text, length, include_bullet_points=False):
+        return render_template(
+            self.segments, BULLET_POINTS_INSTRUCTION if include_bullet_points else '', text=text, length=length
+        )
+
+    def messages(self, text, length, include_bullet_points=False):
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.render(text, length, include_bullet_points)}
+        ]
+
+    def __eq__(self, other):
+        return isinstance(other, PromptTemplate) and (self.name, self.version) == (other.name, other.version)
+
+    def __hash__(self):
+        return hash((self.name, self.version))
+
+
+class PromptRegistry:
+    """Built-in prompts overlaid with the active SummaryTemplate rows, held in memory
+
+    A row named like a built-in summary type replaces its prompts; any other
+    name adds a summary type. Rows are read once, and again only when the
+    stamp in the SUMMARIZER_CACHE_ALIAS cache changes: saving or deleting a
+    SummaryTemplate replaces the stamp, and every worker compares it at most
+    every refresh_interval seconds (one cache read, no query). Stamp and
+    table are read on a loader thread, so callers on an event loop never run
+    ORM code; only the first load is waited for, later ones are swapped in
+    when done.
+    """
+
+    def __init__(self, alias='default', refresh_interval=5.0):
+        self.alias = alias
+        self.refresh_interval = refresh_interval
+        self._templates = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._checking = False
+        self._lock = threading.Lock()
+        self._loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prompt-templates')
+
+    def get(self, summary_type):
+        """Template of summary_type; unknown types get the general one"""
+        templates = self._current()
+        return templates.get(summary_type) or templates['general']
+
+    def types(self):
+        return list(self._current())
+
+    def __contains__(self, summary_type):
+        return summary_type in self._current()
+
+    def expire(self):
+        """Compare the stamp at the next use instead of waiting for refresh_interval"""
+        self._checked_at = float('-inf')
+
+    def _current(self):
+        templates = self._templates
+        if templates is None:
+            self._loader.submit(self._load).result()
+            return self._templates
+        if time.monotonic() - self._checked_at >= self.refresh_interval:
+            with self._lock:
+                if self._checking:
+                    return templates
+                self._checking = True
+            self._loader.submit(self._check)
+        return templates
+
+    def _check(self):
+        try:
+            if self._read_stamp() != self._stamp:
+                self._load()
+        finally:
+            with self._lock:
+                self._checking = False
+                self._checked_at = time.monotonic()
+
+    def _read_stamp(self):
+        try:
+            return caches[self.alias].get(STAMP_KEY)
+        except Exception as e:
+            logger.warning(f"Could not read the prompt template stamp: {str(e)}")
+            return self._stamp
+
+    def _load(self):
+        close_old_connections()
+        stamp = self._read_stamp()
+        templates = {
+            name: PromptTemplate(name, prompts['system'], prompts['user'])
+            for name, prompts in SUMMARY_PROMPTS.items()
+        }
+        try:
+            rows = list(SummaryTemplate.objects.filter(is_active=True).order_by('pk'))
+        except Exception as e:
+            logger.warning(f"Could not load summary templates, using the built-in prompts: {str(e)}")
+            rows, stamp = [], _RETRY
+        for row in rows:
+            if len(row.name) > _TYPE_MAX_LENGTH:
+                logger.warning(f"Skipping summary template {row.name!r}: names are limited to {_TYPE_MAX_LENGTH} characters")
+                continue
+            try:
+                templates[row.name] = PromptTemplate(row.name, row.system_prompt, row.user_prompt_template, source='database')
+            except ValueError as e:
+                logger.warning(f"Skipping summary template {row.name!r}: {str(e)}")
+                metrics.inc('prompt_template_errors')
+        self._templates = templates
+        self._stamp = stamp
+        self._checked_at = time.monotonic()
+        metrics.inc('prompt_template_loads')
+        logger.info(f"Loaded {len(templates)} prompt templates ({len(rows)} from the database)")
+
+
+def get_prompt_registry():
+    """Return the process-wide PromptRegistry, creating it on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PromptRegistry(
+                    alias=settings.SUMMARIZER_CACHE_ALIAS,
+                    refresh_interval=settings.SUMMARIZER_TEMPLATE_REFRESH,
+                )
+    return _registry
+
+
+def invalidate_prompt_templates(sender=None, **kwargs):
+    """post_save/post_delete receiver for SummaryTemplate: every worker reloads after the change is committed"""
+    def bump():
+        try:
+            caches[settings.SUMMARIZER_CACHE_ALIAS].set(STAMP_KEY, uuid.uuid4().hex, None)
+        except Exception as e:
+            logger.warning(f"Could not publish the prompt template stamp: {str(e)}")
+        if _registry is not None:
+            _registry.expire()
+
+    # Before the commit a reload would still read the old rows, and then keep them under the new stamp
+    transaction.on_commit(bump)
@@ -1,3 +1,6 @@
+# Bump whenever SUMMARY_PROMPTS or LENGTH_GUIDELINES change so cached summaries are not reused
+PROMPT_VERSION = 1
+
 SUMMARY_PROMPTS = {
     'general': {
         'system': """You are an expert text summarizer. Create clear, concise, and accurate summaries that capture the main points and essential information from the provided text.
@@ -112,4 +115,18 @@ LENGTH_GUIDELINES = {
     'short': '2-3 sentences or 50-100 words',
     'medium': '1 paragraph or 100-200 words', 
     'long': '2-3 paragraphs or 200-400 words'
-}
\ No newline at end of file
+}
+
+# Folds new messages into an existing summary (incremental conversation summaries);
+# the system prompt is the one of the requested summary type
+INCREMENTAL_PROMPT = """Below is the current summary of a conversation, followed by the messages posted since it was written.
+
+Current summary:
+{summary}
+
+New messages:
+{text}
+
+Update the summary so that it also covers the new messages. Keep what is still relevant from the current summary, revise points the new messages change, and reply with the updated summary only.
+
+Please provide a {length} summary."""
@@ -0,0 +1,287 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import threading
+import time
+from collections import deque
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from . import metrics
+
+KEY_PREFIX = 'summarizer:ratelimit:'
+# Seconds between queue checks of async callers that are not yet at the head
+QUEUE_POLL = 0.02
+
+# Lower rank is served first
+PRIORITIES = {'interactive': 0, 'batch': 1}
+
+_priority = contextvars.ContextVar('summarizer_priority', default='interactive')
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+class RateLimitTimeout(Exception):
+    """No rate-limit capacity became free within the allowed wait"""
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """Run the LLM calls made inside the block at the given priority ('interactive' or 'batch')"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBudget:
+    """Sliding one-minute window of token spend; acquire() blocks until a request fits"""
+
+    def __init__(self, tokens_per_minute, window=60.0, clock=time.monotonic):
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self.clock = clock
+        self._spent = deque()
+        self._total = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, tokens):
+        """Reserve tokens for one call and return the seconds spent waiting"""
+        if not self.tokens_per_minute:
+            return 0.0
+        # A single oversized call would otherwise wait forever
+        tokens = min(tokens, self.tokens_per_minute)
+        started = self.clock()
+
+        with self._condition:
+            while True:
+                now = self.clock()
+                while self._spent and self._spent[0][0] <= now - self.window:
+                    self._total -= self._spent.popleft()[1]
+
+                if self._total + tokens <= self.tokens_per_minute:
+                    self._spent.append((now, tokens))
+                    self._total += tokens
+                    return now - started
+
+                self._condition.wait(self._spent[0][0] + self.window - now)
+
+
+class SharedRateLimiter:
+    """Requests- and tokens-per-minute limits shared by all workers through a Django cache
+
+    Each limit is a sliding-window counter: this minute's count plus the part
+    of last minute's that still overlaps the window, which behaves like a
+    token bucket refilled continuously at the per-minute rate. Counters are
+    updated with cache add/incr, which are atomic on Redis and Memcached;
+    with a per-process cache such as LocMemCache each worker counts alone.
+    Within a process callers queue by priority; batch callers may use only
+    batch_share of each limit, so interactive traffic keeps headroom across
+    processes too.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, alias='default', batch_share=0.8,
+                 max_wait=30.0, window=60, max_poll=1.0, clock=time.time):
+        self.limits = {'requests': requests_per_minute, 'tokens': tokens_per_minute}
+        self.alias = alias
+        self.batch_share = batch_share
+        self.max_wait = max_wait
+        self.window = window
+        self.max_poll = max_poll
+        self.clock = clock
+        self._waiting = []
+        self._sequence = 0
+        self._condition = threading.Condition()
+
+    @property
+    def enabled(self):
+        return any(self.limits.values())
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, resource, index):
+        return f'{KEY_PREFIX}{resource}:{index}'
+
+    def try_acquire(self, tokens, priority='interactive'):
+        """Reserve one request and tokens if they fit now; returns 0 when reserved, else seconds to wait"""
+        now = self.clock()
+        index = int(now // self.window)
+        overlap = 1 - (now % self.window) / self.window
+        share = self.batch_share if priority == 'batch' else 1.0
+        # An oversized call is capped at what its priority may use, or it could never fit
+        wanted = {
+            resource: min(amount, max(1, int(self.limits[resource] * share)))
+            for resource, amount in (('requests', 1), ('tokens', tokens))
+            if self.limits[resource]
+        }
+
+        keys = [self._key(resource, i) for resource in wanted for i in (index, index - 1)]
+        counts = self.cache.get_many(keys)
+        wait = 0.0
+        previous = {}
+        for resource, amount in wanted.items():
+            current_count = counts.get(self._key(resource, index), 0)
+            previous[resource] = counts.get(self._key(resource, index - 1), 0)
+            overflow = current_count + previous[resource] * overlap + amount - self.limits[resource] * share
+            if overflow > 0:
+                wait = max(wait, self._wait_for(overflow, previous[resource], now))
+        if wait:
+            return wait
+
+        # Reserve, then undo if other workers got there first and the hard limit was crossed
+        reserved = []
+        for resource, amount in wanted.items():
+            reserved.append((resource, amount))
+            estimate = self._incr(self._key(resource, index), amount) + previous[resource] * overlap
+            if estimate > self.limits[resource]:
+                for undo_resource, undo_amount in reserved:
+                    self._decr(self._key(undo_resource, index), undo_amount)
+                return min(self.max_poll, 0.05)
+            metrics.set_gauge('ratelimit_window_usage', round(estimate), resource=resource)
+        return 0.0
+
+    def _wait_for(self, overflow, previous_count, now):
+        """Seconds until overflow units of last minute's count have slid out of the window"""
+        if previous_count:
+            wait = overflow * self.window / previous_count
+        else:
+            # Only this minute's count is in the way; it starts sliding out when the next minute begins
+            wait = self.window - now % self.window
+        return min(max(wait, 0.01), self.max_poll)
+
+    def _incr(self, key, amount):
+        self.cache.add(key, 0, self.window * 2)
+        try:
+            return self.cache.incr(key, amount)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(key, amount, self.window * 2)
+            return amount
+
+    def _decr(self, key, amount):
+        try:
+            self.cache.decr(key, amount)
+        except ValueError:
+            pass
+
+    def _record_depth(self):
+        for priority, rank in PRIORITIES.items():
+            depth = sum(1 for entry in self._waiting if entry[0] == rank)
+            metrics.set_gauge('ratelimit_queue_depth', depth, priority=priority)
+
+    def _enqueue(self, priority):
+        with self._condition:
+            self._sequence += 1
+            entry = (PRIORITIES.get(priority, 0), self._sequence)
+            heapq.heappush(self._waiting, entry)
+            self._record_depth()
+        return entry
+
+    def _is_head(self, entry):
+        with self._condition:
+            return self._waiting[0] == entry
+
+    def _dequeue(self, entry):
+        with self._condition:
+            self._waiting.remove(entry)
+            heapq.heapify(self._waiting)
+            self._record_depth()
+            self._condition.notify_all()
+
+    def _remaining(self, tokens, priority, max_wait, started):
+        remaining = max_wait - (time.monotonic() - started)
+        if remaining <= 0:
+            metrics.inc('ratelimit_timeouts', priority=priority)
+            raise RateLimitTimeout(f"No rate-limit capacity for {tokens} tokens within {max_wait:.1f}s")
+        return remaining
+
+    def _waited(self, priority, started):
+        waited = time.monotonic() - started
+        metrics.observe('ratelimit_wait_ms', waited * 1000, priority=priority)
+        return waited
+
+    def acquire(self, tokens, priority=None, max_wait=None):
+        """Block until a call of this many tokens fits, serving higher priorities first; returns seconds waited"""
+        if not self.enabled:
+            return 0.0
+        priority = priority or current_priority()
+        max_wait = self.max_wait if max_wait is None else min(self.max_wait, max_wait)
+        started = time.monotonic()
+
+        entry = self._enqueue(priority)
+        try:
+            while True:
+                # Only the head of the local queue competes for shared capacity
+                was_head = self._is_head(entry)
+                if was_head:
+                    wait = self.try_acquire(tokens, priority)
+                    if not wait:
+                        break
+                else:
+                    wait = self.max_poll
+                remaining = self._remaining(tokens, priority, max_wait, started)
+                with self._condition:
+                    # The cache is read outside the lock, so the head may have left in the meantime
+                    if was_head or self._waiting[0] != entry:
+                        self._condition.wait(min(wait, remaining))
+        finally:
+            self._dequeue(entry)
+        return self._waited(priority, started)
+
+    async def aacquire(self, tokens, priority=None, max_wait=None):
+        """Async variant of acquire(), sharing its local queue
+
+        Waiting happens on the event loop; only the cache reads and writes of
+        try_acquire() go to a worker thread, so queued callers hold no threads.
+        """
+        if not self.enabled:
+            return 0.0
+        priority = priority or current_priority()
+        max_wait = self.max_wait if max_wait is None else min(self.max_wait, max_wait)
+        started = time.monotonic()
+
+        entry = self._enqueue(priority)
+        try:
+            while True:
+                if self._is_head(entry):
+                    wait = await sync_to_async(self.try_acquire, thread_sensitive=False)(tokens, priority)
+                    if not wait:
+                        break
+                else:
+                    # Cannot wait on the condition from the loop; checking the queue head is cheap
+                    wait = min(self.max_poll, QUEUE_POLL)
+                remaining = self._remaining(tokens, priority, max_wait, started)
+                await asyncio.sleep(min(wait, remaining))
+        finally:
+            self._dequeue(entry)
+        return self._waited(priority, started)
+
+
+def build_rate_limiter():
+    """Create the limiter from the OPENAI_*_PER_MINUTE and SUMMARIZER_RATE_LIMIT_* settings"""
+    return SharedRateLimiter(
+        requests_per_minute=settings.OPENAI_REQUESTS_PER_MINUTE,
+        tokens_per_minute=settings.OPENAI_TOKENS_PER_MINUTE,
+        alias=settings.SUMMARIZER_CACHE_ALIAS,
+        batch_share=settings.SUMMARIZER_RATE_LIMIT_BATCH_SHARE,
+        max_wait=settings.SUMMARIZER_RATE_LIMIT_MAX_WAIT,
+    )
+
+
+def get_rate_limiter():
+    """Return the process-wide SharedRateLimiter, creating it on first use"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = build_rate_limiter()
+    return _limiter
@@ -0,0 +1,267 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+import openai
+from django.conf import settings
+from . import metrics
+from .ratelimit import RateLimitTimeout
+
+logger = logging.getLogger(__name__)
+
+_caller = None
+_caller_lock = threading.Lock()
+
+
+class AttemptTimeout(Exception):
+    """One LLM call ran past its per-attempt timeout"""
+
+
+class DeadlineExceeded(Exception):
+    """The total time allowed for an LLM call, retries included, ran out"""
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open; the LLM is not called until the cooldown ends"""
+
+
+# Transient upstream failures (429, 5xx, network, timeouts) that are worth another attempt
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+    AttemptTimeout,
+)
+
+# Everything that means "the LLM cannot answer right now"
+UNAVAILABLE_ERRORS = RETRYABLE_ERRORS + (DeadlineExceeded, CircuitOpenError, RateLimitTimeout)
+
+
+def retry_after_seconds(error):
+    """Delay asked for by the server's Retry-After(-Ms) header, or None"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return max(0.0, float(headers['retry-after-ms']) / 1000)
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            # HTTP-date form
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _reason(error):
+    if isinstance(error, openai.RateLimitError):
+        return 'rate_limit'
+    if isinstance(error, openai.InternalServerError):
+        return 'server_error'
+    if isinstance(error, (AttemptTimeout, openai.APITimeoutError)):
+        return 'timeout'
+    return 'connection'
+
+
+class CircuitBreaker:
+    """Stops calling the LLM after consecutive failures; one trial call is let through after the cooldown"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, cooldown=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go ahead now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if self.clock() - self._opened_at < self.cooldown:
+                    return False
+                self._transition(self.HALF_OPEN)
+            # Half-open: a single trial call at a time decides whether to close again
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_in_flight = False
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self._opened_at = self.clock()
+                self._transition(self.OPEN)
+
+    def release(self):
+        """End a call that says nothing about upstream health (e.g. a rejected request)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _transition(self, state):
+        if state == self.OPEN:
+            logger.warning(f"LLM circuit breaker opened after {self.failures} consecutive failures")
+        elif state == self.CLOSED:
+            logger.info("LLM circuit breaker closed")
+        self.state = state
+        metrics.inc('llm_circuit_transitions', to=state)
+
+
+class ResilientCaller:
+    """Runs LLM calls with per-attempt and total deadlines, jittered retries and a circuit breaker
+
+    fn(timeout) makes one attempt; timeout is the seconds that attempt may take.
+    admit(max_wait), when given, waits for rate-limit capacity before each
+    attempt; the wait counts against the deadline but not the attempt timeout.
+    """
+
+    def __init__(self, breaker=None, max_attempts=3, attempt_timeout=30.0, deadline=60.0,
+                 backoff_base=0.5, backoff_max=8.0, clock=time.monotonic, sleep=time.sleep, seed=None):
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max(1, max_attempts)
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.clock = clock
+        self.sleep = sleep
+        self._random = random.Random(seed)
+
+    def new_deadline(self):
+        """Absolute deadline for a request starting now"""
+        return self.clock() + self.deadline
+
+    def _delay(self, error, attempt):
+        """Full-jitter exponential backoff, or the server's Retry-After when it gave one"""
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after
+        return self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _check_breaker(self):
+        """Raises when the breaker is open"""
+        if not self.breaker.allow():
+            metrics.inc('llm_circuit_rejections')
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+    def _attempt_timeout(self, deadline):
+        """Seconds the next attempt may take; raises when the deadline has passed"""
+        remaining = deadline - self.clock()
+        if remaining <= 0:
+            raise DeadlineExceeded("LLM deadline exceeded")
+        return min(self.attempt_timeout, remaining)
+
+    def _after_failure(self, error, attempt, deadline):
+        """Seconds to wait before retrying; raises when no retry is left or it would miss the deadline"""
+        self.breaker.record_failure()
+        reason = _reason(error)
+        metrics.inc('llm_call_failures', reason=reason)
+        delay = self._delay(error, attempt)
+        if attempt >= self.max_attempts or self.clock() + delay >= deadline:
+            raise error
+        logger.info(f"LLM call failed ({reason}), retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_attempts})")
+        metrics.inc('llm_retries', reason=reason)
+        return delay
+
+    def call(self, fn, deadline=None, admit=None):
+        if deadline is None:
+            deadline = self.new_deadline()
+        attempt = 0
+        while True:
+            self._check_breaker()
+            try:
+                if admit is not None:
+                    admit(deadline - self.clock())
+                timeout = self._attempt_timeout(deadline)
+            except BaseException:
+                self.breaker.release()
+                raise
+            attempt += 1
+            try:
+                result = fn(timeout)
+            except RETRYABLE_ERRORS as e:
+                self.sleep(self._after_failure(e, attempt, deadline))
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def acall(self, fn, deadline=None, admit=None):
+        """Async variant of call(); fn(timeout) returns an awaitable, which is also cut off at timeout"""
+        if deadline is None:
+            deadline = self.new_deadline()
+        attempt = 0
+        while True:
+            self._check_breaker()
+            try:
+                if admit is not None:
+                    await admit(deadline - self.clock())
+                timeout = self._attempt_timeout(deadline)
+            except BaseException:
+                self.breaker.release()
+                raise
+            attempt += 1
+            try:
+                try:
+                    result = await asyncio.wait_for(fn(timeout), timeout)
+                except asyncio.TimeoutError:
+                    raise AttemptTimeout(f"LLM call took longer than {timeout:.1f}s")
+            except RETRYABLE_ERRORS as e:
+                await asyncio.sleep(self._after_failure(e, attempt, deadline))
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result
+
+
+def build_resilient_caller():
+    """Create a ResilientCaller from the SUMMARIZER_LLM_* and SUMMARIZER_BREAKER_* settings"""
+    return ResilientCaller(
+        breaker=CircuitBreaker(
+            failure_threshold=settings.SUMMARIZER_BREAKER_FAILURES,
+            cooldown=settings.SUMMARIZER_BREAKER_COOLDOWN,
+        ),
+        max_attempts=settings.SUMMARIZER_LLM_MAX_ATTEMPTS,
+        attempt_timeout=settings.SUMMARIZER_LLM_ATTEMPT_TIMEOUT,
+        deadline=settings.SUMMARIZER_LLM_DEADLINE,
+        backoff_base=settings.SUMMARIZER_LLM_BACKOFF_BASE,
+        backoff_max=settings.SUMMARIZER_LLM_BACKOFF_MAX,
+    )
+
+
+def get_resilient_caller():
+    """Return the process-wide ResilientCaller (one breaker per worker), creating it on first use"""
+    global _caller
+    if _caller is None:
+        with _caller_lock:
+            if _caller is None:
+                _caller = build_resilient_caller()
+    return _caller
@@ -1,7 +1,22 @@
+from django.conf import settings
 from rest_framework import serializers
+from .jobs import validate_callback_url
 from .models import SummaryRequest, SummaryTemplate
+from .prompt_registry import get_prompt_registry
 
-class WebhookSerializer(serializers.Serializer):
+class BackgroundJobSerializer(serializers.Serializer):
+    """Whether to queue the request as a job, and where to send its result"""
+    background = serializers.BooleanField(required=False, default=False)
+    callback_url = serializers.URLField(required=False)
+
+    def validate_callback_url(self, value):
+        try:
+            validate_callback_url(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+class WebhookSerializer(BackgroundJobSerializer):
     message = serializers.CharField(required=True)
     user_id = serializers.CharField(required=True)
     conversation_id = serializers.CharField(required=True)
@@ -21,14 +36,39 @@ class SummaryTemplateSerializer(serializers.ModelSerializer):
 
 
 class SummaryOptionsSerializer(serializers.Serializer):
-    summary_type = serializers.ChoiceField(
-        choices=['general', 'meeting', 'news', 'technical', 'conversation', 'log'],
-        default='general'
-    )
+    # Built-in types plus the active SummaryTemplate names, checked against the prompt registry
+    summary_type = serializers.CharField(max_length=20, default='general')
     length = serializers.ChoiceField(
         choices=['short', 'medium', 'long'],
         default='medium'
     )
     include_bullet_points = serializers.BooleanField(default=True)
     include_key_points = serializers.BooleanField(default=True)
-    language = serializers.CharField(default='english')
\ No newline at end of file
+    language = serializers.CharField(default='english')
+    bypass_cache = serializers.BooleanField(default=False)
+    mode = serializers.ChoiceField(
+        choices=['auto', 'single', 'map_reduce'],
+        default='auto'
+    )
+
+    def validate_summary_type(self, value):
+        registry = get_prompt_registry()
+        if value not in registry:
+            raise serializers.ValidationError(f"Must be one of: {', '.join(registry.types())}.")
+        return value
+
+
+class BatchItemSerializer(serializers.Serializer):
+    text = serializers.CharField(required=True)
+    options = SummaryOptionsSerializer(required=False)
+
+
+class BatchSummarizeSerializer(serializers.Serializer):
+    items = serializers.ListField(
+        child=BatchItemSerializer(),
+        min_length=1,
+        max_length=settings.SUMMARIZER_BATCH_MAX_ITEMS
+    )
+    user_id = serializers.CharField(default='batch')
+    conversation_id = serializers.CharField(default='batch')
+    concurrency = serializers.IntegerField(required=False, min_value=1, max_value=settings.SUMMARIZER_BATCH_CONCURRENCY)
@@ -1,94 +1,755 @@
-import openai
 import logging
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from .models import SummaryRequest
-from .prompts import SUMMARY_PROMPTS, LENGTH_GUIDELINES
-from .utils import TextProcessor, ContentValidator
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import ConversationSummary, SummaryRequest
+from . import metrics
+from .cache import KEY_PREFIX, SummaryCache, get_summary_cache
+from .backends import OpenAIBackend, get_llm_backend
+from .extractive import ExtractiveSummarizer, split_sentences
+from .logdigest import DIGEST_VERSION
+from .neardup import get_near_duplicate_index, minhash_signature
+from .offload import clean_and_measure, get_offloader
+from .persistence import save_summary_request, asave_summary_request
+from .prompt_registry import BULLET_POINTS_INSTRUCTION, INCREMENTAL_SEGMENTS, get_prompt_registry, render_template
+from .ratelimit import TokenBudget, current_priority, get_rate_limiter, request_priority
+from .resilience import UNAVAILABLE_ERRORS, get_resilient_caller
+from .singleflight import CacheLock, flights, wait_for_result, await_result
+from .tokens import (
+    REPLY_PRIMING_TOKENS, TOKENS_PER_MESSAGE, TokenUsage, count_tokens, input_budget, max_output_tokens, trim_to_tokens
+)
+from .utils import TextProcessor, TextStats, TextChunker, ContentValidator
 
 logger = logging.getLogger(__name__)
 
+# Times a conversation summary update is recomputed when a concurrent update got there first
+CONVERSATION_UPDATE_ATTEMPTS = 3
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_summarizer_service():
+    """Return the process-wide SummarizerService, creating it on first use"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = SummarizerService()
+    return _service
+
+
+def summary_kwargs(options):
+    """Map summary options (as validated by SummaryOptionsSerializer, or Telex message options) onto generate_summary keyword arguments"""
+    return {
+        'summary_type': options.get('summary_type', 'general'),
+        'length': options.get('length', 'medium'),
+        'include_bullet_points': options.get('include_bullet_points', True),
+        'include_key_points': options.get('include_key_points', True),
+        'language': options.get('language', 'english'),
+        'use_cache': not options.get('bypass_cache', False),
+        'mode': options.get('mode', 'auto'),
+    }
+
+
 class SummarizerService:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        self._backend = None
         self.text_processor = TextProcessor()
         self.validator = ContentValidator()
     
-    def generate_summary(self, text, summary_type='general', length='medium', include_bullet_points=True, include_key_points=True, language='english'):
+    @property
+    def backend(self):
+        # Process-wide backend (SUMMARIZER_LLM_BACKEND) unless one was injected for this instance
+        return self._backend or get_llm_backend()
+    
+    @backend.setter
+    def backend(self, value):
+        self._backend = value
+    
+    @property
+    def client(self):
+        """OpenAI client used for sync calls (OpenAI backend only)"""
+        return self.backend.client
+    
+    @client.setter
+    def client(self, value):
+        self._backend = OpenAIBackend(client=value)
+    
+    def generate_summary(self, text, summary_type='general', length='medium', include_bullet_points=True, include_key_points=True, language='english', use_cache=True, mode='auto'):
         """Generate AI-powered summary"""
         
+        summary_type = self._normalize_summary_type(summary_type)
         try:
-            #check if openai key is configured
-            if not settings.OPENAI_API_KEY:
-                raise ValueError("OpenAI API key is not configured.")
-            # Validate input text
-            self.validator.validate_text_length(text)
-            
-            # Clean text
-            cleaned_text = self.text_processor.clean_text(text)
-            
-            # Get appropriate prompts
-            if summary_type not in SUMMARY_PROMPTS:
-                summary_type = 'general'
+            with metrics.span('total', summary_type=summary_type):
+                prepared = self._prepare(text, summary_type, length, include_bullet_points, include_key_points, language, use_cache, mode)
+                if prepared['cached_result'] is not None:
+                    result = prepared['cached_result']
+                elif not settings.SUMMARIZER_SINGLEFLIGHT:
+                    result = self._generate(prepared, length, include_bullet_points)
+                else:
+                    # Identical requests already in flight share one LLM call
+                    result, coalesced = flights.do(
+                        prepared['flight_key'], lambda: self._generate_once(prepared, length, include_bullet_points)
+                    )
+                    if coalesced:
+                        result = self._coalesced(result)
             
-            system_prompt = SUMMARY_PROMPTS[summary_type]['system']
-            user_prompt_template = SUMMARY_PROMPTS[summary_type]['user']
+            self._count_summary(result, summary_type)
+            return result
             
-            # Format user prompt
-            user_prompt = user_prompt_template.format(
-                text=cleaned_text,
-                length=length
-            )
+        except Exception as e:
+            metrics.inc('summary_errors', summary_type=summary_type, error=type(e).__name__)
+            logger.error(f"Error generating summary: {str(e)}")
+            raise
+    
+    async def agenerate_summary(self, text, summary_type='general', length='medium', include_bullet_points=True, include_key_points=True, language='english', use_cache=True, mode='auto'):
+        """Async variant of generate_summary for ASGI views"""
+        
+        summary_type = self._normalize_summary_type(summary_type)
+        try:
+            with metrics.span('total', summary_type=summary_type):
+                prepared = await self._aprepare(text, summary_type, length, include_bullet_points, include_key_points, language, use_cache, mode)
+                if prepared['cached_result'] is not None:
+                    result = prepared['cached_result']
+                elif not settings.SUMMARIZER_SINGLEFLIGHT:
+                    result = await self._agenerate(prepared, length, include_bullet_points)
+                else:
+                    result, coalesced = await flights.ado(
+                        prepared['flight_key'], lambda: self._agenerate_once(prepared, length, include_bullet_points)
+                    )
+                    if coalesced:
+                        result = self._coalesced(result)
             
-            # Add bullet points instruction if requested
-            if include_bullet_points:
-                user_prompt += "\nPlease use bullet points for better readability."
+            self._count_summary(result, summary_type)
+            return result
             
-            # Generate summary using OpenAI
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
+        except Exception as e:
+            metrics.inc('summary_errors', summary_type=summary_type, error=type(e).__name__)
+            logger.error(f"Error generating summary: {str(e)}")
+            raise
+    
+    def _generate(self, prepared, length, include_bullet_points):
+        """Call the LLM for a prepared request and build the result"""
+        try:
+            # One deadline covers every call and retry made for this request
+            deadline = get_resilient_caller().new_deadline()
+            with metrics.span('llm', summary_type=prepared['summary_type'], mode=prepared['mode'], template=prepared['template'].version):
+                if prepared['mode'] == 'map_reduce':
+                    summary, long_document_stats = self._map_reduce_summary(
+                        prepared['cleaned_text'], prepared['template'], length, include_bullet_points, prepared['usage'], deadline
+                    )
+                else:
+                    summary = self._complete(prepared['messages'], prepared['max_tokens'], prepared['usage'], deadline)
+                    long_document_stats = None
+        except UNAVAILABLE_ERRORS as e:
+            return self._fallback(prepared, length, e)
+        
+        return self._finish(prepared, summary, long_document_stats)
+    
+    async def _agenerate(self, prepared, length, include_bullet_points):
+        """Async variant of _generate"""
+        try:
+            deadline = get_resilient_caller().new_deadline()
+            with metrics.span('llm', summary_type=prepared['summary_type'], mode=prepared['mode'], template=prepared['template'].version):
+                if prepared['mode'] == 'map_reduce':
+                    # Chunk fan-out already runs on its own bounded thread pool
+                    summary, long_document_stats = await sync_to_async(self._map_reduce_summary, thread_sensitive=False)(
+                        prepared['cleaned_text'], prepared['template'], length, include_bullet_points, prepared['usage'], deadline
+                    )
+                else:
+                    summary = await self._acomplete(prepared['messages'], prepared['max_tokens'], prepared['usage'], deadline)
+                    long_document_stats = None
+        except UNAVAILABLE_ERRORS as e:
+            return await self._afallback(prepared, length, e)
+        
+        return await self._afinish(prepared, summary, long_document_stats)
+    
+    def _generate_once(self, prepared, length, include_bullet_points):
+        """_generate, unless another worker process is already producing the same summary"""
+        lock = self._flight_lock(prepared)
+        if lock is not None:
+            try:
+                acquired = lock.acquire()
+            except Exception as e:
+                logger.warning(f"Single-flight lock unavailable: {str(e)}")
+                lock = None
+            else:
+                if not acquired:
+                    result = wait_for_result(
+                        lock, lambda: get_summary_cache().peek(prepared['cache_key']), settings.SUMMARIZER_SINGLEFLIGHT_TIMEOUT
+                    )
+                    if result is not None:
+                        return self._coalesced(dict(result, cached=True))
+                    lock = None
+        
+        try:
+            return self._generate(prepared, length, include_bullet_points)
+        finally:
+            if lock is not None:
+                lock.release()
+    
+    async def _agenerate_once(self, prepared, length, include_bullet_points):
+        """Async variant of _generate_once"""
+        lock = self._flight_lock(prepared)
+        if lock is not None:
+            try:
+                acquired = await lock.aacquire()
+            except Exception as e:
+                logger.warning(f"Single-flight lock unavailable: {str(e)}")
+                lock = None
+            else:
+                if not acquired:
+                    cache = get_summary_cache()
+                    result = await await_result(
+                        lock, lambda: cache.apeek(prepared['cache_key']), settings.SUMMARIZER_SINGLEFLIGHT_TIMEOUT
+                    )
+                    if result is not None:
+                        return self._coalesced(dict(result, cached=True))
+                    lock = None
+        
+        try:
+            return await self._agenerate(prepared, length, include_bullet_points)
+        finally:
+            if lock is not None:
+                await lock.arelease()
+    
+    @staticmethod
+    def _flight_lock(prepared):
+        """Cross-process lock for a request, when the summary cache is shared between processes"""
+        if settings.SUMMARIZER_CACHE_BACKEND != 'django' or prepared['cache_key'] is None:
+            return None
+        return CacheLock(settings.SUMMARIZER_CACHE_ALIAS, prepared['flight_key'], settings.SUMMARIZER_SINGLEFLIGHT_TIMEOUT)
+    
+    @staticmethod
+    def _coalesced(result):
+        """Result shared from another request's LLM call; no tokens were spent on this one"""
+        return dict(result, coalesced=True, usage=TokenUsage().as_dict())
+    
+    @staticmethod
+    def _normalize_summary_type(summary_type):
+        """Unknown summary types get the general prompt"""
+        return summary_type if summary_type in get_prompt_registry() else 'general'
+    
+    @staticmethod
+    def _count_summary(result, summary_type):
+        """Count a finished summary by how it was produced, and the tokens it spent"""
+        if result.get('coalesced'):
+            outcome = 'coalesced'
+        elif result.get('cached'):
+            outcome = 'cached'
+        elif result.get('degraded'):
+            outcome = 'degraded'
+        else:
+            outcome = 'generated'
+        metrics.inc('summaries', summary_type=summary_type, outcome=outcome)
+        usage = result.get('usage') or {}
+        if usage.get('prompt_tokens'):
+            metrics.inc('summary_tokens', usage['prompt_tokens'], summary_type=summary_type, kind='prompt')
+        if usage.get('completion_tokens'):
+            metrics.inc('summary_tokens', usage['completion_tokens'], summary_type=summary_type, kind='completion')
+    
+    async def astream_summary(self, text, summary_type='general', length='medium', include_bullet_points=True, include_key_points=True, language='english', use_cache=True, mode='auto'):
+        """Stream a summary as ('delta', text) events followed by a single ('stats', payload) event"""
+        started = time.perf_counter()
+        ttft_ms = None
+        
+        summary_type = self._normalize_summary_type(summary_type)
+        try:
+            prepared = await self._aprepare(text, summary_type, length, include_bullet_points, include_key_points, language, use_cache, mode)
+            summary_type = prepared['summary_type']
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=500 if length == 'short' else 800 if length == 'medium' else 1200,
-                temperature=0.3  # Lower temperature for more consistent summaries
+            if prepared['cached_result'] is not None:
+                result = prepared['cached_result']
+                ttft_ms = self._elapsed_ms(started)
+                yield 'delta', result['summary']
+            elif prepared['mode'] == 'map_reduce':
+                # Only the final reduce produces user-visible text, so send it whole
+                try:
+                    # One deadline covers every call and retry made for this request
+                    summary, long_document_stats = await sync_to_async(self._map_reduce_summary, thread_sensitive=False)(
+                        prepared['cleaned_text'], prepared['template'], length, include_bullet_points, prepared['usage'],
+                        get_resilient_caller().new_deadline()
+                    )
+                except UNAVAILABLE_ERRORS as e:
+                    result = await self._afallback(prepared, length, e)
+                else:
+                    result = await self._afinish(prepared, summary, long_document_stats)
+                ttft_ms = self._elapsed_ms(started)
+                yield 'delta', result['summary']
+            else:
+                parts = []
+                try:
+                    async for chunk in self._astream_completion(prepared):
+                        if chunk.usage is not None:
+                            self._record_usage(chunk.usage, prepared['usage'])
+                        delta = chunk.text
+                        if delta:
+                            if ttft_ms is None:
+                                ttft_ms = self._elapsed_ms(started)
+                            parts.append(delta)
+                            yield 'delta', delta
+                except UNAVAILABLE_ERRORS as e:
+                    if parts:
+                        # Text already sent cannot be replaced by a fallback
+                        raise
+                    result = await self._afallback(prepared, length, e)
+                    ttft_ms = self._elapsed_ms(started)
+                    yield 'delta', result['summary']
+                else:
+                    result = await self._afinish(prepared, ''.join(parts).strip())
+        except Exception as e:
+            metrics.inc('summary_errors', summary_type=summary_type, error=type(e).__name__)
+            logger.error(f"Error streaming summary: {str(e)}")
+            raise
+        
+        total_ms = self._elapsed_ms(started)
+        metrics.observe('stream_ttft_ms', ttft_ms if ttft_ms is not None else total_ms, summary_type=summary_type)
+        metrics.observe('stream_total_ms', total_ms, summary_type=summary_type)
+        self._count_summary(result, summary_type)
+        
+        stats = {key: value for key, value in result.items() if key != 'summary'}
+        stats['statistics'] = self._format_statistics(result)
+        stats['ttft_ms'] = ttft_ms
+        stats['total_ms'] = total_ms
+        yield 'stats', stats
+    
+    async def _astream_completion(self, prepared):
+        """Stream one completion; retries, deadlines and the circuit breaker apply until the first chunk"""
+        stream = None
+        
+        async def first_chunk(timeout):
+            nonlocal stream
+            stream = self.backend.astream(prepared['messages'], prepared['max_tokens'], timeout=timeout)
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return None
+        
+        chunk = await get_resilient_caller().acall(
+            first_chunk, admit=self._admission(prepared['messages'], prepared['max_tokens'], asynchronous=True)
+        )
+        if chunk is None:
+            return
+        yield chunk
+        async for chunk in stream:
+            yield chunk
+    
+    def _prepare(self, text, summary_type, length, include_bullet_points, include_key_points, language, use_cache, mode):
+        """Validate and clean the input, resolve options and look up the cache"""
+        prepared, budget = self._prepare_input(text, summary_type, length, include_bullet_points, include_key_points, language, use_cache, mode)
+        if prepared['cache_key'] is not None:
+            with metrics.span('cache_lookup', summary_type=prepared['summary_type']):
+                self._use_cached(prepared, get_summary_cache().get(prepared['cache_key']))
+            if prepared['cached_result'] is not None:
+                return prepared
+        
+        near_duplicate = self._prepare_prompt(prepared, length, include_bullet_points, budget, use_cache)
+        if near_duplicate is not None:
+            summary, near_duplicate = near_duplicate
+            prepared['cached_result'] = dict(self._finish(prepared, summary, near_duplicate=near_duplicate), cached=True)
+        return prepared
+    
+    async def _aprepare(self, text, summary_type, length, include_bullet_points, include_key_points, language, use_cache, mode):
+        """Async variant of _prepare: cache I/O is awaited, and a worker process handles a large input"""
+        args = (text, summary_type, length, include_bullet_points, include_key_points, language, use_cache, mode)
+        if get_offloader().wants(text):
+            prepared, budget = await sync_to_async(self._prepare_input, thread_sensitive=False)(*args)
+        else:
+            prepared, budget = self._prepare_input(*args)
+        if prepared['cache_key'] is not None:
+            with metrics.span('cache_lookup', summary_type=prepared['summary_type']):
+                self._use_cached(prepared, await get_summary_cache().aget(prepared['cache_key']))
+            if prepared['cached_result'] is not None:
+                return prepared
+        
+        near_duplicate = self._prepare_prompt(prepared, length, include_bullet_points, budget, use_cache)
+        if near_duplicate is not None:
+            summary, near_duplicate = near_duplicate
+            prepared['cached_result'] = dict(await self._afinish(prepared, summary, near_duplicate=near_duplicate), cached=True)
+        return prepared
+    
+    def _prepare_input(self, text, summary_type, length, include_bullet_points, include_key_points, language, use_cache, mode):
+        """Clean, validate and size the input and derive its cache keys; returns (prepared, input token budget)"""
+        #check if openai key is configured
+        if not self.backend.configured:
+            raise ValueError("OpenAI API key is not configured.")
+        # Get appropriate prompts
+        summary_type = self._normalize_summary_type(summary_type)
+        template = get_prompt_registry().get(summary_type)
+        
+        # Logs are summarized from a digest of their templates rather than line by line
+        log_digest = None
+        if summary_type == 'log' and settings.SUMMARIZER_LOG_DIGEST:
+            log_digest = {
+                'min_lines': settings.SUMMARIZER_LOG_DIGEST_MIN_LINES,
+                'max_templates': settings.SUMMARIZER_LOG_DIGEST_MAX_TEMPLATES,
+            }
+        
+        # Clean text and count its words (in a worker process for very large inputs); the statistics are reused for the result
+        with metrics.span('clean', summary_type=summary_type):
+            cleaned_text, stats, digest = clean_and_measure(text, log_digest)
+        
+        # Validate the cleaned text
+        with metrics.span('validate', summary_type=summary_type):
+            self.validator.validate_text_length(cleaned_text, stats=stats)
+        
+        # The digest stands in for the text from here on; statistics and the cache key stay those of the text
+        source_text = cleaned_text
+        if digest is not None:
+            source_text, digest_stats = digest
+            metrics.inc('log_digests')
+            metrics.inc('log_digest_lines', digest_stats['lines'])
+        
+        # Long documents, and anything that would not fit the context window, are summarized chunk by chunk
+        with metrics.span('count_tokens', summary_type=summary_type):
+            input_tokens = count_tokens(source_text)
+            budget = input_budget(template, length, include_bullet_points)
+        if mode not in ('single', 'map_reduce'):
+            long_document = input_tokens > min(settings.SUMMARIZER_LONG_DOCUMENT_TOKENS, budget)
+            mode = 'map_reduce' if long_document else 'single'
+        
+        prepared = {
+            'cleaned_text': source_text,
+            'stats': stats,
+            'summary_type': summary_type,
+            'template': template,
+            'mode': mode,
+            'include_bullet_points': include_bullet_points,
+            'include_key_points': include_key_points,
+            'messages': None,
+            'flight_key': None,
+            'cache_key': None,
+            'cached_result': None,
+            'input_tokens': input_tokens,
+            'max_tokens': max_output_tokens(length, min(input_tokens, budget)),
+            'truncated': False,
+            'log_digest': digest_stats if digest is not None else None,
+            'signature': None,
+            'options_key': None,
+            'usage': TokenUsage(),
+        }
+        
+        # Identical content with identical options gets the same summary
+        options = {
+            'summary_type': summary_type,
+            'length': length,
+            'include_bullet_points': bool(include_bullet_points),
+            'include_key_points': bool(include_key_points),
+            'language': language,
+            'mode': mode,
+            'model': self.backend.model,
+            'prompt_version': template.version,
+        }
+        if digest is not None:
+            options['log_digest'] = [DIGEST_VERSION, log_digest['max_templates']]
+        prepared['flight_key'] = SummaryCache.digest(cleaned_text, **options)
+        prepared['options_key'] = SummaryCache.digest('', **options)
+        cache = get_summary_cache()
+        if cache is not None:
+            if use_cache:
+                prepared['cache_key'] = KEY_PREFIX + prepared['flight_key']
+            else:
+                cache.record_bypass()
+                metrics.inc('summary_cache_lookups', summary_type=summary_type, result='bypass')
+        return prepared, budget
+    
+    @staticmethod
+    def _use_cached(prepared, cached_result):
+        """Count a summary cache lookup; a hit becomes the prepared request's result"""
+        metrics.inc('summary_cache_lookups', summary_type=prepared['summary_type'], result='miss' if cached_result is None else 'hit')
+        if cached_result is not None:
+            # Nothing was spent on this request
+            prepared['cached_result'] = dict(cached_result, cached=True, usage=TokenUsage().as_dict())
+    
+    def _prepare_prompt(self, prepared, length, include_bullet_points, budget, use_cache):
+        """Look for a near-duplicate and build the prompt; returns (summary, near_duplicate) of a match, else None"""
+        summary_type = prepared['summary_type']
+        source_text = prepared['cleaned_text']
+        input_tokens = prepared['input_tokens']
+        
+        # Nearly identical text (another tracking footer, a fixed typo) with identical options reuses that summary
+        index = get_near_duplicate_index() if use_cache else None
+        if index is not None:
+            with metrics.span('near_duplicate', summary_type=summary_type):
+                signature = minhash_signature(
+                    source_text, settings.SUMMARIZER_NEAR_DUPLICATE_MIN_WORDS, settings.SUMMARIZER_NEAR_DUPLICATE_MAX_WORDS
+                )
+                match = index.lookup(prepared['options_key'], signature) if signature is not None else None
+            if signature is not None:
+                metrics.inc('near_duplicate_lookups', summary_type=summary_type, result='miss' if match is None else 'hit')
+            if match is not None:
+                entry, score = match
+                return entry.summary, {'similarity': round(score, 4), 'source': entry.source_key}
+            prepared['signature'] = signature
+        
+        if prepared['mode'] == 'single':
+            with metrics.span('prompt', summary_type=summary_type):
+                prompt_text = source_text
+                if input_tokens > budget:
+                    # Forced single call: keep what fits instead of failing after a round trip
+                    logger.warning(f"Trimming {input_tokens}-token input to the {budget}-token context budget")
+                    prompt_text = trim_to_tokens(source_text, budget)
+                    prepared['truncated'] = True
+                prepared['messages'] = self._build_messages(prompt_text, prepared['template'], length, include_bullet_points)
+        return None
+    
+    def _fallback(self, prepared, length, error):
+        """Answer with an extractive summary when the LLM is unavailable"""
+        return self._finish(prepared, self._fallback_summary(prepared, length, error), degraded=True)
+    
+    async def _afallback(self, prepared, length, error):
+        """Async variant of _fallback"""
+        return await self._afinish(prepared, self._fallback_summary(prepared, length, error), degraded=True)
+    
+    @staticmethod
+    def _fallback_summary(prepared, length, error):
+        if not settings.SUMMARIZER_EXTRACTIVE_FALLBACK:
+            raise error
+        logger.warning(f"LLM unavailable, using extractive fallback: {str(error)}")
+        
+        with metrics.span('fallback', summary_type=prepared['summary_type']):
+            return QuickSummarizer.extractive_summary(
+                prepared['cleaned_text'], length, prepared['include_bullet_points']
             )
-            
-            summary = response.choices[0].message.content.strip()
-            
-            # Calculate metrics
-            word_count_original = len(cleaned_text.split())
-            word_count_summary = len(summary.split())
-            compression_ratio = self.text_processor.calculate_compression_ratio(cleaned_text, summary)
-            
+    
+    def _finish(self, prepared, summary, long_document_stats=None, degraded=False, near_duplicate=None):
+        """Compute statistics for a generated summary and store it in the cache"""
+        result = self._result(prepared, summary, long_document_stats, degraded, near_duplicate)
+        if not degraded:
+            if prepared['cache_key'] is not None:
+                with metrics.span('cache_store', summary_type=prepared['summary_type']):
+                    get_summary_cache().set(prepared['cache_key'], result)
+            self._remember_near_duplicate(prepared, summary)
+        return dict(result, cached=False)
+    
+    async def _afinish(self, prepared, summary, long_document_stats=None, degraded=False, near_duplicate=None):
+        """Async variant of _finish; the cache store is awaited"""
+        result = self._result(prepared, summary, long_document_stats, degraded, near_duplicate)
+        if not degraded:
+            if prepared['cache_key'] is not None:
+                with metrics.span('cache_store', summary_type=prepared['summary_type']):
+                    await get_summary_cache().aset(prepared['cache_key'], result)
+            self._remember_near_duplicate(prepared, summary)
+        return dict(result, cached=False)
+    
+    @staticmethod
+    def _remember_near_duplicate(prepared, summary):
+        # Only indexes in memory here; the row is written on the index's own thread
+        if prepared['signature'] is not None:
+            get_near_duplicate_index().remember(
+                prepared['flight_key'], prepared['options_key'], prepared['signature'], summary
+            )
+    
+    @staticmethod
+    def _result(prepared, summary, long_document_stats=None, degraded=False, near_duplicate=None):
+        """Result of a summary with its statistics; degraded (fallback) results are marked as such"""
+        original_stats = prepared['stats']
+        
+        # Calculate metrics
+        with metrics.span('statistics', summary_type=prepared['summary_type']):
+            summary_stats = TextStats(summary)
             result = {
                 'summary': summary,
-                'word_count_original': word_count_original,
-                'word_count_summary': word_count_summary,
-                'compression_ratio': compression_ratio,
-                'reading_time_original': self.text_processor.estimate_reading_time(cleaned_text),
-                'reading_time_summary': self.text_processor.estimate_reading_time(summary),
-                'key_phrases': self.text_processor.extract_key_phrases(cleaned_text)
+                'word_count_original': original_stats.word_count,
+                'word_count_summary': summary_stats.word_count,
+                'compression_ratio': original_stats.compression_ratio(summary_stats),
+                'reading_time_original': original_stats.reading_time(),
+                'reading_time_summary': summary_stats.reading_time(),
+                'key_phrases': original_stats.key_phrases(),
+                'mode': prepared['mode'],
+                'input_tokens': prepared['input_tokens'],
+                'usage': prepared['usage'].as_dict()
             }
-            
-            # Add bullet points flag to result
-            if include_bullet_points:
-                result['format'] = 'bullet_points'
-            if include_key_points:
-                result['key_points_included'] = True
-                
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error generating summary: {str(e)}")
-            raise
+        if prepared['truncated']:
+            result['truncated'] = True
+        if prepared['log_digest']:
+            result['log_digest'] = prepared['log_digest']
+        if near_duplicate:
+            result['near_duplicate'] = near_duplicate
+        if long_document_stats:
+            result.update(long_document_stats)
+        
+        # Add bullet points flag to result
+        if prepared['include_bullet_points']:
+            result['format'] = 'bullet_points'
+        if prepared['include_key_points']:
+            result['key_points_included'] = True
+        
+        if degraded:
+            # Never cached; the next request should try the LLM again
+            result['degraded'] = True
+            result['engine'] = 'extractive'
+        return result
+    
+    def _build_messages(self, text, template, length, include_bullet_points):
+        """Build the chat messages for one summarization call"""
+        # The text is copied into the prompt once, together with the bullet points instruction if requested
+        return template.messages(text, length, include_bullet_points)
+    
+    def _complete(self, messages, max_tokens, usage=None, deadline=None):
+        """Run one chat completion (with retries, until deadline) and return the stripped text"""
+        # Lower temperature for more consistent summaries
+        completion = get_resilient_caller().call(
+            lambda timeout: self.backend.complete(messages, max_tokens, temperature=0.3, timeout=timeout), deadline,
+            admit=self._admission(messages, max_tokens)
+        )
+        return self._completion_text(completion, usage)
+    
+    async def _acomplete(self, messages, max_tokens, usage=None, deadline=None):
+        """Async variant of _complete"""
+        completion = await get_resilient_caller().acall(
+            lambda timeout: self.backend.acomplete(messages, max_tokens, temperature=0.3, timeout=timeout), deadline,
+            admit=self._admission(messages, max_tokens, asynchronous=True)
+        )
+        return self._completion_text(completion, usage)
+    
+    @staticmethod
+    def _admission(messages, max_tokens, asynchronous=False):
+        """Wait for capacity under the shared OpenAI rate limits, or None when no limit is set"""
+        limiter = get_rate_limiter()
+        if not limiter.enabled:
+            return None
+        # Providers charge max_tokens against the per-minute quota up front
+        tokens = (
+            sum(count_tokens(message['content']) + TOKENS_PER_MESSAGE for message in messages)
+            + REPLY_PRIMING_TOKENS + max_tokens
+        )
+        if asynchronous:
+            return lambda max_wait: limiter.aacquire(tokens, max_wait=max_wait)
+        return lambda max_wait: limiter.acquire(tokens, max_wait=max_wait)
+    
+    def _completion_text(self, completion, usage):
+        """Record token usage of a completion and return its stripped text"""
+        self._record_usage(completion.usage, usage)
+        if completion.finish_reason == 'length':
+            logger.warning("Summary hit the max_tokens limit and was cut off")
+            metrics.inc('llm_completions_truncated', model=self.backend.model)
+        return completion.text.strip()
+    
+    def _record_usage(self, reported, usage):
+        """Add API-reported usage to the request's tally and the process metrics"""
+        if usage is not None:
+            usage.add(reported)
+        if reported is not None:
+            metrics.inc('llm_prompt_tokens', reported.prompt_tokens or 0, model=self.backend.model)
+            metrics.inc('llm_completion_tokens', reported.completion_tokens or 0, model=self.backend.model)
+    
+    def _map_reduce_summary(self, cleaned_text, template, length, include_bullet_points, usage=None, deadline=None):
+        """Summarize each chunk concurrently, then reduce the partial summaries"""
+        timings = {}
+        started = time.perf_counter()
+        
+        # Chunks must also fit the model's context next to the map prompt
+        chunker = TextChunker(
+            max_tokens=min(settings.SUMMARIZER_CHUNK_TOKENS, input_budget(template, 'short', False)),
+            overlap_tokens=settings.SUMMARIZER_CHUNK_OVERLAP_TOKENS
+        )
+        chunks = chunker.split(cleaned_text)
+        timings['chunking_ms'] = self._elapsed_ms(started)
+        
+        # Map: one short summary per chunk
+        stage_started = time.perf_counter()
+        partials = self._summarize_parts(chunks, template, 'short', usage, deadline)
+        timings['map_ms'] = self._elapsed_ms(stage_started)
+        
+        # Reduce: merge partial summaries until they fit in a single call
+        stage_started = time.perf_counter()
+        depth = 1
+        combined = '\n\n'.join(partials)
+        combined_tokens = count_tokens(combined)
+        while combined_tokens > chunker.max_tokens and depth < settings.SUMMARIZER_MAX_REDUCE_DEPTH:
+            partials = self._summarize_parts(chunker.split(combined), template, 'short', usage, deadline)
+            combined = '\n\n'.join(partials)
+            combined_tokens = count_tokens(combined)
+            depth += 1
+        
+        if combined_tokens > chunker.max_tokens:
+            logger.warning(f"Reduce depth limit reached; truncating {len(partials)} partial summaries")
+            combined = trim_to_tokens(combined, chunker.max_tokens)
+            combined_tokens = count_tokens(combined)
+        
+        messages = self._build_messages(combined, template, length, include_bullet_points)
+        summary = self._complete(messages, max_output_tokens(length, combined_tokens), usage, deadline)
+        timings['reduce_ms'] = self._elapsed_ms(stage_started)
+        timings['total_ms'] = self._elapsed_ms(started)
+        
+        return summary, {
+            'chunks': len(chunks),
+            'reduce_depth': depth,
+            'timings': timings
+        }
+    
+    def _summarize_parts(self, parts, template, length, usage=None, deadline=None):
+        """Summarize several pieces of text concurrently with a bounded pool"""
+        # Pool threads do not inherit the caller's context
+        priority = current_priority()
+        
+        def summarize(part):
+            messages = self._build_messages(part, template, length, False)
+            with request_priority(priority):
+                return self._complete(messages, max_output_tokens(length, count_tokens(part)), usage, deadline)
+        
+        workers = max(1, min(settings.SUMMARIZER_MAP_CONCURRENCY, len(parts)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(summarize, parts))
+    
+    @staticmethod
+    def _elapsed_ms(started):
+        return round((time.perf_counter() - started) * 1000, 2)
     
     def process_telex_message(self, message, user_id, conversation_id, options=None):
         """Process message from Telex.im and generate summary"""
         
+        try:
+            return self.summarize_telex_message(message, user_id, conversation_id, options)
+            
+        except ValueError as e:
+            return f"{str(e)} Please provide longer text for summarization."
+        except Exception as e:
+            logger.error(f"Error processing telex message: {str(e)}")
+            return "I apologize, but I'm having trouble generating a summary right now. Please try again."
+    
+    def summarize_telex_message(self, message, user_id, conversation_id, options=None, request_id=None):
+        """Summarize a Telex.im message, save it and return the reply; errors propagate to the caller"""
+        
+        if options is None:
+            options = {}
+        
+        summary_type = options.get('summary_type', 'general')
+        length = options.get('length', 'medium')
+        
+        clean_message = self._strip_command_prefix(message)
+        
+        if options.get('incremental'):
+            result = self.summarize_conversation(clean_message, user_id, conversation_id, options, request_id)
+            return self._format_telex_response(result, summary_type, length)
+        
+        # Generate summary
+        result = self.generate_summary(clean_message, **summary_kwargs(options))
+        
+        # Save to database (optional)
+        fields = self._summary_request_fields(result, clean_message, user_id, conversation_id, summary_type, length)
+        with metrics.span('db_insert', summary_type=self._normalize_summary_type(summary_type)):
+            if request_id is None:
+                save_summary_request(fields)
+            else:
+                # Background jobs may be retried after the row was written
+                fields.pop('request_id')
+                SummaryRequest.objects.update_or_create(request_id=request_id, defaults=fields)
+        
+        # Format response for Telex.im
+        return self._format_telex_response(result, summary_type, length)
+    
+    async def aprocess_telex_message(self, message, user_id, conversation_id, options=None):
+        """Async variant of process_telex_message for ASGI views"""
+        
         if options is None:
             options = {}
         
@@ -96,42 +757,293 @@ class SummarizerService:
         length = options.get('length', 'medium')
         
         try:
-            # Remove "summarizing..." prefix if present
-            clean_message = message
-            if message.startswith(('meeting:', 'news:', 'tech:', 'conv:', 'log:')):
-                # Extract the actual content after the prefix
-                parts = message.split(':', 1)
-                if len(parts) > 1:
-                    clean_message = parts[1].strip()
+            if options.get('incremental'):
+                # The conversation state is read and written through the ORM around the LLM call
+                return await sync_to_async(self.summarize_telex_message, thread_sensitive=False)(
+                    message, user_id, conversation_id, options
+                )
             
-            # Generate summary
-            result = self.generate_summary(clean_message, summary_type, length, options)
+            clean_message = self._strip_command_prefix(message)
             
-            # Save to database (optional)
-            request_id = str(uuid.uuid4())
-            summary_request = SummaryRequest.objects.create(
-                request_id=request_id,
-                user_id=user_id,
-                conversation_id=conversation_id,
-                original_text=clean_message[:10000],
-                summary_type=summary_type,
-                summary_length=length,
-                summary=result['summary'],
-                word_count_original=result['word_count_original'],
-                word_count_summary=result['word_count_summary'],
-                compression_ratio=result['compression_ratio']
-            )
+            result = await self.agenerate_summary(clean_message, **summary_kwargs(options))
             
-            # Format response for Telex.im
-            response_message = self._format_telex_response(result, summary_type, length)
+            with metrics.span('db_insert', summary_type=self._normalize_summary_type(summary_type)):
+                await asave_summary_request(
+                    self._summary_request_fields(result, clean_message, user_id, conversation_id, summary_type, length)
+                )
             
-            return response_message
+            return self._format_telex_response(result, summary_type, length)
             
         except ValueError as e:
             return f"{str(e)} Please provide longer text for summarization."
         except Exception as e:
             logger.error(f"Error processing telex message: {str(e)}")
             return "I apologize, but I'm having trouble generating a summary right now. Please try again."
+    
+    def summarize_batch(self, items, user_id='batch', conversation_id='batch', concurrency=None, tokens_per_minute=None):
+        """Summarize many texts concurrently; returns per-item results in input order"""
+        
+        if concurrency is None:
+            concurrency = settings.SUMMARIZER_BATCH_CONCURRENCY
+        if tokens_per_minute is None:
+            tokens_per_minute = settings.SUMMARIZER_BATCH_TOKENS_PER_MINUTE
+        budget = TokenBudget(tokens_per_minute)
+        
+        # Identical text with identical options is only summarized once
+        unique = {}
+        item_keys = []
+        for item in items:
+            kwargs = summary_kwargs(item.get('options') or {})
+            key = (item['text'], tuple(sorted(kwargs.items())))
+            unique.setdefault(key, (item['text'], kwargs))
+            item_keys.append(key)
+        
+        def summarize(text, kwargs):
+            budget.acquire(count_tokens(text) + max_output_tokens(kwargs['length']))
+            try:
+                # Batch calls yield shared rate-limit capacity to interactive requests
+                with request_priority('batch'):
+                    return {'status': 'success', 'summary': self.generate_summary(text, **kwargs)}
+            except Exception as e:
+                return {'status': 'error', 'error': str(e)}
+        
+        workers = max(1, min(concurrency, len(unique)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {key: pool.submit(summarize, text, kwargs) for key, (text, kwargs) in unique.items()}
+            outcomes = {key: future.result() for key, future in futures.items()}
+        
+        results = []
+        rows = []
+        for index, key in enumerate(item_keys):
+            outcome = dict(outcomes[key], index=index)
+            if outcome['status'] == 'success':
+                text, kwargs = unique[key]
+                fields = self._summary_request_fields(
+                    outcome['summary'], text, user_id, conversation_id, kwargs['summary_type'], kwargs['length']
+                )
+                outcome['request_id'] = fields['request_id']
+                rows.append(SummaryRequest(**fields))
+            results.append(outcome)
+        
+        # One INSERT for the whole batch
+        SummaryRequest.objects.bulk_create(rows)
+        
+        return {
+            'results': results,
+            'total': len(items),
+            'unique': len(unique),
+            'succeeded': len(rows),
+            'failed': len(items) - len(rows),
+        }
+    
+    def summarize_conversation(self, message, user_id, conversation_id, options=None, request_id=None):
+        """Fold a message into its conversation's rolling summary; only messages since the watermark reach the LLM"""
+        
+        if options is None:
+            options = {}
+        kwargs = summary_kwargs(options)
+        summary_type = self._normalize_summary_type(kwargs['summary_type'])
+        length = kwargs['length']
+        
+        # Recorded first, so that its pk can become the watermark once the summary covers it
+        row = self._record_conversation_message(message, user_id, conversation_id, kwargs['summary_type'], length, request_id)
+        
+        for attempt in range(1, CONVERSATION_UPDATE_ATTEMPTS + 1):
+            state = ConversationSummary.objects.filter(conversation_id=conversation_id).first()
+            if state is not None and state.watermark >= row.pk:
+                # A concurrent update already folded this message in
+                prepared = self._prepare_incremental(state.summary, message, summary_type, length, kwargs)
+                prepared['stats'] = prepared['stats'].covering(state.word_count)
+                result = self._coalesced(self._finish(prepared, state.summary))
+                self._count_summary(result, summary_type)
+                break
+            
+            messages = self._conversation_messages(conversation_id, state.watermark if state else 0, row, message)
+            history = '\n\n'.join(messages)
+            if state is None and len(history.split()) >= ContentValidator.MIN_WORDS:
+                # First summary of this conversation: its stored history goes through the regular path
+                result = self.generate_summary(history, **kwargs)
+            else:
+                # So does a first message too short for the regular path, folded into an empty summary
+                result = self._update_conversation_summary(
+                    state.summary if state else '', state.word_count if state else 0, history, summary_type, length, kwargs
+                )
+            
+            # A degraded summary is not kept; the next update retries these messages with the LLM
+            if result.get('degraded') or self._save_conversation_state(state, result, row, user_id, conversation_id, kwargs['summary_type'], length, len(messages)):
+                break
+            metrics.inc('conversation_update_conflicts')
+            logger.info(f"Conversation {conversation_id} was updated concurrently (attempt {attempt}/{CONVERSATION_UPDATE_ATTEMPTS})")
+        else:
+            # Still recorded: the next update of the conversation picks this message up
+            logger.warning(f"Gave up updating the summary of conversation {conversation_id}")
+        
+        fields = self._summary_request_fields(result, message, user_id, conversation_id, kwargs['summary_type'], length)
+        for name in ('request_id', 'original_text', 'original_text_compressed', 'original_text_hash'):
+            fields.pop(name)
+        SummaryRequest.objects.filter(pk=row.pk).update(**fields)
+        
+        return dict(result, incremental=True)
+    
+    def _record_conversation_message(self, message, user_id, conversation_id, summary_type, length, request_id=None):
+        """Store the message as a SummaryRequest row now; its summary fields are filled in afterwards"""
+        placeholder = {'summary': '', 'word_count_original': 0, 'word_count_summary': 0, 'compression_ratio': 0.0}
+        fields = self._summary_request_fields(placeholder, message, user_id, conversation_id, summary_type, length)
+        if request_id is None:
+            return SummaryRequest.objects.create(**fields)
+        # A retried job reuses the row of its earlier attempt, and with it its place in the conversation
+        fields.pop('request_id')
+        return SummaryRequest.objects.get_or_create(request_id=request_id, defaults=fields)[0]
+    
+    @staticmethod
+    def _conversation_messages(conversation_id, watermark, row, message):
+        """Texts of the conversation's messages after watermark, up to and including row, oldest first"""
+        rows = SummaryRequest.objects.filter(
+            conversation_id=conversation_id, pk__gt=watermark, pk__lte=row.pk
+        ).order_by('-pk')[:settings.SUMMARIZER_CONVERSATION_HISTORY_LIMIT]
+        messages = []
+        for earlier in reversed(rows):
+            # Rows stored hash-only have no text left to summarize
+            text = message if earlier.pk == row.pk else earlier.get_original_text()
+            if text:
+                messages.append(f"{earlier.user_id}: {text}")
+        return messages
+    
+    def _update_conversation_summary(self, previous_summary, earlier_words, new_text, summary_type, length, kwargs):
+        """Ask the LLM to fold new_text into the stored summary, which covers earlier_words words"""
+        try:
+            with metrics.span('total', summary_type=summary_type):
+                prepared = self._prepare_incremental(previous_summary, new_text, summary_type, length, kwargs, earlier_words)
+                result = self._generate(prepared, length, kwargs['include_bullet_points'])
+            
+            self._count_summary(result, summary_type)
+            return result
+            
+        except Exception as e:
+            metrics.inc('summary_errors', summary_type=summary_type, error=type(e).__name__)
+            logger.error(f"Error updating conversation summary: {str(e)}")
+            raise
+    
+    def _prepare_incremental(self, previous_summary, new_text, summary_type, length, kwargs, earlier_words=0):
+        """Like _prepare, for a call that folds new_text into previous_summary (of earlier_words words); never cached"""
+        if not self.backend.configured:
+            raise ValueError("OpenAI API key is not configured.")
+        template = get_prompt_registry().get(summary_type)
+        
+        with metrics.span('clean', summary_type=summary_type):
+            cleaned_text, stats, _ = clean_and_measure(new_text)
+        
+        # Any non-empty message can extend a conversation, however short
+        with metrics.span('validate', summary_type=summary_type):
+            if not stats.word_count:
+                raise ValueError("No new text to add to the conversation summary.")
+            # The updated summary stands for the whole conversation, so it is measured against all of it
+            stats = stats.covering(earlier_words + stats.word_count)
+        
+        with metrics.span('count_tokens', summary_type=summary_type):
+            input_tokens = count_tokens(cleaned_text)
+            budget = input_budget(template, length, kwargs['include_bullet_points']) - count_tokens(previous_summary)
+        
+        prepared = {
+            'cleaned_text': cleaned_text,
+            'stats': stats,
+            'summary_type': summary_type,
+            'template': template,
+            'mode': 'incremental',
+            'include_bullet_points': kwargs['include_bullet_points'],
+            'include_key_points': kwargs['include_key_points'],
+            'messages': None,
+            'flight_key': None,
+            'cache_key': None,
+            'cached_result': None,
+            'input_tokens': input_tokens,
+            'max_tokens': max_output_tokens(length),
+            'truncated': False,
+            'log_digest': None,
+            'signature': None,
+            'options_key': None,
+            'usage': TokenUsage(),
+        }
+        
+        prompt_text = cleaned_text
+        if input_tokens > budget:
+            # Too much new text to send next to the summary: condense it first (that call reports its own usage)
+            logger.warning(f"Condensing {input_tokens} tokens of new messages before updating the summary")
+            prompt_text = self.generate_summary(
+                cleaned_text, summary_type, 'long', include_bullet_points=False, include_key_points=False, language=kwargs['language']
+            )['summary']
+        
+        with metrics.span('prompt', summary_type=summary_type):
+            user_prompt = render_template(
+                INCREMENTAL_SEGMENTS, BULLET_POINTS_INSTRUCTION if kwargs['include_bullet_points'] else '',
+                summary=previous_summary or '(none yet)', text=prompt_text, length=length
+            )
+            prepared['messages'] = [
+                {"role": "system", "content": template.system},
+                {"role": "user", "content": user_prompt}
+            ]
+        return prepared
+    
+    @staticmethod
+    def _save_conversation_state(state, result, row, user_id, conversation_id, summary_type, length, added):
+        """Store the new rolling summary with row as its watermark; False if another update won the race"""
+        if state is None:
+            try:
+                with transaction.atomic():
+                    ConversationSummary.objects.create(
+                        conversation_id=conversation_id,
+                        user_id=user_id,
+                        summary_type=summary_type,
+                        summary_length=length,
+                        summary=result['summary'],
+                        watermark=row.pk,
+                        message_count=added,
+                        word_count=result['word_count_original'],
+                    )
+            except IntegrityError:
+                return False
+            return True
+        
+        # Compare-and-set on version, so no lock is held across the LLM call
+        return bool(ConversationSummary.objects.filter(pk=state.pk, version=state.version).update(
+            user_id=user_id,
+            summary_type=summary_type,
+            summary_length=length,
+            summary=result['summary'],
+            watermark=row.pk,
+            message_count=F('message_count') + added,
+            word_count=result['word_count_original'],
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+        ))
+    
+    @staticmethod
+    def _strip_command_prefix(message):
+        """Remove a "meeting:"/"news:"/... prefix if present"""
+        if message.startswith(('meeting:', 'news:', 'tech:', 'conv:', 'log:')):
+            # Extract the actual content after the prefix
+            parts = message.split(':', 1)
+            if len(parts) > 1:
+                return parts[1].strip()
+        return message
+    
+    @staticmethod
+    def _summary_request_fields(result, clean_message, user_id, conversation_id, summary_type, length):
+        """Fields for the SummaryRequest row recording one summary"""
+        return {
+            'request_id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'conversation_id': conversation_id,
+            **SummaryRequest.original_text_fields(clean_message[:10000]),
+            'summary_type': summary_type,
+            'summary_length': length,
+            'summary': result['summary'],
+            'word_count_original': result['word_count_original'],
+            'word_count_summary': result['word_count_summary'],
+            'compression_ratio': result['compression_ratio'],
+            'prompt_tokens': result.get('usage', {}).get('prompt_tokens'),
+            'completion_tokens': result.get('usage', {}).get('completion_tokens'),
+        }
                 
     def _format_telex_response(self, result, summary_type, length):
         """Format the summary response for Telex.im"""
@@ -143,21 +1055,28 @@ class SummarizerService:
 
     {result['summary']}
 
----
+{self._format_statistics(result)}
+"""
+        
+        return response.strip()
+    
+    @staticmethod
+    def _format_statistics(result):
+        """Statistics block shown under every summary"""
+        return f"""---
 *Statistics:*
 • Original: {result['word_count_original']} words
 • Summary: {result['word_count_summary']} words  
 • Compression: {result['compression_ratio']}% reduced
 • Reading time saved: {result['reading_time_original'] - result['reading_time_summary']} minutes
 
-*Key phrases:* {', '.join(result['key_phrases'][:3])}
-"""
-        
-        return response.strip()
+*Key phrases:* {', '.join(result['key_phrases'][:3])}"""
     
 class QuickSummarizer:
     """Lightweight summarizer for simple cases without AI"""
     
+    SENTENCES_PER_LENGTH = {'short': 3, 'medium': 5, 'long': 8}
+    
     @staticmethod
     def extract_first_sentences(text, num_sentences=3):
         """Extract first few sentences as a simple summary"""
@@ -169,14 +1088,29 @@ class QuickSummarizer:
         return summary
     
     @staticmethod
-    def create_bullet_summary(text, max_bullets=5):
+    def create_bullet_summary(text, max_bullets=5, method='extractive'):
         """Create a simple bullet-point summary"""
-        sentences = text.split('. ')
-        key_sentences = sentences[:max_bullets]
+        if method == 'extractive':
+            key_sentences = ExtractiveSummarizer().summarize(text, max_bullets)
+        else:
+            # Same splitting as the extractive summarizer, so "Dr. Smith" stays in one bullet
+            key_sentences = split_sentences(text)[:max_bullets]
         
         summary = "**Quick Summary:**\n\n"
-        for i, sentence in enumerate(key_sentences, 1):
-            if sentence.strip():
-                summary += f"• {sentence.strip()}.\n"
+        for sentence in key_sentences:
+            sentence = sentence.strip()
+            if sentence:
+                # Keep "?" and "!" (also inside closing quotes); add a full stop only when there is none
+                if not sentence.rstrip('"\')]').endswith(('.', '!', '?')):
+                    sentence += '.'
+                summary += f"• {sentence}\n"
         
-        return summary
\ No newline at end of file
+        return summary
+    
+    @staticmethod
+    def extractive_summary(text, length='medium', include_bullet_points=True):
+        """Extractive summary sized like an LLM summary of the given length"""
+        sentences = ExtractiveSummarizer().summarize(text, QuickSummarizer.SENTENCES_PER_LENGTH.get(length, 5))
+        if include_bullet_points:
+            return '\n'.join(f"• {sentence}" for sentence in sentences)
+        return ' '.join(sentences)
\ No newline at end of file
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from django.core.cache import caches
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = 'summarizer:flight:'
+
+
+class LeaderAbandoned(Exception):
+    """The call being waited on was cancelled; the waiter should run it itself"""
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key (threads or coroutines) into one execution"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key):
+        """Return (future, is_leader) for key"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            # A running future cannot be cancelled, so a waiter giving up leaves it to the others
+            future.set_running_or_notify_cancel()
+            return future, True
+
+    def _settle(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # Cancellation or shutdown of the leader is not the waiters' failure
+            future.set_exception(LeaderAbandoned())
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers with this key; returns (result, coalesced)"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                result = future.result()
+            except LeaderAbandoned:
+                continue
+            metrics.inc('summaries_coalesced', scope='process')
+            return result, True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result, False
+
+    async def ado(self, key, fn):
+        """Async variant of do(); fn is a coroutine function"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                result = await asyncio.shield(asyncio.wrap_future(future))
+            except LeaderAbandoned:
+                continue
+            metrics.inc('summaries_coalesced', scope='process')
+            return result, True
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result, False
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class CacheLock:
+    """Cross-process lock on a shared Django cache (atomic add with an expiry)"""
+
+    def __init__(self, alias, key, timeout):
+        self.alias = alias
+        self.key = LOCK_PREFIX + key
+        self.timeout = timeout
+        self.token = uuid.uuid4().hex
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def acquire(self):
+        return self.cache.add(self.key, self.token, self.timeout)
+
+    def held_elsewhere(self):
+        return self.cache.get(self.key) not in (None, self.token)
+
+    def release(self):
+        # Best effort: do not delete a lock that expired and was taken by someone else
+        if self.cache.get(self.key) == self.token:
+            self.cache.delete(self.key)
+
+    async def aacquire(self):
+        return await self.cache.aadd(self.key, self.token, self.timeout)
+
+    async def aheld_elsewhere(self):
+        return await self.cache.aget(self.key) not in (None, self.token)
+
+    async def arelease(self):
+        if await self.cache.aget(self.key) == self.token:
+            await self.cache.adelete(self.key)
+
+
+def _poll_intervals(timeout, first=0.05, longest=0.5):
+    """Sleep durations for polling, growing from first to longest, totalling at most timeout"""
+    waited = 0.0
+    interval = first
+    while waited < timeout:
+        yield min(interval, timeout - waited)
+        waited += interval
+        interval = min(interval * 2, longest)
+
+
+def wait_for_result(lock, lookup, timeout):
+    """Poll lookup() while another process holds lock; None when it gives up without a result"""
+    for interval in _poll_intervals(timeout):
+        time.sleep(interval)
+        result = lookup()
+        if result is not None:
+            metrics.inc('summaries_coalesced', scope='cluster')
+            return result
+        if not lock.held_elsewhere():
+            # The other process finished without storing a result (failed, or was not cacheable)
+            return None
+    logger.warning(f"Gave up waiting for in-flight summary {lock.key} after {timeout}s")
+    return None
+
+
+async def await_result(lock, lookup, timeout):
+    """Async variant of wait_for_result; lookup is a coroutine function"""
+    for interval in _poll_intervals(timeout):
+        await asyncio.sleep(interval)
+        result = await lookup()
+        if result is not None:
+            metrics.inc('summaries_coalesced', scope='cluster')
+            return result
+        if not await lock.aheld_elsewhere():
+            return None
+    logger.warning(f"Gave up waiting for in-flight summary {lock.key} after {timeout}s")
+    return None
+
+
+flights = SingleFlight()
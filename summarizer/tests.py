@@ -1,3 +1,1859 @@
-from django.test import TestCase
+import asyncio
+import gc
+import gzip
+import io
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from multiprocessing import shared_memory
+from unittest import mock
+import httpx
+import openai
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from . import clients, metrics, tokens
+from .backends import Completion, OpenAIBackend, StubBackend, Usage, build_llm_backend
+from .cache import DjangoCacheBackend, LRUCacheBackend, SummaryCache
+from .jobs import claim_jobs, complete_job, enqueue_job, fail_job, retry_delay, run_job, send_callback, validate_callback_url
+from .logdigest import LogDigest, mask
+from .models import ConversationSummary, SummaryJob, SummaryRequest, SummaryTemplate
+from .neardup import NearDuplicateIndex, minhash_signature, similarity
+from .offload import CPUOffloader, OffloadBusy, clean_and_measure
+from .persistence import SummaryWriter
+from .prompt_registry import PromptRegistry, PromptTemplate
+from .prompts import SUMMARY_PROMPTS
+from .ratelimit import RateLimitTimeout, SharedRateLimiter, TokenBudget
+from .resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResilientCaller
+from .serializers import SummaryOptionsSerializer, WebhookSerializer
+from .services import QuickSummarizer, SummarizerService
+from .singleflight import CacheLock, SingleFlight, flights, wait_for_result
+from .tokens import count_tokens
+from .uploads import TextStreamDecoder, UploadError, UploadTooLarge
+from .utils import KEY_PHRASE_STOP_WORDS, ContentValidator, TextChunker, TextProcessor, TextStats
+from .views import get_help_message
 
-# Create your tests here.
+
+@override_settings(SUMMARIZER_JOB_MAX_ATTEMPTS=2, SUMMARIZER_JOB_BACKOFF_BASE=10.0, SUMMARIZER_JOB_BACKOFF_MAX=60.0)
+class JobQueueTests(TestCase):
+    def enqueue(self):
+        return enqueue_job('summarize', {'text': 'hello', 'options': {}})
+
+    def expire(self, job):
+        """Let the job's visibility timeout pass, as if its worker had died"""
+        SummaryJob.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+    def test_claim_locks_job_for_one_worker(self):
+        job = self.enqueue()
+
+        claimed = claim_jobs('worker-a', 5, visibility_timeout=60)
+        self.assertEqual([c.pk for c in claimed], [job.pk])
+        self.assertEqual(claimed[0].status, 'running')
+        self.assertEqual(claimed[0].locked_by, 'worker-a')
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(claim_jobs('worker-b', 5, visibility_timeout=60), [])
+
+    def test_failed_attempt_is_retried_after_backoff(self):
+        self.enqueue()
+        job = claim_jobs('worker-a', 1)[0]
+
+        before = timezone.now()
+        self.assertTrue(fail_job(job, RuntimeError('boom')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.error, 'boom')
+        # First retry waits between half and all of SUMMARIZER_JOB_BACKOFF_BASE
+        delay = (job.available_at - before).total_seconds()
+        self.assertGreaterEqual(delay, 5.0)
+        self.assertLessEqual(delay, 10.5)
+        self.assertEqual(claim_jobs('worker-a', 1), [])
+
+        SummaryJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+        self.assertEqual(claim_jobs('worker-a', 1)[0].attempts, 2)
+
+    def test_retry_delay_grows_up_to_the_cap(self):
+        for attempts, ceiling in ((1, 10.0), (2, 20.0), (3, 40.0), (4, 60.0), (10, 60.0)):
+            delay = retry_delay(attempts)
+            self.assertGreaterEqual(delay, ceiling / 2)
+            self.assertLessEqual(delay, ceiling)
+
+    def test_last_failed_attempt_fails_job(self):
+        self.enqueue()
+        job = claim_jobs('worker-a', 1)[0]
+        fail_job(job, RuntimeError('first'))
+        SummaryJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+        job = claim_jobs('worker-a', 1)[0]
+
+        fail_job(job, RuntimeError('second'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_invalid_input_is_not_retried(self):
+        self.enqueue()
+        job = claim_jobs('worker-a', 1)[0]
+        fail_job(job, ValueError('too short'), retry=False)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 1)
+
+    def test_expired_job_is_reclaimed_and_old_worker_loses_it(self):
+        self.enqueue()
+        stale = claim_jobs('worker-a', 1, visibility_timeout=60)[0]
+        self.expire(stale)
+
+        claimed = claim_jobs('worker-b', 1, visibility_timeout=60)
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(claimed[0].locked_by, 'worker-b')
+        self.assertEqual(claimed[0].attempts, 2)
+        # The first worker finishing late must not overwrite the new owner's run
+        self.assertFalse(complete_job(stale, {'summary': 'late'}))
+        self.assertTrue(complete_job(claimed[0], {'summary': 'on time'}))
+        self.assertEqual(SummaryJob.objects.get(pk=stale.pk).result, {'summary': 'on time'})
+
+    def test_expired_job_without_attempts_left_is_failed_not_reclaimed(self):
+        self.enqueue()
+        job = claim_jobs('worker-a', 1)[0]
+        fail_job(job, RuntimeError('first'))
+        SummaryJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+        job = claim_jobs('worker-a', 1, visibility_timeout=60)[0]
+        self.assertEqual(job.attempts, job.max_attempts)
+        self.expire(job)
+
+        self.assertEqual(claim_jobs('worker-b', 1), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+
+
+class AsyncWebhookTests(TestCase):
+    async def test_background_request_is_queued(self):
+        response = await AsyncClient().post('/async/webhook', {
+            'message': 'Summarize this later', 'user_id': 'u1', 'conversation_id': 'c1', 'background': True,
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual(body['status'], 'queued')
+        job = await SummaryJob.objects.aget(request_id=body['job_id'])
+        self.assertEqual(job.kind, 'webhook')
+        self.assertEqual(job.payload['message'], 'Summarize this later')
+
+    async def test_internal_callback_is_rejected(self):
+        response = await AsyncClient().post('/async/webhook', {
+            'message': 'hello', 'user_id': 'u1', 'conversation_id': 'c1',
+            'background': True, 'callback_url': 'http://127.0.0.1/hook',
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(await SummaryJob.objects.aexists())
+
+
+class SummarizeBackgroundTests(TestCase):
+    async def test_async_background_request_is_queued(self):
+        response = await AsyncClient().post('/async/summarize', {
+            'text': 'Summarize this later', 'options': {'length': 'short'}, 'background': True,
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 202)
+        job = await SummaryJob.objects.aget(request_id=response.json()['job_id'])
+        self.assertEqual(job.kind, 'summarize')
+        self.assertEqual(job.payload['options']['length'], 'short')
+
+    async def test_async_internal_callback_is_rejected(self):
+        response = await AsyncClient().post('/async/summarize', {
+            'text': 'hello', 'background': True, 'callback_url': 'http://127.0.0.1/hook',
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(await SummaryJob.objects.aexists())
+
+    def test_background_false_string_runs_inline(self):
+        result = {'summary': 'Done.'}
+        with mock.patch.object(SummarizerService, 'generate_summary', return_value=result) as generate:
+            response = self.client.post('/summarize', {
+                'text': 'Summarize this now', 'options': {'bypass_cache': True}, 'background': 'false',
+            }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['summary'], result)
+        self.assertFalse(SummaryJob.objects.exists())
+        self.assertFalse(generate.call_args.kwargs['use_cache'])
+
+    def test_queued_job_runs_with_the_request_options(self):
+        job = enqueue_job('summarize', {'text': 'Summarize this later', 'options': {'length': 'long', 'mode': 'single'}})
+        service = mock.Mock()
+        service.generate_summary.return_value = {'summary': 'Done.'}
+        self.assertEqual(run_job(job, service), {'summary': {'summary': 'Done.'}, 'status': 'success'})
+        service.generate_summary.assert_called_once_with(
+            'Summarize this later', summary_type='general', length='long', include_bullet_points=True,
+            include_key_points=True, language='english', use_cache=True, mode='single',
+        )
+
+
+def resolving_to(*addresses):
+    """Stand-in for socket.getaddrinfo returning the given addresses"""
+    return mock.patch('summarizer.jobs.socket.getaddrinfo', return_value=[
+        (socket.AF_INET6 if ':' in address else socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, 443))
+        for address in addresses
+    ])
+
+
+@override_settings(SUMMARIZER_JOB_CALLBACK_ALLOWED_HOSTS=[])
+class CallbackUrlTests(SimpleTestCase):
+    def test_public_host_is_accepted(self):
+        with resolving_to('93.184.216.34'):
+            validate_callback_url('https://hooks.example.com/summaries')
+
+    def test_internal_addresses_are_rejected(self):
+        for address in ('127.0.0.1', '10.0.0.5', '192.168.1.1', '169.254.169.254', '::1', 'fd00::1', '0.0.0.0'):
+            with self.subTest(address=address), resolving_to(address):
+                with self.assertRaises(ValueError):
+                    validate_callback_url('http://hooks.example.com/')
+
+    def test_any_internal_address_of_a_host_rejects_it(self):
+        with resolving_to('93.184.216.34', '10.0.0.5'):
+            with self.assertRaises(ValueError):
+                validate_callback_url('http://hooks.example.com/')
+
+    def test_ip_literals_and_other_schemes_are_rejected(self):
+        for url in ('http://127.0.0.1:8000/admin', 'http://[::1]/', 'file:///etc/passwd', 'gopher://example.com/', 'http:///path'):
+            with self.subTest(url=url), self.assertRaises(ValueError):
+                validate_callback_url(url)
+
+    @override_settings(SUMMARIZER_JOB_CALLBACK_ALLOWED_HOSTS=['hooks.example.com', '.partner.io'])
+    def test_allowlist(self):
+        validate_callback_url('https://hooks.example.com/x')
+        validate_callback_url('https://eu.partner.io/x')
+        for url in ('https://example.com/x', 'https://evilpartner.io/x', 'http://localhost/'):
+            with self.subTest(url=url), self.assertRaises(ValueError):
+                validate_callback_url(url)
+
+    def test_webhook_rejects_internal_callback(self):
+        serializer = WebhookSerializer(data={
+            'message': 'hello', 'user_id': 'u', 'conversation_id': 'c',
+            'background': True, 'callback_url': 'http://127.0.0.1:8000/admin',
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('callback_url', serializer.errors)
+
+    def test_refused_callback_is_not_sent(self):
+        job = SummaryJob(request_id='job-1', kind='summarize', payload={}, status='succeeded',
+                         callback_url='http://hooks.example.com/', created_at=timezone.now(), updated_at=timezone.now())
+        with resolving_to('127.0.0.1'), mock.patch('summarizer.jobs.httpx.post') as post, self.assertLogs('summarizer.jobs', 'WARNING'):
+            send_callback(job)
+        post.assert_not_called()
+        with resolving_to('93.184.216.34'), mock.patch('summarizer.jobs.httpx.post') as post:
+            send_callback(job)
+        post.assert_called_once()
+
+
+TEXT = ' '.join(f"Sentence {i} describes the quarterly results of the company in some detail." for i in range(12))
+
+
+class BlockingBackend:
+    """LLM backend that counts calls and answers once release is set"""
+
+    model = 'test'
+    configured = True
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def complete(self, messages, max_tokens, temperature=0.3, timeout=None):
+        with self._lock:
+            self.calls += 1
+        self.release.wait(10)
+        return Completion('The shared summary.', Usage(100, 10), 'stop')
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condition not reached")
+        time.sleep(0.005)
+
+
+@override_settings(SUMMARIZER_NEAR_DUPLICATE=False)
+class SingleFlightTests(TransactionTestCase):
+    def run_concurrently(self, flight, count, fn):
+        """Call flight.do from count threads; fn runs once every thread has joined"""
+        joins = []
+        join = flight._join
+
+        def counting_join(key):
+            joins.append(key)
+            return join(key)
+
+        outcomes = [None] * count
+
+        def call(index):
+            try:
+                outcomes[index] = ('result', flight.do('key', fn))
+            except Exception as e:
+                outcomes[index] = ('error', e)
+
+        with mock.patch.object(flight, '_join', counting_join):
+            threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+            for thread in threads:
+                thread.start()
+            wait_until(lambda: len(joins) >= count)
+            self.released.set()
+            for thread in threads:
+                thread.join(10)
+        return outcomes
+
+    def setUp(self):
+        self.released = threading.Event()
+
+    def test_concurrent_calls_run_once(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            self.released.wait(10)
+            return 'value'
+
+        outcomes = self.run_concurrently(SingleFlight(), 8, fn)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([outcome[1][0] for outcome in outcomes], ['value'] * 8)
+        self.assertEqual(sorted(outcome[1][1] for outcome in outcomes), [False] + [True] * 7)
+
+    def test_leader_error_reaches_every_waiter(self):
+        def fn():
+            self.released.wait(10)
+            raise RuntimeError('LLM down')
+
+        flight = SingleFlight()
+        outcomes = self.run_concurrently(flight, 5, fn)
+        self.assertEqual([kind for kind, _ in outcomes], ['error'] * 5)
+        self.assertTrue(all(str(error) == 'LLM down' for _, error in outcomes))
+        # The failed call is forgotten, so the next caller runs it again
+        self.assertEqual(len(flight), 0)
+        self.assertEqual(flight.do('key', lambda: 'again'), ('again', False))
+
+    def test_cancelled_async_waiter_leaves_the_others_waiting(self):
+        flight = SingleFlight()
+
+        async def scenario():
+            released = asyncio.Event()
+
+            async def fn():
+                await released.wait()
+                return 'value'
+
+            leader = asyncio.ensure_future(flight.ado('key', fn))
+            waiters = [asyncio.ensure_future(flight.ado('key', fn)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            waiters[0].cancel()
+            await asyncio.sleep(0.01)
+            released.set()
+            return await asyncio.gather(leader, *waiters, return_exceptions=True)
+
+        leader, cancelled, *others = asyncio.run(scenario())
+        self.assertEqual(leader, ('value', False))
+        self.assertIsInstance(cancelled, asyncio.CancelledError)
+        self.assertEqual(others, [('value', True)] * 2)
+        self.assertEqual(len(flight), 0)
+
+    def test_identical_summaries_make_one_backend_call(self):
+        service = SummarizerService()
+        service.backend = backend = BlockingBackend()
+        self.released = backend.release
+        count = 6
+        joins = []
+        join = flights._join
+        results = [None] * count
+
+        def counting_join(key):
+            joins.append(key)
+            return join(key)
+
+        def summarize(index):
+            results[index] = service.generate_summary(TEXT, 'news', 'short', use_cache=False)
+
+        with mock.patch.object(flights, '_join', counting_join):
+            threads = [threading.Thread(target=summarize, args=(i,)) for i in range(count)]
+            for thread in threads:
+                thread.start()
+            wait_until(lambda: len(joins) >= count)
+            backend.release.set()
+            for thread in threads:
+                thread.join(10)
+
+        self.assertEqual(backend.calls, 1)
+        self.assertEqual({result['summary'] for result in results}, {'The shared summary.'})
+        self.assertEqual(sum(1 for result in results if result.get('coalesced')), count - 1)
+
+
+@override_settings(SUMMARIZER_CACHE_BACKEND='django', SUMMARIZER_NEAR_DUPLICATE=False)
+class CrossProcessFlightTests(TransactionTestCase):
+    def setUp(self):
+        caches[settings.SUMMARIZER_CACHE_ALIAS].clear()
+        self.cache = SummaryCache(DjangoCacheBackend(settings.SUMMARIZER_CACHE_ALIAS))
+        self.service = SummarizerService()
+        self.service.backend = self.backend = BlockingBackend()
+        self.backend.release.set()
+        patcher = mock.patch('summarizer.cache._summary_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_waiter_picks_up_leaders_cached_result(self):
+        prepared = self.service._prepare(TEXT, 'news', 'short', False, False, 'english', True, 'auto')
+        # Another worker process leads this flight and stores its result while we poll
+        leader = CacheLock(settings.SUMMARIZER_CACHE_ALIAS, prepared['flight_key'], 60)
+        self.assertTrue(leader.acquire())
+        stored = {'summary': 'From the other process.', 'usage': {}}
+
+        with mock.patch('summarizer.singleflight.time.sleep', lambda seconds: self.cache.set(prepared['cache_key'], stored)):
+            result = self.service._generate_once(prepared, 'short', False)
+
+        self.assertEqual(self.backend.calls, 0)
+        self.assertEqual(result['summary'], 'From the other process.')
+        self.assertTrue(result['cached'])
+        self.assertTrue(result['coalesced'])
+
+    def test_waiter_runs_the_call_when_leader_stores_nothing(self):
+        prepared = self.service._prepare(TEXT, 'news', 'short', False, False, 'english', True, 'auto')
+        leader = CacheLock(settings.SUMMARIZER_CACHE_ALIAS, prepared['flight_key'], 60)
+        leader.acquire()
+
+        with mock.patch('summarizer.singleflight.time.sleep', lambda seconds: leader.release()):
+            result = self.service._generate_once(prepared, 'short', False)
+
+        self.assertEqual(self.backend.calls, 1)
+        self.assertEqual(result['summary'], 'The shared summary.')
+        # The result is stored for later requests, and the lock left free
+        self.assertEqual(self.cache.peek(prepared['cache_key'])['summary'], 'The shared summary.')
+        self.assertIsNone(caches[settings.SUMMARIZER_CACHE_ALIAS].get(leader.key))
+
+    def test_wait_for_result_gives_up_after_timeout(self):
+        leader = CacheLock(settings.SUMMARIZER_CACHE_ALIAS, 'stuck', 60)
+        leader.acquire()
+        waiter = CacheLock(settings.SUMMARIZER_CACHE_ALIAS, 'stuck', 60)
+        lookups = []
+        with mock.patch('summarizer.singleflight.time.sleep'), self.assertLogs('summarizer.singleflight', 'WARNING'):
+            result = wait_for_result(waiter, lambda: lookups.append(1), timeout=1.0)
+        self.assertIsNone(result)
+        self.assertGreater(len(lookups), 1)
+
+
+class FakeClock:
+    """Monotonic clock that only moves when told to (or when something sleeps)"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def rate_limit_error(headers=None):
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    response = httpx.Response(429, headers=headers or {}, request=request)
+    return openai.RateLimitError('Rate limit reached', response=response, body=None)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, cooldown=30.0, clock=self.clock)
+
+    def open_breaker(self):
+        for _ in range(3):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure()
+
+    def test_opens_after_threshold_of_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_after_cooldown_lets_one_trial_through(self):
+        self.open_breaker()
+        self.clock.now += 29.9
+        self.assertFalse(self.breaker.allow())
+
+        self.clock.now += 0.1
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_successful_trial_closes(self):
+        self.open_breaker()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_reopens_for_another_cooldown(self):
+        self.open_breaker()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.clock.now += 29
+        self.assertFalse(self.breaker.allow())
+        self.clock.now += 1
+        self.assertTrue(self.breaker.allow())
+
+    def test_released_trial_frees_the_slot(self):
+        self.open_breaker()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.release()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+
+class ResilientCallerTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=5, cooldown=30.0, clock=self.clock)
+
+    def caller(self, **kwargs):
+        options = dict(breaker=self.breaker, max_attempts=3, attempt_timeout=10.0, deadline=60.0,
+                       backoff_base=0.5, backoff_max=8.0, clock=self.clock, sleep=self.clock.sleep, seed=1)
+        options.update(kwargs)
+        return ResilientCaller(**options)
+
+    def failing(self, *errors, result='ok'):
+        """fn that raises the given errors on successive attempts, then returns result"""
+        errors = list(errors)
+        attempts = []
+
+        def fn(timeout):
+            attempts.append(timeout)
+            if errors:
+                raise errors.pop(0)
+            return result
+        return fn, attempts
+
+    def test_retries_transient_errors_with_bounded_backoff(self):
+        fn, attempts = self.failing(rate_limit_error(), openai.APIConnectionError(request=httpx.Request('POST', 'https://x')))
+        self.assertEqual(self.caller().call(fn), 'ok')
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(len(self.clock.sleeps), 2)
+        self.assertLessEqual(self.clock.sleeps[0], 0.5)
+        self.assertLessEqual(self.clock.sleeps[1], 1.0)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_honours_retry_after(self):
+        fn, attempts = self.failing(rate_limit_error({'retry-after': '7'}), rate_limit_error({'retry-after-ms': '1500'}))
+        self.caller().call(fn)
+        self.assertEqual(self.clock.sleeps, [7.0, 1.5])
+
+    def test_retry_after_past_the_deadline_gives_up(self):
+        fn, attempts = self.failing(rate_limit_error({'retry-after': '90'}))
+        with self.assertRaises(openai.RateLimitError):
+            self.caller().call(fn)
+        self.assertEqual(len(attempts), 1)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_attempt_timeout_is_capped_by_the_deadline(self):
+        fn, attempts = self.failing()
+        caller = self.caller()
+        deadline = caller.new_deadline()
+        self.clock.now += 55
+        caller.call(fn, deadline)
+        self.assertEqual(attempts, [5.0])
+        self.clock.now += 10
+        with self.assertRaises(DeadlineExceeded):
+            caller.call(fn, deadline)
+
+    def test_open_breaker_rejects_without_calling(self):
+        caller = self.caller(max_attempts=1)
+        for _ in range(5):
+            fn, _ = self.failing(rate_limit_error())
+            with self.assertRaises(openai.RateLimitError):
+                caller.call(fn)
+        fn, attempts = self.failing()
+        with self.assertRaises(CircuitOpenError):
+            caller.call(fn)
+        self.assertEqual(attempts, [])
+
+    def test_non_transient_errors_are_not_retried(self):
+        fn, attempts = self.failing(ValueError('bad request'))
+        with self.assertRaises(ValueError):
+            self.caller().call(fn)
+        self.assertEqual(len(attempts), 1)
+        self.assertEqual(self.breaker.failures, 0)
+
+
+class UnavailableBackend:
+    model = 'test'
+    configured = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, messages, max_tokens, temperature=0.3, timeout=None):
+        self.calls += 1
+        raise rate_limit_error()
+
+
+@override_settings(SUMMARIZER_NEAR_DUPLICATE=False, SUMMARIZER_SINGLEFLIGHT=False)
+class ExtractiveFallbackTests(TransactionTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.caller = ResilientCaller(
+            breaker=CircuitBreaker(failure_threshold=2, cooldown=30.0, clock=self.clock),
+            max_attempts=2, clock=self.clock, sleep=self.clock.sleep, seed=1,
+        )
+        patcher = mock.patch('summarizer.services.get_resilient_caller', return_value=self.caller)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = SummarizerService()
+        self.service.backend = self.backend = UnavailableBackend()
+
+    def test_unavailable_llm_gives_degraded_extractive_summary(self):
+        with self.assertLogs('summarizer.services', 'WARNING'):
+            result = self.service.generate_summary(TEXT, 'news', 'short')
+        self.assertTrue(result['degraded'])
+        self.assertEqual(result['engine'], 'extractive')
+        self.assertTrue(result['summary'])
+        self.assertEqual(self.backend.calls, 2)
+
+        # Not cached, and with the breaker now open the LLM is not even tried
+        with self.assertLogs('summarizer.services', 'WARNING'):
+            again = self.service.generate_summary(TEXT, 'news', 'short')
+        self.assertTrue(again['degraded'])
+        self.assertFalse(again['cached'])
+        self.assertEqual(self.backend.calls, 2)
+
+    @override_settings(SUMMARIZER_EXTRACTIVE_FALLBACK=False)
+    def test_fallback_can_be_disabled(self):
+        with self.assertRaises(openai.RateLimitError), self.assertLogs('summarizer.services', 'ERROR'):
+            self.service.generate_summary(TEXT, 'news', 'short')
+
+
+
+class StreamingBackend:
+    model = 'test'
+    configured = True
+
+    def __init__(self, error=None):
+        self.error = error
+
+    async def astream(self, messages, max_tokens, temperature=0.3, timeout=None):
+        yield Completion('A streamed ', None, None)
+        if self.error is not None:
+            raise self.error
+        yield Completion('summary.', Usage(40, 3), 'stop')
+
+
+@override_settings(SUMMARIZER_NEAR_DUPLICATE=False, SUMMARIZER_METRICS=True)
+class StreamSummaryTests(TransactionTestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        self.service = SummarizerService()
+        self.service.backend = StreamingBackend()
+
+    def stream(self, **options):
+        async def collect():
+            return [event async for event in self.service.astream_summary(TEXT, 'news', 'short', use_cache=False, **options)]
+        return asyncio.run(collect())
+
+    def counter(self, name, **labels):
+        return metrics.registry.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def test_completed_stream_is_counted(self):
+        events = self.stream()
+        self.assertEqual(''.join(text for kind, text in events if kind == 'delta'), 'A streamed summary.')
+        self.assertEqual(events[-1][0], 'stats')
+        self.assertEqual(self.counter('summaries', summary_type='news', outcome='generated'), 1)
+
+    def test_failed_stream_counts_an_error(self):
+        self.service.backend = StreamingBackend(error=ValueError('bad chunk'))
+        with self.assertRaises(ValueError), self.assertLogs('summarizer.services', 'ERROR'):
+            self.stream()
+        self.assertEqual(self.counter('summary_errors', summary_type='news', error='ValueError'), 1)
+        self.assertEqual(self.counter('summaries', summary_type='news', outcome='generated'), 0)
+
+    def test_map_reduce_stream_gets_a_deadline(self):
+        with mock.patch.object(SummarizerService, '_map_reduce_summary', return_value=('Reduced.', {'chunks': 2})) as map_reduce:
+            events = self.stream(mode='map_reduce')
+        self.assertEqual(events[0], ('delta', 'Reduced.'))
+        self.assertIsNotNone(map_reduce.call_args.args[-1])
+        self.assertEqual(self.counter('summaries', summary_type='news', outcome='generated'), 1)
+
+
+class VerboseBackend:
+    """Partial summaries that never get shorter, so the reduce has to truncate"""
+    model = 'test'
+    configured = True
+
+    def complete(self, messages, max_tokens, temperature=0.3, timeout=None):
+        return Completion(' '.join(['revenue'] * 120), Usage(0, 120), 'stop')
+
+
+@override_settings(SUMMARIZER_CHUNK_TOKENS=100, SUMMARIZER_CHUNK_OVERLAP_TOKENS=10, SUMMARIZER_MAX_REDUCE_DEPTH=2)
+class MapReduceTests(SimpleTestCase):
+    def test_reduce_input_is_trimmed_to_the_chunk_budget(self):
+        service = SummarizerService()
+        service.backend = VerboseBackend()
+        template = PromptTemplate('news', SUMMARY_PROMPTS['news']['system'], SUMMARY_PROMPTS['news']['user'])
+        with mock.patch.object(service, '_build_messages', wraps=service._build_messages) as build, \
+                self.assertLogs('summarizer.services', 'WARNING'):
+            summary, stats = service._map_reduce_summary(TEXT * 4, template, 'short', False)
+        self.assertEqual(stats['reduce_depth'], 2)
+        self.assertLessEqual(count_tokens(build.call_args.args[0]), 100)
+
+    def test_chunks_are_whole_paragraphs_within_the_budget(self):
+        paragraphs = [f"Paragraph {i} covers the results of region {i} for the quarter." for i in range(20)]
+        chunks = TextChunker(max_tokens=100, overlap_tokens=10).split('\n\n'.join(paragraphs))
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(count_tokens(chunk), 100)
+            self.assertTrue(any(chunk.startswith(paragraph) for paragraph in paragraphs))
+            self.assertTrue(any(chunk.endswith(paragraph) for paragraph in paragraphs))
+
+    @override_settings(SUMMARIZER_LONG_DOCUMENT_TOKENS=50, SUMMARIZER_NEAR_DUPLICATE=False, SUMMARIZER_SINGLEFLIGHT=False)
+    @mock.patch('summarizer.services.get_summary_cache', return_value=None)
+    def test_document_is_chunked_on_its_paragraph_breaks(self, _):
+        service = SummarizerService()
+        service.backend = RecordingBackend()
+        document = '<p>First  paragraph.</p>\n\n \n' + TEXT + '\n\nLast   one.'
+        with mock.patch.object(service, '_map_reduce_summary', return_value=('Reduced.', {'chunks': 3})) as map_reduce:
+            service.generate_summary(document, summary_type='news', include_key_points=False)
+        self.assertEqual(map_reduce.call_args.args[0], f'First paragraph.\n\n{TEXT}\n\nLast one.')
+
+class TokenBudgetTests(SimpleTestCase):
+    def test_spend_slides_out_of_the_window(self):
+        clock = FakeClock()
+        budget = TokenBudget(100, clock=clock)
+        self.assertEqual(budget.acquire(60), 0.0)
+        clock.now += 30
+        self.assertEqual(budget.acquire(40), 0.0)
+        self.assertEqual(budget._total, 100)
+
+        clock.now += 30
+        self.assertEqual(budget.acquire(60), 0.0)
+        self.assertEqual(budget._total, 100)
+
+    def test_blocks_until_enough_has_expired(self):
+        budget = TokenBudget(100, window=0.2)
+        budget.acquire(80)
+        waited = budget.acquire(50)
+        self.assertGreaterEqual(waited, 0.15)
+
+    def test_oversized_call_is_capped_at_the_budget(self):
+        budget = TokenBudget(100, clock=FakeClock())
+        self.assertEqual(budget.acquire(500), 0.0)
+        self.assertEqual(budget._total, 100)
+
+    def test_zero_budget_is_unlimited(self):
+        budget = TokenBudget(0, clock=FakeClock())
+        for _ in range(10):
+            self.assertEqual(budget.acquire(10 ** 6), 0.0)
+
+
+class SharedRateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.clock = FakeClock()
+        self.clock.now = 600.0  # start of a window
+
+    def limiter(self, **kwargs):
+        options = dict(requests_per_minute=10, batch_share=1.0, max_wait=5.0, max_poll=60.0, clock=self.clock)
+        options.update(kwargs)
+        return SharedRateLimiter(**options)
+
+    def test_window_refills_at_the_per_minute_rate(self):
+        limiter = self.limiter()
+        for _ in range(10):
+            self.assertEqual(limiter.try_acquire(0), 0.0)
+        # Only this minute's count is in the way: wait for the next window
+        self.assertEqual(limiter.try_acquire(0), 60.0)
+
+        # Half-way through the next minute half of the last one still counts
+        self.clock.now += 90
+        for _ in range(5):
+            self.assertEqual(limiter.try_acquire(0), 0.0)
+        # One request over: 60s / 10 requests until one slides out
+        self.assertAlmostEqual(limiter.try_acquire(0), 6.0)
+        self.clock.now += 6
+        self.assertEqual(limiter.try_acquire(0), 0.0)
+
+    def test_token_limit(self):
+        limiter = self.limiter(requests_per_minute=0, tokens_per_minute=1000)
+        self.assertEqual(limiter.try_acquire(700), 0.0)
+        self.assertGreater(limiter.try_acquire(400), 0)
+        self.assertEqual(limiter.try_acquire(300), 0.0)
+        # An oversized call is capped at the limit, so it runs once the window is empty
+        self.clock.now += 120
+        self.assertEqual(limiter.try_acquire(5000), 0.0)
+
+    def test_batch_is_capped_at_its_share(self):
+        limiter = self.limiter(batch_share=0.5)
+        for _ in range(5):
+            self.assertEqual(limiter.try_acquire(0, 'batch'), 0.0)
+        self.assertGreater(limiter.try_acquire(0, 'batch'), 0)
+        for _ in range(5):
+            self.assertEqual(limiter.try_acquire(0, 'interactive'), 0.0)
+        self.assertGreater(limiter.try_acquire(0, 'interactive'), 0)
+
+    def test_oversized_batch_call_is_capped_at_its_share(self):
+        limiter = self.limiter(requests_per_minute=0, tokens_per_minute=1000, batch_share=0.8)
+        self.assertEqual(limiter.try_acquire(900, 'batch'), 0.0)
+        # Reserved 800 tokens, leaving the interactive headroom
+        self.assertEqual(limiter.try_acquire(200, 'interactive'), 0.0)
+        self.assertGreater(limiter.try_acquire(1, 'interactive'), 0)
+
+    def test_gives_up_after_max_wait(self):
+        limiter = self.limiter(requests_per_minute=1, max_poll=0.01)
+        limiter.acquire(0)
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire(0, max_wait=0.05)
+
+    def test_interactive_is_served_before_batch(self):
+        limiter = self.limiter(requests_per_minute=1, max_poll=0.01)
+        limiter.acquire(0)
+        served = []
+
+        def call(priority):
+            limiter.acquire(0, priority)
+            served.append(priority)
+
+        batch = threading.Thread(target=call, args=('batch',))
+        batch.start()
+        wait_until(lambda: len(limiter._waiting) == 1)
+        interactive = threading.Thread(target=call, args=('interactive',))
+        interactive.start()
+        wait_until(lambda: len(limiter._waiting) == 2)
+
+        self.clock.now += 120
+        wait_until(lambda: served)
+        self.assertEqual(served, ['interactive'])
+        self.clock.now += 120
+        batch.join(5)
+        interactive.join(5)
+        self.assertEqual(served, ['interactive', 'batch'])
+
+    def test_async_waiters_share_the_queue(self):
+        limiter = self.limiter(requests_per_minute=1, max_poll=0.01)
+        limiter.acquire(0)
+        served = []
+
+        async def call(priority):
+            await limiter.aacquire(0, priority)
+            served.append(priority)
+
+        async def scenario():
+            batch = asyncio.ensure_future(call('batch'))
+            while len(limiter._waiting) < 1:
+                await asyncio.sleep(0.005)
+            interactive = asyncio.ensure_future(call('interactive'))
+            while len(limiter._waiting) < 2:
+                await asyncio.sleep(0.005)
+            self.clock.now += 120
+            await interactive
+            self.assertEqual(served, ['interactive'])
+            self.clock.now += 120
+            await batch
+
+        asyncio.run(scenario())
+        self.assertEqual(served, ['interactive', 'batch'])
+
+
+class LogDigestTests(SimpleTestCase):
+    def test_mask(self):
+        self.assertEqual(
+            mask(' job 550e8400-e29b-41d4-a716-446655440000 from 10.0.0.7:5432 took -1.5s id=0x1f ref=9-1234abcd'),
+            ' job <ID> from <IP> took <NUM>s id=<ID> ref=<NUM>-<ID>',
+        )
+        self.assertEqual(mask('utf8 h2 retry 3'), 'utf8 h2 retry <NUM>')
+
+    def test_messages_differing_in_digits_share_a_template(self):
+        digest = LogDigest()
+        for line in ('INFO GET /items/17 200 5ms', 'INFO GET /items/42 200 93ms', 'WARN utf8 decode 1', 'WARN utf9 decode 1'):
+            digest.add('2024-03-01T10:00:00Z ' + line)
+        # Digits the masks leave alone are not folded together: utf9 is clustered, not taken for utf8
+        self.assertEqual([t.text for t in digest.templates], ['INFO GET /items/<NUM> <NUM> <NUM>ms', 'WARN <*> decode <NUM>'])
+        self.assertEqual([t.count for t in digest.templates], [2, 2])
+        self.assertEqual(digest.levels, {'INFO': 2, 'WARN': 2})
+
+
+class SummaryWriterTests(TransactionTestCase):
+    def fields(self, number):
+        return {
+            'request_id': f'req-{number}', 'user_id': 'user', 'conversation_id': 'conversation',
+            'summary': 'Short.', 'word_count_original': 100, 'word_count_summary': 1, 'compression_ratio': 0.01,
+        }
+
+    def test_full_buffer_is_flushed_off_the_event_loop(self):
+        writer = SummaryWriter(batch_size=10, max_buffer=2)
+        flushed_on = []
+        flush = writer.flush
+
+        def tracking_flush():
+            flushed_on.append(threading.current_thread())
+            return flush()
+
+        async def record():
+            await writer.arecord(self.fields(1))
+            self.assertEqual(flushed_on, [])
+            await writer.arecord(self.fields(2))
+            return threading.current_thread()
+
+        with mock.patch.object(writer, 'flush', tracking_flush):
+            loop_thread = asyncio.run(record())
+        self.assertEqual(len(flushed_on), 1)
+        self.assertIsNot(flushed_on[0], loop_thread)
+        self.assertEqual(len(writer), 0)
+        self.assertEqual(SummaryRequest.objects.count(), 2)
+
+    def test_batch_size_wakes_the_writer_thread(self):
+        writer = SummaryWriter(batch_size=2, max_buffer=100)
+        writer.record(self.fields(1))
+        self.assertFalse(writer._wakeup.is_set())
+        writer.record(self.fields(2))
+        self.assertTrue(writer._wakeup.is_set())
+        self.assertEqual(writer.flush(), 2)
+        self.assertEqual(SummaryRequest.objects.count(), 2)
+
+
+class BulletSummaryTests(SimpleTestCase):
+    TEXT = 'Dr. Smith arrived at noon. Is the lab ready? It is! The samples were "clean." Results follow tomorrow'
+
+    def test_keeps_terminal_punctuation_and_abbreviations(self):
+        self.assertEqual(QuickSummarizer.create_bullet_summary(self.TEXT, 5, method='lead'), (
+            "**Quick Summary:**\n\n"
+            "• Dr. Smith arrived at noon.\n"
+            "• Is the lab ready?\n"
+            "• It is!\n"
+            "• The samples were \"clean.\"\n"
+            "• Results follow tomorrow.\n"
+        ))
+
+    def test_extractive_bullets_are_punctuated_once(self):
+        bullets = QuickSummarizer.create_bullet_summary(self.TEXT, 3).splitlines()[2:]
+        self.assertEqual(len(bullets), 3)
+        for bullet in bullets:
+            self.assertRegex(bullet, r'^• .*[^.!?][.!?]"?$')
+
+
+class CleanTextTests(SimpleTestCase):
+    FRAGMENTS = [
+        'plain text with AT&amp;T and 3 &lt; 4',
+        '<!DOCTYPE html><html><head><title>Title</title><style>p { margin: 0 }</style></head>'
+        '<body><p class="lead">First <b>bold</b> paragraph.</p><script>track("<p>");</script></body></html>',
+        '<div data-x="a > b" title=\'x<y\'>quoted</div><img src=x.png alt=photo><br/>tail',
+        'before<!-- comment <p>hidden</p> -->after<![CDATA[kept]]><?php echo 1; ?>end',
+        '<template><p>not shown</p></template>shown <ruby>漢<rt>kan</rt><rp>(</rp></ruby>',
+        '<div><template>x</div>closed by the div</template>',
+        'if a<b and c>d then <= works </ x> and </3> too',
+        '<SCRIPT type="t">var s = "</p>";</script >visible<STYLE>a{}</STYLE>',
+        '<a href="unterminated>quote">text</a> and <a x <b>y</b>',
+    ]
+
+    @staticmethod
+    def legacy(text):
+        return ' '.join(BeautifulSoup(text, 'html.parser').get_text().split())
+
+    def test_matches_beautifulsoup(self):
+        for fragment in self.FRAGMENTS:
+            with self.subTest(fragment=fragment):
+                self.assertEqual(TextProcessor.clean_text(fragment), self.legacy(fragment))
+
+    def test_unclosed_script_hides_the_rest(self):
+        text = 'intro ' + '<script>x ' * 20000
+        self.assertEqual(TextProcessor.clean_text(text), 'intro')
+
+    def test_stray_comment_opener_keeps_the_text(self):
+        text = 'a <!-- ' + 'word ' * 36000 + '<b>bold</b> &amp; more'
+        cleaned = TextProcessor.clean_text(text)
+        self.assertEqual(cleaned, self.legacy(text))
+        self.assertTrue(cleaned.endswith('word <b>bold & more'))
+
+    def test_unterminated_markup_is_linear(self):
+        for unit in ('<a ', '</x ', '<!-- ', '<a x="', '<script>x '):
+            with self.subTest(unit=unit):
+                started = time.perf_counter()
+                TextProcessor.clean_text(unit * 100000)
+                # Quadratic scans take minutes on this input
+                self.assertLess(time.perf_counter() - started, 10)
+
+
+class RecordingBackend:
+    """Replies with a fixed summary and keeps the prompts it was sent"""
+    model = 'test'
+    configured = True
+
+    def __init__(self, summary='The team agreed to ship on Friday.'):
+        self.summary = summary
+        self.prompts = []
+
+    def complete(self, messages, max_tokens, temperature=0.3, timeout=None):
+        self.prompts.append(messages[-1]['content'])
+        return Completion(self.summary, Usage(100, 8), 'stop')
+
+    async def acomplete(self, messages, max_tokens, temperature=0.3, timeout=None):
+        return self.complete(messages, max_tokens, temperature, timeout)
+
+
+@override_settings(SUMMARIZER_NEAR_DUPLICATE=False, SUMMARIZER_SINGLEFLIGHT=False)
+class ConversationSummaryTests(TestCase):
+    OPTIONS = {'summary_type': 'conversation', 'length': 'short', 'incremental': True}
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.service = SummarizerService()
+        self.service.backend = self.backend = RecordingBackend()
+
+    def summarize(self, message, user_id='ann'):
+        return self.service.summarize_conversation(message, user_id, 'thread', self.OPTIONS)
+
+    def test_first_summary_covers_the_stored_history(self):
+        SummaryRequest.objects.create(
+            request_id='earlier', user_id='bob', conversation_id='thread', summary='', word_count_original=0,
+            word_count_summary=0, compression_ratio=0.0, **SummaryRequest.original_text_fields(TEXT),
+        )
+        result = self.summarize('Ship it on Friday then.')
+        self.assertTrue(result['incremental'])
+        # The full prompt, not the incremental one, with the earlier message in it
+        self.assertNotIn('Current summary:', self.backend.prompts[0])
+        self.assertIn(TEXT.split('.')[0], self.backend.prompts[0])
+
+        state = ConversationSummary.objects.get(conversation_id='thread')
+        self.assertEqual(state.summary, self.backend.summary)
+        self.assertEqual(state.message_count, 2)
+        self.assertEqual(state.word_count, result['word_count_original'])
+        self.assertEqual(state.watermark, SummaryRequest.objects.latest('pk').pk)
+
+    def test_update_sends_only_new_messages_and_measures_the_whole_conversation(self):
+        first = self.summarize(TEXT)
+        second = self.summarize('Dana will also write the release notes.', user_id='dana')
+
+        prompt = self.backend.prompts[-1]
+        self.assertIn(f'Current summary:\n{self.backend.summary}', prompt)
+        self.assertIn('dana: Dana will also write the release notes.', prompt)
+        self.assertNotIn(TEXT.split('.')[0], prompt)
+
+        total = first['word_count_original'] + len('dana: Dana will also write the release notes.'.split())
+        self.assertEqual(second['word_count_original'], total)
+        self.assertEqual(second['compression_ratio'], round((1 - second['word_count_summary'] / total) * 100, 2))
+        self.assertEqual(second['reading_time_original'], max(1, round(total / 200)))
+
+        state = ConversationSummary.objects.get(conversation_id='thread')
+        self.assertEqual((state.message_count, state.version, state.word_count), (2, 1, total))
+        row = SummaryRequest.objects.latest('pk')
+        self.assertEqual((row.summary, row.word_count_original), (self.backend.summary, total))
+        self.assertEqual(state.watermark, row.pk)
+
+    def test_short_first_message_starts_the_summary(self):
+        result = self.summarize('Ship Friday?')
+        self.assertEqual(result['summary'], self.backend.summary)
+        self.assertIn('Current summary:\n(none yet)', self.backend.prompts[0])
+        state = ConversationSummary.objects.get(conversation_id='thread')
+        self.assertEqual((state.message_count, state.word_count), (1, 3))
+
+    def test_message_folded_in_concurrently_is_coalesced(self):
+        self.summarize(TEXT)
+        row = SummaryRequest.objects.latest('pk')
+        calls = len(self.backend.prompts)
+        # Replaying the same job: its row is already under the watermark
+        result = self.service.summarize_conversation(TEXT, 'ann', 'thread', self.OPTIONS, request_id=row.request_id)
+        self.assertTrue(result['coalesced'])
+        self.assertEqual(len(self.backend.prompts), calls)
+        self.assertEqual(result['word_count_original'], ConversationSummary.objects.get().word_count)
+
+
+@override_settings(SUMMARIZER_NEAR_DUPLICATE=False, SUMMARIZER_SINGLEFLIGHT=False)
+class SummaryCacheTests(TestCase):
+    def setUp(self):
+        self.cache = SummaryCache(LRUCacheBackend())
+        patcher = mock.patch('summarizer.services.get_summary_cache', return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = SummarizerService()
+        self.service.backend = self.backend = RecordingBackend()
+
+    def test_key_does_not_depend_on_option_order(self):
+        self.assertEqual(
+            SummaryCache.make_key('text', length='short', summary_type='news', model='m'),
+            SummaryCache.make_key('text', model='m', summary_type='news', length='short'),
+        )
+        self.assertNotEqual(SummaryCache.make_key('text', length='short'), SummaryCache.make_key('text', length='long'))
+        self.assertNotEqual(SummaryCache.make_key('text', length='short'), SummaryCache.make_key('other', length='short'))
+
+    def test_lru_evicts_the_least_recently_used_entry(self):
+        backend = LRUCacheBackend(max_entries=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual((backend.get('a'), backend.get('c')), (1, 3))
+        self.assertEqual(backend.evictions, 1)
+
+    def test_entries_expire_after_the_ttl(self):
+        backend = LRUCacheBackend(ttl=60)
+        with mock.patch('summarizer.cache.time.monotonic', return_value=1000.0):
+            backend.set('a', 1)
+        with mock.patch('summarizer.cache.time.monotonic', return_value=1059.0):
+            self.assertEqual(backend.get('a'), 1)
+        with mock.patch('summarizer.cache.time.monotonic', return_value=1060.0):
+            self.assertIsNone(backend.get('a'))
+        self.assertEqual((len(backend), backend.evictions), (0, 1))
+
+    def test_repeated_summary_is_served_from_the_cache(self):
+        first = self.service.generate_summary(TEXT, 'news', 'short')
+        second = self.service.generate_summary(TEXT, 'news', 'short')
+        self.assertEqual(len(self.backend.prompts), 1)
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['summary'], first['summary'])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_bypass_neither_reads_nor_counts_a_lookup(self):
+        self.service.generate_summary(TEXT, 'news', 'short')
+        result = self.service.generate_summary(TEXT, 'news', 'short', use_cache=False)
+        self.assertFalse(result['cached'])
+        self.assertEqual(len(self.backend.prompts), 2)
+        self.assertEqual((self.cache.hits, self.cache.misses, self.cache.bypassed), (0, 1, 1))
+
+    def test_other_model_or_prompt_version_misses(self):
+        self.service.generate_summary(TEXT, 'news', 'short')
+        self.backend.model = 'other-model'
+        self.service.generate_summary(TEXT, 'news', 'short')
+        self.assertEqual(len(self.backend.prompts), 2)
+
+        # An edited system prompt is a new prompt version
+        template = PromptTemplate('news', 'Summarize the news.', SUMMARY_PROMPTS['news']['user'])
+        with mock.patch('summarizer.prompt_registry.PromptRegistry.get', return_value=template):
+            self.service.generate_summary(TEXT, 'news', 'short')
+        self.assertEqual(len(self.backend.prompts), 3)
+        self.assertEqual(self.cache.hits, 0)
+
+
+@override_settings(OPENAI_API_KEY='test-key')
+class ClientTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(clients, _client=None, _async_clients=weakref.WeakKeyDictionary())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sync_client_is_shared_by_every_thread(self):
+        seen = []
+        threads = [threading.Thread(target=lambda: seen.append(clients.get_openai_client())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(seen), 4)
+        self.assertTrue(all(client is seen[0] for client in seen))
+        self.assertIs(clients.get_openai_client(), seen[0])
+        self.assertEqual(seen[0].max_retries, 0)
+
+    def test_async_client_per_event_loop(self):
+        async def twice():
+            return clients.get_async_openai_client(), clients.get_async_openai_client()
+
+        first, again = asyncio.run(twice())
+        self.assertIs(first, again)
+        second, _ = asyncio.run(twice())
+        self.assertIsNot(second, first)
+
+        # A closed loop's client is dropped along with the loop
+        gc.collect()
+        self.assertEqual(len(clients._async_clients), 0)
+
+
+@override_settings(SUMMARIZER_NEAR_DUPLICATE=False, SUMMARIZER_SINGLEFLIGHT=False)
+class BatchSummarizeTests(TestCase):
+    def setUp(self):
+        self.service = SummarizerService()
+        self.service.backend = self.backend = RecordingBackend()
+        for target, value in (('summarizer.views.get_summarizer_service', self.service),
+                              ('summarizer.services.get_summary_cache', SummaryCache(LRUCacheBackend()))):
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_duplicates_run_once_and_failures_stay_per_item(self):
+        items = [
+            {'text': TEXT},
+            {'text': 'Too short.'},
+            {'text': TEXT},
+            {'text': TEXT, 'options': {'length': 'short'}},
+        ]
+        with mock.patch.object(SummaryRequest.objects, 'bulk_create', wraps=SummaryRequest.objects.bulk_create) as bulk_create, \
+                self.assertLogs('summarizer.services', 'ERROR'):
+            response = self.client.post('/summarize/batch', {'items': items, 'user_id': 'u1'}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['total'], body['unique'], body['succeeded'], body['failed']), (4, 3, 3, 1))
+        self.assertEqual([result['status'] for result in body['results']], ['success', 'error', 'success', 'success'])
+        self.assertEqual([result['index'] for result in body['results']], [0, 1, 2, 3])
+        self.assertIn('Text too short', body['results'][1]['error'])
+        # The repeated item shares the first one's summary; the one with other options does not
+        self.assertEqual(len(self.backend.prompts), 2)
+        self.assertEqual(body['results'][0]['summary'], body['results'][2]['summary'])
+
+        bulk_create.assert_called_once()
+        self.assertEqual(SummaryRequest.objects.filter(user_id='u1').count(), 3)
+        self.assertEqual(
+            set(SummaryRequest.objects.values_list('request_id', flat=True)),
+            {result['request_id'] for result in body['results'] if result['status'] == 'success'},
+        )
+
+
+class WordEncoding:
+    """Stands in for a tiktoken encoding: one token per space-separated word"""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split(' ')
+
+    def decode(self, words):
+        return ' '.join(words)
+
+
+class TokenTests(TestCase):
+    def setUp(self):
+        tokens._cached_count.cache_clear()
+        self.addCleanup(tokens._cached_count.cache_clear)
+
+    def test_counts_with_the_encoding_when_available(self):
+        with mock.patch('summarizer.tokens._encoding', return_value=WordEncoding()):
+            self.assertEqual(count_tokens('one two three'), 3)
+            # Too long to encode: estimated from the length instead
+            self.assertEqual(count_tokens('x' * (tokens.EXACT_COUNT_MAX_CHARS + 4)), tokens.EXACT_COUNT_MAX_CHARS // 4 + 1)
+
+    def test_falls_back_to_four_characters_per_token_without_tiktoken(self):
+        with mock.patch.object(tokens, 'tiktoken', None):
+            tokens._encoding.cache_clear()
+            self.addCleanup(tokens._encoding.cache_clear)
+            self.assertIsNone(tokens._encoding('gpt-4o'))
+            self.assertEqual(count_tokens('one two three'), 4)
+            self.assertEqual(count_tokens(''), 0)
+
+    def test_output_budget_follows_the_length_and_the_input(self):
+        # 'short' allows 100 words: 100 * 1.35 tokens per word * 2 for formatting
+        self.assertEqual(tokens.max_output_tokens('short'), 270)
+        self.assertEqual(tokens.max_output_tokens('long'), 1080)
+        self.assertEqual(tokens.max_output_tokens('short', input_tokens=200), 200)
+        self.assertEqual(tokens.max_output_tokens('short', input_tokens=10), tokens.MIN_OUTPUT_TOKENS)
+        self.assertEqual(tokens.max_output_tokens('short', input_tokens=10 ** 6), 270)
+
+    def test_trim_cuts_on_a_word_boundary(self):
+        with mock.patch('summarizer.tokens._encoding', return_value=None):
+            self.assertEqual(tokens.trim_to_tokens('short text', 10), 'short text')
+            self.assertEqual(tokens.trim_to_tokens('alpha beta gamma delta', 3), 'alpha beta')
+        with mock.patch('summarizer.tokens._encoding', return_value=WordEncoding()):
+            self.assertEqual(tokens.trim_to_tokens('alpha beta gamma delta', 3), 'alpha beta')
+
+    @override_settings(OPENAI_CONTEXT_TOKENS=1500, SUMMARIZER_NEAR_DUPLICATE=False, SUMMARIZER_SINGLEFLIGHT=False)
+    def test_single_mode_trims_input_to_the_context_budget(self):
+        service = SummarizerService()
+        service.backend = backend = RecordingBackend()
+        text = TEXT * 20
+        with mock.patch('summarizer.services.get_summary_cache', return_value=None), \
+                self.assertLogs('summarizer.services', 'WARNING'):
+            result = service.generate_summary(text, 'news', 'short', mode='single')
+        self.assertTrue(result['truncated'])
+        self.assertGreater(result['input_tokens'], 1500)
+        self.assertLess(count_tokens(backend.prompts[0]), 1500)
+
+
+class BackendTests(SimpleTestCase):
+    MESSAGES = [{'role': 'system', 'content': 'Summarize.'}, {'role': 'user', 'content': 'one two three four five'}]
+
+    @override_settings(SUMMARIZER_LLM_BACKEND='openai')
+    def test_openai_is_the_default_backend(self):
+        self.assertIsInstance(build_llm_backend(), OpenAIBackend)
+
+    @override_settings(SUMMARIZER_LLM_BACKEND='stub', SUMMARIZER_STUB_LATENCY_MS=50.0, SUMMARIZER_STUB_ERROR_RATE=0.25,
+                       SUMMARIZER_STUB_SEED=7)
+    def test_stub_backend_takes_its_settings(self):
+        backend = build_llm_backend()
+        self.assertIsInstance(backend, StubBackend)
+        self.assertEqual((backend.latency_ms, backend.error_rate), (50.0, 0.25))
+
+    @override_settings(SUMMARIZER_LLM_BACKEND='other')
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            build_llm_backend()
+
+    def test_stub_summary_is_cut_to_max_tokens(self):
+        backend = StubBackend(latency_ms=0)
+        completion = backend.complete(self.MESSAGES, max_tokens=4)
+        # A word counts as 1.35 tokens, so 4 tokens hold 2 words
+        self.assertEqual(completion, Completion('one two', Usage(6, 2), 'stop'))
+
+    def test_stub_latency(self):
+        sleeps = []
+        with mock.patch('summarizer.backends.time.sleep', sleeps.append):
+            StubBackend(latency_ms=250).complete(self.MESSAGES, 100)
+            backend = StubBackend(latency_ms=250, latency_sigma=0.5, seed=3)
+            for _ in range(50):
+                backend.complete(self.MESSAGES, 100)
+        self.assertEqual(sleeps[0], 0.25)
+        varied = sleeps[1:]
+        self.assertGreater(len(set(varied)), 1)
+        self.assertTrue(0.1 < sorted(varied)[len(varied) // 2] < 0.5)
+
+    def test_stub_timeout_raises_after_the_timeout(self):
+        with mock.patch('summarizer.backends.time.sleep') as sleep, self.assertRaises(openai.APITimeoutError):
+            StubBackend(latency_ms=5000).complete(self.MESSAGES, 100, timeout=1.0)
+        sleep.assert_called_once_with(1.0)
+
+    def test_stub_error_rate_is_seeded(self):
+        def outcomes(seed):
+            backend = StubBackend(latency_ms=0, error_rate=0.3, seed=seed)
+            kinds = []
+            for _ in range(200):
+                try:
+                    backend.complete(self.MESSAGES, 100)
+                    kinds.append(None)
+                except openai.APIError as e:
+                    kinds.append(type(e))
+            return kinds
+
+        kinds = outcomes(5)
+        self.assertEqual(kinds, outcomes(5))
+        errors = [kind for kind in kinds if kind is not None]
+        self.assertTrue(40 < len(errors) < 80)
+        self.assertEqual(
+            set(errors), {openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError}
+        )
+        self.assertNotEqual(kinds, outcomes(6))
+
+    def test_stub_stream_yields_words_then_usage(self):
+        async def collect():
+            return [part async for part in StubBackend(latency_ms=0).astream(self.MESSAGES, 100)]
+
+        parts = asyncio.run(collect())
+        self.assertEqual(''.join(part.text for part in parts), 'one two three four five ')
+        self.assertEqual(parts[-1], Completion('', Usage(6, 5), 'stop'))
+
+
+class PrometheusFormatTests(SimpleTestCase):
+    def test_counters_gauges_and_histograms(self):
+        registry = metrics.MetricsRegistry()
+        registry.inc('summaries', summary_type='news', outcome='generated')
+        registry.inc('summaries', 2, summary_type='general', outcome='cached')
+        registry.set_gauge('ratelimit_queue_depth', 3, priority='batch')
+        histogram = registry.histograms[('stage_ms', (('stage', 'llm'),))] = metrics.Histogram((10, 100))
+        for value in (5, 10, 50, 1000):
+            histogram.observe(value)
+
+        self.assertEqual(metrics.render_prometheus(registry.snapshot()), (
+            '# TYPE summarizer_summaries_total counter\n'
+            'summarizer_summaries_total{outcome="generated",summary_type="news"} 1\n'
+            'summarizer_summaries_total{outcome="cached",summary_type="general"} 2\n'
+            '# TYPE summarizer_ratelimit_queue_depth gauge\n'
+            'summarizer_ratelimit_queue_depth{priority="batch"} 3\n'
+            '# TYPE summarizer_stage_ms histogram\n'
+            # Buckets are cumulative and inclusive of their bound
+            'summarizer_stage_ms_bucket{le="10",stage="llm"} 2\n'
+            'summarizer_stage_ms_bucket{le="100",stage="llm"} 3\n'
+            'summarizer_stage_ms_bucket{le="+Inf",stage="llm"} 4\n'
+            'summarizer_stage_ms_sum{stage="llm"} 1065.0\n'
+            'summarizer_stage_ms_count{stage="llm"} 4\n'
+        ))
+
+    def test_label_values_are_escaped(self):
+        registry = metrics.MetricsRegistry()
+        registry.inc('summary_errors', error='say "hi"\\now\n')
+        self.assertIn(
+            'summarizer_summary_errors_total{error="say \\"hi\\"\\\\now\\n"} 1',
+            metrics.render_prometheus(registry.snapshot()),
+        )
+
+    @override_settings(SUMMARIZER_METRICS=True)
+    def test_metrics_endpoint(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        metrics.inc('summaries', summary_type='news', outcome='generated')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'summarizer_summaries_total{outcome="generated",summary_type="news"} 1\n', response.content)
+
+    @override_settings(SUMMARIZER_METRICS=False)
+    def test_metrics_endpoint_when_disabled(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+
+class PruneSummaryRequestsTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        for number, age in enumerate([100, 95, 91, 92, 93, 10, 0]):
+            row = SummaryRequest.objects.create(
+                request_id=f'req-{number}', user_id='user', conversation_id='conversation', summary='Summary.',
+                word_count_original=20, word_count_summary=1, compression_ratio=95.0,
+                **SummaryRequest.original_text_fields(f'Original text {number}.', 'plain'),
+            )
+            SummaryRequest.objects.filter(pk=row.pk).update(created_at=now - timedelta(days=age))
+
+    def prune(self, *args):
+        out = io.StringIO()
+        call_command('prune_summary_requests', *args, stdout=out)
+        return out.getvalue()
+
+    def remaining(self):
+        return sorted(SummaryRequest.objects.values_list('request_id', flat=True))
+
+    def test_deletes_rows_older_than_the_cutoff_in_batches(self):
+        with mock.patch('summarizer.management.commands.prune_summary_requests.time.sleep') as sleep:
+            output = self.prune('--days', '90', '--batch-size', '2', '--pause', '0.5')
+        self.assertIn('Deleted 5 summary requests', output)
+        self.assertEqual(self.remaining(), ['req-5', 'req-6'])
+        # One pause after each batch of two: 2 + 2 + 1 rows
+        self.assertEqual(sleep.call_count, 3)
+
+    def test_dry_run_changes_nothing(self):
+        output = self.prune('--days', '90', '--dry-run', '--compact', '--storage', 'hash')
+        self.assertIn('Would delete 5 summary requests', output)
+        self.assertIn('Would compact 7 summary requests', output)
+        self.assertEqual(len(self.remaining()), 7)
+        self.assertFalse(SummaryRequest.objects.filter(original_text='').exists())
+
+    def test_zero_days_keeps_everything(self):
+        self.prune('--days', '0')
+        self.assertEqual(len(self.remaining()), 7)
+
+    def test_archive_then_compact(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'archive.jsonl')
+            self.prune('--days', '30', '--archive', path, '--compact', '--storage', 'compressed')
+            with open(path, encoding='utf-8') as archive:
+                records = [json.loads(line) for line in archive]
+        self.assertEqual(sorted(record['request_id'] for record in records), [f'req-{number}' for number in range(5)])
+        self.assertEqual(records[0]['original_text'], 'Original text 0.')
+
+        self.assertEqual(self.remaining(), ['req-5', 'req-6'])
+        row = SummaryRequest.objects.get(request_id='req-5')
+        self.assertEqual(row.original_text, '')
+        self.assertEqual(row.get_original_text(), 'Original text 5.')
+
+    def test_batch_size_must_be_positive(self):
+        with self.assertRaises(CommandError):
+            self.prune('--batch-size', '0')
+
+
+class FailingPool:
+    """Process pool whose tasks fail with error; keeps the shared memory names it was given"""
+
+    def __init__(self, error):
+        self.error = error
+        self.blocks = []
+
+    def submit(self, fn, name, size, log_digest=None):
+        self.blocks.append(name)
+        future = Future()
+        future.set_exception(self.error)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+class OffloadTests(SimpleTestCase):
+    HTML = '<p>Quarterly   results <b>beat</b> expectations &amp; guidance.</p>' * 20
+
+    def assertUnlinked(self, name):
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+    def test_round_trip_through_a_worker_process(self):
+        offloader = CPUOffloader(max_workers=1, min_chars=10)
+        self.addCleanup(offloader.shutdown)
+        cleaned, stats, digest = offloader.clean_and_measure(self.HTML)
+        expected = TextProcessor.clean_text(self.HTML)
+        self.assertEqual(cleaned, expected)
+        self.assertEqual(stats.word_count, TextStats(expected).word_count)
+        self.assertEqual(stats.key_phrases(), TextStats(expected).key_phrases())
+        self.assertIsNone(digest)
+
+    def test_broken_pool_is_replaced_and_the_text_done_inline(self):
+        offloader = CPUOffloader(max_workers=1, min_chars=10, max_queue=0)
+        offloader._pool = pool = FailingPool(BrokenProcessPool())
+        with self.assertLogs('summarizer.offload', 'ERROR'):
+            cleaned, stats, _ = offloader.clean_and_measure(self.HTML)
+        self.assertEqual(cleaned, TextProcessor.clean_text(self.HTML))
+        self.assertIsNone(offloader._pool)
+        self.assertUnlinked(pool.blocks[0])
+        # The slot was given back
+        self.assertTrue(offloader._slots.acquire(blocking=False))
+
+    def test_worker_error_frees_the_block_and_the_slot(self):
+        offloader = CPUOffloader(max_workers=1, min_chars=10, max_queue=0)
+        offloader._pool = pool = FailingPool(UnicodeDecodeError('utf-8', b'', 0, 1, 'bad'))
+        with self.assertRaises(UnicodeDecodeError):
+            offloader.clean_and_measure(self.HTML)
+        self.assertIs(offloader._pool, pool)
+        self.assertUnlinked(pool.blocks[0])
+        self.assertTrue(offloader._slots.acquire(blocking=False))
+
+    def test_busy_when_every_slot_is_taken(self):
+        offloader = CPUOffloader(max_workers=1, min_chars=10, max_queue=0, queue_timeout=0.01)
+        offloader._slots.acquire()
+        with mock.patch.object(offloader, '_executor') as executor, self.assertRaises(OffloadBusy):
+            offloader.clean_and_measure(self.HTML)
+        executor.assert_not_called()
+
+    def test_small_input_is_processed_inline(self):
+        offloader = CPUOffloader(max_workers=1, min_chars=len(self.HTML) + 1)
+        with mock.patch('summarizer.offload.get_offloader', return_value=offloader), \
+                mock.patch.object(offloader, 'clean_and_measure') as offloaded:
+            cleaned, stats, _ = clean_and_measure(self.HTML)
+            self.assertEqual(cleaned, TextProcessor.clean_text(self.HTML))
+            offloaded.assert_not_called()
+            clean_and_measure(self.HTML + 'x')
+            offloaded.assert_called_once()
+
+
+class TextStreamDecoderTests(SimpleTestCase):
+    TEXT = 'Naïve café  über 日本語\n\n  at frame 🎉 one\ttwo  \n'
+
+    @staticmethod
+    def decode(data, chunk_size, max_bytes=10 ** 6, **options):
+        decoder = TextStreamDecoder(max_bytes, **options)
+        for start in range(0, len(data), chunk_size):
+            decoder.feed(data[start:start + chunk_size])
+        return decoder.finish()
+
+    def test_multibyte_characters_split_across_chunks(self):
+        data = self.TEXT.encode('utf-8')
+        whole = self.decode(data, len(data))
+        self.assertEqual(whole, 'Naïve café über 日本語\n\nat frame 🎉 one two')
+        for chunk_size in (1, 2, 3, 5):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.decode(data, chunk_size), whole)
+        self.assertEqual(TextProcessor.clean_text(whole), TextProcessor.clean_text(self.TEXT))
+        self.assertEqual(TextProcessor.clean_paragraphs(whole), TextProcessor.clean_paragraphs(self.TEXT))
+
+    def test_lines_and_indentation_are_kept(self):
+        data = b'Traceback:\n  File "a.py"\n \n\tnext paragraph\nline'
+        for chunk_size in (1, 4, len(data)):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.decode(data, chunk_size), 'Traceback:\n File "a.py"\n\nnext paragraph\nline')
+
+    def test_gzip_and_other_charsets(self):
+        self.assertEqual(self.decode(gzip.compress(self.TEXT.encode('utf-8')), 7, compressed=True), self.decode(self.TEXT.encode('utf-8'), 7))
+        self.assertEqual(self.decode('café'.encode('latin-1'), 1, charset='latin-1'), 'café')
+        with self.assertRaises(UploadError):
+            TextStreamDecoder(100, charset='no-such-charset')
+
+    def test_invalid_bytes_become_replacement_characters(self):
+        self.assertEqual(self.decode(b'ok \xff\xfe bytes \xe6\x97', 1), 'ok \ufffd\ufffd bytes \ufffd')
+
+    def test_size_limit(self):
+        data = b'x' * 100
+        self.assertEqual(len(self.decode(data, 10, max_bytes=100)), 100)
+        with self.assertRaises(UploadTooLarge):
+            self.decode(data + b'x', 10, max_bytes=100)
+
+    def test_size_limit_applies_to_inflated_text(self):
+        bomb = gzip.compress(b' ' * 10 ** 7)
+        decoder = TextStreamDecoder(1000, compressed=True)
+        with self.assertRaises(UploadTooLarge):
+            decoder.feed(bomb)
+        # Stopped one byte past the limit instead of inflating everything
+        self.assertEqual(decoder.received, 1001)
+
+    def test_corrupt_or_truncated_gzip(self):
+        data = gzip.compress(self.TEXT.encode('utf-8'))
+        with self.assertRaises(UploadError):
+            self.decode(data[:len(data) // 2], 4, compressed=True)
+        with self.assertRaises(UploadError):
+            self.decode(b'not gzip at all', 4, compressed=True)
+
+
+class NearDuplicateTests(SimpleTestCase):
+    VOCABULARY = [f'word{number}' for number in range(2000)]
+
+    def article(self, seed, words=400):
+        return ' '.join(random.Random(seed).choices(self.VOCABULARY, k=words))
+
+    def setUp(self):
+        self.index = NearDuplicateIndex(threshold=0.85, max_entries=3, persist=False)
+        self.original = self.article(1)
+        self.index.add('original', 'options', minhash_signature(self.original), 'Summary of the original.')
+
+    def test_near_duplicate_is_found(self):
+        words = self.original.split()
+        words[200] = 'edited'
+        edited = ' '.join(words) + ' Updated at 10:45.'
+        match = self.index.lookup('options', minhash_signature(edited))
+        self.assertIsNotNone(match)
+        entry, score = match
+        self.assertEqual(entry.summary, 'Summary of the original.')
+        self.assertGreaterEqual(score, 0.85)
+
+    def test_unrelated_texts_are_not_matched(self):
+        for seed in range(2, 22):
+            with self.subTest(seed=seed):
+                self.assertIsNone(self.index.lookup('options', minhash_signature(self.article(seed))))
+        self.assertEqual((self.index.hits, self.index.misses), (0, 20))
+
+    def test_half_rewritten_text_is_not_matched(self):
+        words = self.original.split()
+        rewritten = ' '.join(words[:200] + self.article(2, 200).split())
+        signature = minhash_signature(rewritten)
+        self.assertLess(similarity(signature, minhash_signature(self.original)), 0.7)
+        self.assertIsNone(self.index.lookup('options', signature))
+
+    def test_other_options_never_match(self):
+        self.assertIsNone(self.index.lookup('other options', minhash_signature(self.original)))
+
+    def test_signature_respects_the_word_limits(self):
+        self.assertIsNone(minhash_signature('too few words', min_words=5))
+        self.assertIsNone(minhash_signature(self.original, max_words=100))
+        self.assertEqual(minhash_signature('A b c'), minhash_signature('a  B\nc'))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for seed in (2, 3):
+            self.index.add(f'article-{seed}', 'options', minhash_signature(self.article(seed)), f'Summary {seed}.')
+        self.assertIsNotNone(self.index.lookup('options', minhash_signature(self.original)))
+        self.index.add('article-4', 'options', minhash_signature(self.article(4)), 'Summary 4.')
+        self.assertEqual(self.index.evictions, 1)
+        self.assertIsNone(self.index.lookup('options', minhash_signature(self.article(2))))
+        self.assertIsNotNone(self.index.lookup('options', minhash_signature(self.original)))
+
+
+class PromptRegistryTests(TransactionTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.registry = PromptRegistry(refresh_interval=3600)
+        # Keep the process-wide registry out of it: it would be told to reload these rows
+        patcher = mock.patch('summarizer.prompt_registry._registry', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def template(self, name, user='Summarize for lawyers in {length}:\n{text}'):
+        return SummaryTemplate.objects.create(
+            name=name, description='', system_prompt=f'You summarize {name} texts.', user_prompt_template=user
+        )
+
+    def reloaded(self):
+        """Templates after the next stamp check has run"""
+        self.registry.expire()
+        with mock.patch.object(self.registry, '_load', wraps=self.registry._load) as load:
+            self.registry.types()
+            wait_until(lambda: not self.registry._checking)
+        return load.called
+
+    def test_built_in_prompts_without_templates(self):
+        self.assertEqual(sorted(self.registry.types()), sorted(SUMMARY_PROMPTS))
+        template = self.registry.get('news')
+        self.assertEqual((template.source, template.system), ('builtin', SUMMARY_PROMPTS['news']['system']))
+        # Unknown types fall back to the general prompt
+        self.assertEqual(self.registry.get('unknown'), self.registry.get('general'))
+
+    def test_reloads_only_when_the_stamp_changes(self):
+        self.registry.types()
+        self.assertFalse(self.reloaded())
+
+        # Saving a template replaces the stamp
+        self.template('legal')
+        self.assertTrue(self.reloaded())
+        self.assertIn('legal', self.registry)
+        self.assertEqual(self.registry.get('legal').source, 'database')
+        self.assertFalse(self.reloaded())
+
+        # update() sends no signal, so nothing reloads until the stamp changes
+        SummaryTemplate.objects.filter(name='legal').update(is_active=False)
+        self.assertFalse(self.reloaded())
+        self.assertIn('legal', self.registry)
+        SummaryTemplate.objects.get(name='legal').delete()
+        self.assertTrue(self.reloaded())
+        self.assertNotIn('legal', self.registry)
+
+    def test_template_overrides_a_built_in_and_bad_ones_are_skipped(self):
+        self.template('news')
+        with self.assertLogs('summarizer.prompt_registry', 'WARNING'):
+            self.template('broken', user='No placeholder here')
+            self.template('x' * 30)
+            self.registry.types()
+        self.assertEqual(self.registry.get('news').system, 'You summarize news texts.')
+        self.assertNotEqual(self.registry.get('news').version, PromptTemplate(
+            'news', SUMMARY_PROMPTS['news']['system'], SUMMARY_PROMPTS['news']['user']
+        ).version)
+        self.assertNotIn('broken', self.registry)
+        self.assertNotIn('x' * 30, self.registry)
+
+    def test_serializer_rejects_unknown_summary_types(self):
+        serializer = SummaryOptionsSerializer(data={'summary_type': 'poetry'})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('summary_type', serializer.errors)
+        self.assertIn('news', str(serializer.errors['summary_type'][0]))
+
+        serializer = SummaryOptionsSerializer(data={'summary_type': 'news'})
+        self.assertTrue(serializer.is_valid())
+
+
+@override_settings(SUMMARIZER_NEAR_DUPLICATE=False, SUMMARIZER_SINGLEFLIGHT=False)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.service = SummarizerService()
+        self.service.backend = self.backend = RecordingBackend()
+        for target, value in (('summarizer.async_views.get_summarizer_service', self.service),
+                              ('summarizer.services.get_summary_cache', None)):
+            patcher = mock.patch(target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def post(self, path, data):
+        return await AsyncClient().post(path, data, content_type='application/json')
+
+    async def events(self, response):
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode('utf-8')
+        events = []
+        for block in body.strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+        return events
+
+    async def test_webhook_summarizes_and_saves_the_request(self):
+        response = await self.post('/async/webhook', {'message': f'news: {TEXT}', 'user_id': 'u1', 'conversation_id': 'c1'})
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['status'], body['user_id'], body['conversation_id']), ('success', 'u1', 'c1'))
+        self.assertIn(self.backend.summary, body['response'])
+        self.assertIn('*Statistics:*', body['response'])
+        row = await SummaryRequest.objects.aget(user_id='u1')
+        self.assertEqual((row.conversation_id, row.summary), ('c1', self.backend.summary))
+
+    async def test_webhook_help_and_bad_input(self):
+        response = await self.post('/async/webhook', {'message': 'help', 'user_id': 'u1', 'conversation_id': 'c1'})
+        self.assertEqual(response.json()['response'], get_help_message())
+        self.assertEqual((await self.post('/async/webhook', {'message': 'hi'})).status_code, 400)
+        response = await AsyncClient().post('/async/webhook', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.backend.prompts, [])
+
+    async def test_short_webhook_message_is_answered(self):
+        with self.assertLogs('summarizer.services', 'ERROR'):
+            response = await self.post('/async/webhook', {'message': 'Too short.', 'user_id': 'u1', 'conversation_id': 'c1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Please provide longer text', response.json()['response'])
+
+    async def test_summarize(self):
+        response = await self.post('/async/summarize', {'text': TEXT, 'options': {'summary_type': 'news', 'length': 'short'}})
+
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()['summary']
+        self.assertEqual(summary['summary'], self.backend.summary)
+        self.assertEqual(summary['usage']['completion_tokens'], 8)
+        self.assertEqual((await self.post('/async/summarize', {'text': ''})).status_code, 400)
+        response = await self.post('/async/summarize', {'text': TEXT, 'options': {'length': 'huge'}})
+        self.assertEqual((response.status_code, response.json()['error']), (400, 'Invalid options'))
+
+    async def test_stream_sends_deltas_then_stats(self):
+        self.service.backend = StreamingBackend()
+        response = await self.post('/summarize/stream', {'text': TEXT, 'options': {'summary_type': 'news'}})
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        events = await self.events(response)
+        self.assertEqual([event for event, _ in events], ['delta', 'delta', 'stats'])
+        self.assertEqual(''.join(data['text'] for event, data in events[:2]), 'A streamed summary.')
+        stats = events[-1][1]
+        self.assertEqual(stats['usage']['completion_tokens'], 3)
+        self.assertIn('*Statistics:*', stats['statistics'])
+        self.assertLessEqual(stats['ttft_ms'], stats['total_ms'])
+
+    async def test_stream_failure_ends_with_an_error_event(self):
+        self.service.backend = StreamingBackend(error=ValueError('bad chunk'))
+        response = await self.post('/summarize/stream', {'text': TEXT})
+        with self.assertLogs('summarizer', 'ERROR'):
+            events = await self.events(response)
+        self.assertEqual([event for event, _ in events], ['delta', 'error'])
+        self.assertEqual(events[-1][1]['details'], 'bad chunk')
+
+
+class TextStatsTests(SimpleTestCase):
+    TEXTS = [
+        TEXT,
+        'Short text.',
+        '',
+        'The   the THE and Revenue revenue, revenue. growth\n\tgrowth margins ' * 300,
+        ' '.join(f'word{number % 37} filler{number % 11}' for number in range(5000)),
+    ]
+    SUMMARY = 'A short summary of the text above.'
+
+    @staticmethod
+    def legacy(text, summary):
+        """The per-statistic helpers TextStats replaced, each splitting the text again"""
+        words, summary_words = len(text.split()), len(summary.split())
+        meaningful = [word for word in text.lower().split() if word not in KEY_PHRASE_STOP_WORDS and len(word) > 3]
+        return {
+            'words': words,
+            'compression': round((1 - summary_words / words) * 100, 2) if words else 0,
+            'reading_time': max(1, round(words / 200)),
+            'key_phrases': [phrase for phrase, count in Counter(meaningful).most_common(5)],
+            'tokens': TextProcessor.estimate_tokens(text),
+        }
+
+    @staticmethod
+    def single_pass(text, summary):
+        stats = TextStats(text)
+        return {
+            'words': stats.word_count,
+            'compression': stats.compression_ratio(TextStats(summary)),
+            'reading_time': stats.reading_time(),
+            'key_phrases': stats.key_phrases(),
+            'tokens': stats.token_estimate,
+        }
+
+    def test_matches_the_per_statistic_helpers(self):
+        for text in self.TEXTS:
+            with self.subTest(text=text[:40]):
+                self.assertEqual(self.single_pass(text, self.SUMMARY), self.legacy(text, self.SUMMARY))
+
+    def test_slices_never_cut_a_word(self):
+        # Slices far smaller than the words and runs of whitespace in the texts
+        with mock.patch.object(TextStats, 'SLICE_CHARS', 7):
+            for text in self.TEXTS:
+                with self.subTest(text=text[:40]):
+                    self.assertEqual(self.single_pass(text, self.SUMMARY), self.legacy(text, self.SUMMARY))
+
+    def test_trimmed_keeps_counts_and_top_phrases(self):
+        stats = TextStats(self.TEXTS[4])
+        trimmed = stats.trimmed(keep=10)
+        self.assertEqual(trimmed.word_count, stats.word_count)
+        self.assertEqual(trimmed.key_phrases(), stats.key_phrases())
+        self.assertLessEqual(len(trimmed.word_frequencies), 10)
+
+    def test_validation_uses_the_precomputed_count(self):
+        with self.assertRaisesMessage(ValueError, 'got 2'):
+            ContentValidator.validate_text_length('ignored', stats=TextStats('two words'))
+        self.assertTrue(ContentValidator.validate_text_length('', stats=TextStats(TEXT)))
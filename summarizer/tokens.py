@@ -0,0 +1,150 @@
+import functools
+import math
+import re
+import threading
+from django.conf import settings
+from .prompts import LENGTH_GUIDELINES
+
+try:
+    import tiktoken
+except ImportError:  # optional: exact counts when installed, character estimate otherwise
+    tiktoken = None
+
+# Context windows (prompt + completion tokens); the longest matching prefix wins
+MODEL_CONTEXT_TOKENS = {
+    'gpt-3.5-turbo': 16385,
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-4-turbo': 128000,
+    'gpt-4o': 128000,
+    'gpt-4.1': 1047576,
+    'o1': 200000,
+    'o3': 200000,
+    'o4': 200000,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+
+# Chat format framing (per message, and for priming the reply)
+TOKENS_PER_MESSAGE = 3
+REPLY_PRIMING_TOKENS = 3
+
+# Longer texts are estimated from their length; encoding megabytes would cost more than the call saves
+EXACT_COUNT_MAX_CHARS = 200000
+# Counts of short strings (prompt templates, partial summaries) are memoised
+CACHED_COUNT_MAX_CHARS = 8192
+# Headroom for estimate error and the model's own framing
+CONTEXT_SAFETY_RATIO = 0.95
+
+# Output budget: words allowed by LENGTH_GUIDELINES, times tokens per word, times room for formatting
+TOKENS_PER_WORD = 1.35
+OUTPUT_HEADROOM = 2.0
+MIN_OUTPUT_TOKENS = 128
+
+
+def context_tokens(model=None):
+    """Context window of the model, or OPENAI_CONTEXT_TOKENS when set"""
+    if settings.OPENAI_CONTEXT_TOKENS:
+        return settings.OPENAI_CONTEXT_TOKENS
+    model = model or settings.OPENAI_MODEL
+    matches = [prefix for prefix in MODEL_CONTEXT_TOKENS if model.startswith(prefix)]
+    return MODEL_CONTEXT_TOKENS[max(matches, key=len)] if matches else DEFAULT_CONTEXT_TOKENS
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+
+
+def _exact_count(text, model):
+    return len(_encoding(model).encode(text, disallowed_special=()))
+
+
+_cached_count = functools.lru_cache(maxsize=4096)(_exact_count)
+
+
+def count_tokens(text, model=None):
+    """Tokens in text: exact with tiktoken, otherwise ~4 characters per token"""
+    model = model or settings.OPENAI_MODEL
+    if len(text) > EXACT_COUNT_MAX_CHARS or _encoding(model) is None:
+        return -(-len(text) // 4)
+    if len(text) <= CACHED_COUNT_MAX_CHARS:
+        return _cached_count(text, model)
+    return _exact_count(text, model)
+
+
+def trim_to_tokens(text, max_tokens, model=None):
+    """Cut text down to at most max_tokens, on a word boundary where possible"""
+    model = model or settings.OPENAI_MODEL
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    encoding = _encoding(model)
+    if encoding is not None and len(text) <= EXACT_COUNT_MAX_CHARS:
+        trimmed = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        trimmed = text[:max_tokens * 4]
+    cut = trimmed.rfind(' ')
+    return trimmed[:cut] if cut > len(trimmed) // 2 else trimmed
+
+
+# Bounded: edited SummaryTemplates leave their old versions behind
+@functools.lru_cache(maxsize=1024)
+def prompt_overhead_tokens(template, length, include_bullet_points, model):
+    """Tokens of the prompt around the text (system prompt, template, chat framing)"""
+    return (
+        count_tokens(template.system, model) + count_tokens(template.render('', length, include_bullet_points), model)
+        + 2 * TOKENS_PER_MESSAGE + REPLY_PRIMING_TOKENS
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _guideline_words(length):
+    """Upper word count from LENGTH_GUIDELINES ('50-100 words' -> 100); unknown lengths count as long"""
+    guideline = LENGTH_GUIDELINES.get(length, LENGTH_GUIDELINES['long'])
+    return int(re.findall(r'(\d+)\s*words', guideline)[-1])
+
+
+def max_output_tokens(length, input_tokens=None):
+    """Completion budget for a summary of the given length of an input of input_tokens"""
+    budget = math.ceil(_guideline_words(length) * TOKENS_PER_WORD * OUTPUT_HEADROOM)
+    if input_tokens is not None:
+        # A summary never needs more room than the text it summarizes
+        budget = min(budget, max(MIN_OUTPUT_TOKENS, input_tokens))
+    return budget
+
+
+def input_budget(template, length, include_bullet_points, model=None):
+    """Tokens of text that fit into one call next to the PromptTemplate's prompt and the reply"""
+    model = model or settings.OPENAI_MODEL
+    usable = int(context_tokens(model) * CONTEXT_SAFETY_RATIO)
+    return usable - prompt_overhead_tokens(template, length, bool(include_bullet_points), model) - max_output_tokens(length)
+
+
+class TokenUsage:
+    """Prompt and completion tokens reported by the API across the calls of one request"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, usage):
+        """Add a response.usage object (None when the server did not report usage)"""
+        with self._lock:
+            self.calls += 1
+            if usage is not None:
+                self.prompt_tokens += usage.prompt_tokens or 0
+                self.completion_tokens += usage.completion_tokens or 0
+
+    def as_dict(self):
+        return {
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.prompt_tokens + self.completion_tokens,
+            'calls': self.calls,
+        }
@@ -0,0 +1,139 @@
+import codecs
+import zlib
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+# Bytes read from the request body at a time
+CHUNK_SIZE = 64 * 1024
+
+GZIP_CONTENT_TYPES = frozenset({'application/gzip', 'application/x-gzip'})
+
+
+class UploadTooLarge(Exception):
+    """The uploaded text is larger than SUMMARIZER_UPLOAD_MAX_BYTES"""
+
+
+class UploadError(ValueError):
+    """The upload cannot be read as text (corrupt gzip, unknown charset)"""
+
+
+class TextStreamDecoder:
+    """Turn an uploaded body, fed chunk by chunk, into whitespace-normalized text
+
+    Gzip is inflated and bytes are decoded incrementally, and as the chunks
+    arrive every run of whitespace becomes a blank line if it contained a
+    blank line (paragraph breaks), one newline if it contained one (so logs
+    keep their lines, indented ones with a leading space) and one space
+    otherwise. TextProcessor.clean_text and clean_paragraphs make the same
+    of the output as of the whole text, without the raw body or a decoded
+    copy of it ever being held in memory. Raises UploadTooLarge as soon as more than
+    max_bytes of (decompressed) text has been received.
+    """
+
+    def __init__(self, max_bytes, compressed=False, charset='utf-8'):
+        self.max_bytes = max_bytes
+        self.received = 0
+        self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if compressed else None
+        try:
+            self._decoder = codecs.getincrementaldecoder(charset or 'utf-8')(errors='replace')
+        except LookupError:
+            raise UploadError(f"Unknown charset {charset!r}.")
+        self._pieces = []
+        # Separator owed before the next word: None, ' ', '\n', '\n ' (indented line) or '\n\n'
+        self._separator = None
+
+    def feed(self, data):
+        if self._inflater is None:
+            self._take(data)
+            return
+        try:
+            # Inflate at most one byte past the limit, so a small gzip bomb never expands in memory
+            while data:
+                out = self._inflater.decompress(data, self.max_bytes - self.received + 1)
+                data = self._inflater.unconsumed_tail
+                self._take(out)
+        except zlib.error as e:
+            raise UploadError(f"Invalid gzip data: {str(e)}")
+
+    def finish(self):
+        """The normalized text; raises UploadError if the gzip stream was cut short"""
+        if self._inflater is not None and not self._inflater.eof:
+            raise UploadError("Invalid gzip data: the stream is incomplete.")
+        self._append(self._decoder.decode(b'', final=True))
+        return ''.join(self._pieces)
+
+    def _take(self, data):
+        self.received += len(data)
+        if self.received > self.max_bytes:
+            raise UploadTooLarge(f"Uploaded text is larger than {self.max_bytes} bytes.")
+        self._append(self._decoder.decode(data))
+
+    def _append(self, text):
+        for number, line in enumerate(text.split('\n')):
+            if number:
+                # A second line break before the next word makes a paragraph break
+                self._separator = '\n\n' if self._separator and self._separator[0] == '\n' else '\n'
+            if line[:1].isspace() and self._separator != '\n\n':
+                # Indentation after a line break is kept as one space (stack traces, continued messages)
+                self._separator = '\n ' if self._separator in ('\n', '\n ') else ' '
+            words = line.split()
+            if not words:
+                continue
+            # A word cut by a chunk boundary is rejoined because neither side has whitespace there
+            if self._pieces and self._separator:
+                self._pieces.append(self._separator)
+            self._pieces.append(' '.join(words))
+            self._separator = ' ' if line[-1].isspace() else None
+
+
+def is_gzip(content_type, file_name=None, content_encoding=None):
+    return (
+        content_type in GZIP_CONTENT_TYPES
+        or (content_encoding or '').strip().lower() == 'gzip'
+        or (file_name or '').lower().endswith('.gz')
+    )
+
+
+def read_text_body(request, max_bytes):
+    """Stream a raw text or gzip request body through a TextStreamDecoder"""
+    decoder = TextStreamDecoder(
+        max_bytes,
+        compressed=is_gzip(request.content_type, content_encoding=request.headers.get('Content-Encoding')),
+        charset=request.content_params.get('charset'),
+    )
+    while True:
+        chunk = request.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        decoder.feed(chunk)
+    return decoder.finish()
+
+
+class TextUploadHandler(FileUploadHandler):
+    """Multipart upload handler that decodes one file field as it arrives instead of storing it
+
+    Other files are skipped. After the request has been parsed, the
+    text is in .text (None when the field was not sent).
+    """
+
+    chunk_size = CHUNK_SIZE
+
+    def __init__(self, upload_field, max_bytes, request=None):
+        super().__init__(request)
+        self.upload_field = upload_field
+        self.max_bytes = max_bytes
+        self.text = None
+        self._decoder = None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if field_name != self.upload_field or self._decoder is not None:
+            raise SkipFile()
+        self._decoder = TextStreamDecoder(self.max_bytes, is_gzip(content_type, file_name), charset)
+
+    def receive_data_chunk(self, raw_data, start):
+        self._decoder.feed(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        self.text = self._decoder.finish()
+        return None
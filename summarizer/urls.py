@@ -1,10 +1,19 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     path('webhook', views.telex_webhook, name='telex-webhook'),
     path('health', views.health_check, name='health-check'),
+    path('metrics', views.prometheus_metrics, name='metrics'),
     path('summarize', views.custom_summarize, name='custom-summarize'),
+    path('summarize/upload', views.upload_summarize, name='upload-summarize'),
+    path('summarize/batch', views.batch_summarize, name='batch-summarize'),
     path('quick-summarize', views.quick_summarize, name='quick-summarize'),
     path('workflow', views.workflow_definition, name='workflow-definition'),
+    path('jobs/<str:job_id>', views.job_status_view, name='job-status'),
+    path('jobs/<str:job_id>/result', views.job_result_view, name='job-result'),
+    path('async/webhook', async_views.telex_webhook, name='async-telex-webhook'),
+    path('async/summarize', async_views.custom_summarize, name='async-custom-summarize'),
+    path('async/quick-summarize', async_views.quick_summarize, name='async-quick-summarize'),
+    path('summarize/stream', async_views.summarize_stream, name='summarize-stream'),
 ]
\ No newline at end of file
@@ -1,57 +1,209 @@
+import copy
 import re
+import html
 import nltk
-from bs4 import BeautifulSoup
+from collections import Counter
 import logging
+from .markup import visible_text
+from .tokens import count_tokens
 
 logger = logging.getLogger(__name__)
 
+# Simple stop words list for key phrase extraction
+KEY_PHRASE_STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+
 class TextProcessor: #
     @staticmethod
     def clean_text(text):
         """Clean and preprocess text for summarization"""
-        # Remove HTML tags
-        soup = BeautifulSoup(text, 'html.parser')
-        text = soup.get_text()
+        # Remove HTML tags and decode entities; plain text (most input) skips this entirely
+        if '<' in text or '&' in text:
+            text = TextProcessor.strip_markup(text)
         
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        return text
+        return ' '.join(text.split())
+    
+    @staticmethod
+    def clean_paragraphs(text):
+        """clean_text, except that paragraphs (split by blank lines) stay split by one blank line"""
+        if '<' in text or '&' in text:
+            text = TextProcessor.strip_markup(text)
+        paragraphs = (' '.join(paragraph.split()) for paragraph in TextChunker.PARAGRAPH_BREAK.split(text))
+        return '\n\n'.join(paragraph for paragraph in paragraphs if paragraph)
+    
+    @staticmethod
+    def strip_markup(text):
+        """Visible text of an HTML fragment, without building a DOM"""
+        if '<' in text:
+            return visible_text(text)
+        return html.unescape(text)
+    
+    @staticmethod
+    def estimate_tokens(text, chars_per_token=4):
+        """Cheap token estimate (roughly 4 characters per token for English)"""
+        return -(-len(text) // chars_per_token)
     
     @staticmethod
     def estimate_reading_time(text, words_per_minute=200):
         """Estimate reading time in minutes"""
-        word_count = len(text.split())
-        return max(1, round(word_count / words_per_minute))
+        return TextStats(text).reading_time(words_per_minute)
     
     @staticmethod
     def calculate_compression_ratio(original_text, summary_text):
         """Calculate compression ratio"""
-        original_words = len(original_text.split())
-        summary_words = len(summary_text.split())
-        
-        if original_words == 0:
-            return 0
-        
-        return round((1 - (summary_words / original_words)) * 100, 2)
+        return TextStats(original_text).compression_ratio(TextStats(summary_text))
     
     @staticmethod
     def extract_key_phrases(text, max_phrases=5):
         """Extract potential key phrases (simple implementation)"""
-        words = text.lower().split()
-        # Simple stop words list
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-        meaningful_words = [word for word in words if word not in stop_words and len(word) > 3]
+        return TextStats(text).key_phrases(max_phrases)
+
+class TextStats:
+    """Word-level statistics of a text, computed in a single pass over it"""
+    
+    WHITESPACE = re.compile(r'\s')
+    
+    # Words are counted a slice at a time so large inputs never hold a full word list
+    SLICE_CHARS = 1 << 18
+    
+    def __init__(self, text, chars_per_token=4):
+        self.word_frequencies = Counter()
+        start = 0
+        while start < len(text):
+            end = start + self.SLICE_CHARS
+            if end < len(text):
+                # Extend the slice to the next whitespace so no word is cut in two
+                match = self.WHITESPACE.search(text, end)
+                end = match.start() if match else len(text)
+            self.word_frequencies.update(text[start:end].lower().split())
+            start = end
+        self.word_count = sum(self.word_frequencies.values())
+        self.char_count = len(text)
+        self.token_estimate = TextProcessor.estimate_tokens(text, chars_per_token)
+    
+    def reading_time(self, words_per_minute=200):
+        """Estimate reading time in minutes"""
+        return max(1, round(self.word_count / words_per_minute))
+    
+    def compression_ratio(self, summary_stats):
+        """Calculate compression ratio against the stats of a summary"""
+        if self.word_count == 0:
+            return 0
         
-        # Return most frequent words as simple key phrases
-        from collections import Counter
-        return [phrase for phrase, count in Counter(meaningful_words).most_common(max_phrases)]
+        return round((1 - (summary_stats.word_count / self.word_count)) * 100, 2)
+    
+    def key_phrases(self, max_phrases=5):
+        """Most frequent meaningful words (simple key phrases)"""
+        return [phrase for phrase, count in self._meaningful().most_common(max_phrases)]
+    
+    def trimmed(self, keep=50):
+        """Copy that keeps only the top keep key phrase candidates, cheap to pickle; the counts are unchanged"""
+        stats = copy.copy(self)
+        stats.word_frequencies = Counter(dict(self._meaningful().most_common(keep)))
+        return stats
+    
+    def covering(self, word_count):
+        """Copy measured as word_count words of text, for a summary that also covers text seen earlier"""
+        stats = copy.copy(self)
+        stats.word_count = word_count
+        return stats
+    
+    def _meaningful(self):
+        return Counter({
+            word: count for word, count in self.word_frequencies.items()
+            if word not in KEY_PHRASE_STOP_WORDS and len(word) > 3
+        })
+
+class TextChunker:
+    """Split long text into token-budgeted chunks on paragraph or sentence boundaries
+
+    Sizes are measured with count_tokens, so a chunk of max_tokens fits the
+    same budget the prompt is checked against.
+    """
+    
+    PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+    SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+    
+    def __init__(self, max_tokens=3000, overlap_tokens=200):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("Chunk overlap must be smaller than the chunk size.")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+    
+    def split(self, text):
+        """Return a list of chunks, none larger than max_tokens"""
+        text = text.strip()
+        if count_tokens(text) <= self.max_tokens:
+            return [text] if text else []
+        
+        chunks = []
+        current = []
+        current_tokens = 0
+        for unit in self._units(text):
+            unit_tokens = count_tokens(unit) + 1
+            if current and current_tokens + unit_tokens > self.max_tokens:
+                chunks.append(' '.join(current))
+                current, current_tokens = self._overlap(current)
+            current.append(unit)
+            current_tokens += unit_tokens
+        
+        if current:
+            chunks.append(' '.join(current))
+        return chunks
+    
+    def _units(self, text):
+        """Yield paragraphs, falling back to sentences and then words for oversized pieces"""
+        for paragraph in self.PARAGRAPH_BREAK.split(text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if count_tokens(paragraph) < self.max_tokens - self.overlap_tokens:
+                yield paragraph
+                continue
+            for sentence in self.SENTENCE_BREAK.split(paragraph):
+                if count_tokens(sentence) < self.max_tokens - self.overlap_tokens:
+                    yield sentence
+                else:
+                    yield from self._split_words(sentence)
+    
+    def _split_words(self, text):
+        """Hard-split a run of text with no usable boundaries"""
+        budget = self.max_tokens - self.overlap_tokens - 1
+        piece = []
+        piece_tokens = 0
+        # Every token is at least one character, so a slice of budget characters always fits
+        words = (
+            word[i:i + budget] for word in text.split() for i in range(0, len(word), budget)
+        )
+        for word in words:
+            word_tokens = count_tokens(word) + 1
+            if piece and piece_tokens + word_tokens > budget:
+                yield ' '.join(piece)
+                piece, piece_tokens = [], 0
+            piece.append(word)
+            piece_tokens += word_tokens
+        if piece:
+            yield ' '.join(piece)
+    
+    def _overlap(self, units):
+        """Carry the trailing units of the previous chunk into the next one"""
+        carried = []
+        carried_tokens = 0
+        for unit in reversed(units):
+            unit_tokens = count_tokens(unit) + 1
+            if carried_tokens + unit_tokens > self.overlap_tokens:
+                break
+            carried.insert(0, unit)
+            carried_tokens += unit_tokens
+        return carried, carried_tokens
 
 class ContentValidator:
+    MIN_WORDS = 10
+    
     @staticmethod
-    def validate_text_length(text, min_length=10):
+    def validate_text_length(text, min_length=MIN_WORDS, stats=None):
         """Validate that text is long enough to summarize"""
-        word_count = len(text.split())
+        word_count = stats.word_count if stats is not None else len(text.split())
         if word_count < min_length:
             raise ValueError(f"Text too short for summarization. Minimum {min_length} words required, got {word_count}.")
         return True
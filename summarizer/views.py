@@ -4,11 +4,23 @@ from django.shortcuts import render
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
 import json
 import logging
-from .serializers import WebhookSerializer, SummaryOptionsSerializer
-from .services import SummarizerService, QuickSummarizer
+from .serializers import BackgroundJobSerializer, WebhookSerializer, SummaryOptionsSerializer, BatchSummarizeSerializer
+from . import metrics
+from .cache import get_summary_cache
+from .jobs import enqueue_job, job_status
+from .models import SummaryJob
+from .neardup import get_near_duplicate_index
+from .offload import OffloadBusy
+from .prompt_registry import get_prompt_registry
+from .services import QuickSummarizer, get_summarizer_service, summary_kwargs
+from .uploads import TextUploadHandler, UploadError, UploadTooLarge, is_gzip, read_text_body
 from .utils import ContentValidator
 
 logger = logging.getLogger(__name__)
@@ -37,8 +49,18 @@ def telex_webhook(request):
                     "status": "success"
                 })
             
+            # Queue the work and acknowledge immediately if asked to
+            if serializer.validated_data['background']:
+                job = enqueue_job('webhook', {
+                    'message': message,
+                    'user_id': user_id,
+                    'conversation_id': conversation_id,
+                    'options': options,
+                }, callback_url=serializer.validated_data.get('callback_url'))
+                return Response(_job_accepted(request, job), status=status.HTTP_202_ACCEPTED)
+            
             # Process the message using our summarizer
-            summarizer = SummarizerService()
+            summarizer = get_summarizer_service()
             response = summarizer.process_telex_message(message, user_id, conversation_id, options)
             
             return Response({
@@ -83,22 +105,31 @@ def custom_summarize(request):
         
         options = options_serializer.validated_data
         
+        job_serializer = BackgroundJobSerializer(data=request.data)
+        if not job_serializer.is_valid():
+            return Response({
+                "error": "Invalid request data",
+                "details": job_serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if job_serializer.validated_data['background']:
+            job = enqueue_job('summarize', {
+                'text': text,
+                'options': dict(options),
+            }, callback_url=job_serializer.validated_data.get('callback_url'))
+            return Response(_job_accepted(request, job), status=status.HTTP_202_ACCEPTED)
+        
         # Generate summary with explicit parameters
-        summarizer = SummarizerService()
-        result = summarizer.generate_summary(
-            text, 
-            summary_type=options.get('summary_type', 'general'),
-            length=options.get('length', 'medium'),
-            include_bullet_points=options.get('include_bullet_points', True),
-            include_key_points=options.get('include_key_points', True),
-            language=options.get('language', 'english')
-        )
+        summarizer = get_summarizer_service()
+        result = summarizer.generate_summary(text, **summary_kwargs(options))
         
         return Response({
             "summary": result,
             "status": "success"
         })
         
+    except OffloadBusy as e:
+        return _busy(e)
     except Exception as e:
         logger.error(f"Error in custom summarization: {str(e)}")
         return Response({
@@ -106,16 +137,126 @@ def custom_summarize(request):
             "details": str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+@csrf_exempt
+@require_POST
+def upload_summarize(request):
+    """
+    Summarize a large text sent as the raw body (text/plain, optionally gzip)
+    or as the "file" field of a multipart upload; options come from the query string or form fields
+    """
+    max_bytes = settings.SUMMARIZER_UPLOAD_MAX_BYTES
+    try:
+        options_data = request.GET.dict()
+        
+        if request.content_type == 'multipart/form-data':
+            # Decode the file as it is parsed instead of spooling it to memory or disk first
+            handler = TextUploadHandler('file', max_bytes, request)
+            request.upload_handlers = [handler]
+            options_data.update(request.POST.dict())
+            text = handler.text
+        elif request.content_type.startswith('text/') or is_gzip(request.content_type):
+            # Refuse before reading anything when the declared size is already over the limit
+            if _content_length(request) > max_bytes:
+                raise UploadTooLarge(f"Uploaded text is larger than {max_bytes} bytes.")
+            text = read_text_body(request, max_bytes)
+        else:
+            return JsonResponse({
+                "error": "Unsupported content type",
+                "details": "Send text/plain, application/gzip or multipart/form-data with a \"file\" field"
+            }, status=415)
+        
+        if not text:
+            return JsonResponse({
+                "error": "No text provided"
+            }, status=400)
+        
+        options_serializer = SummaryOptionsSerializer(data=options_data)
+        if not options_serializer.is_valid():
+            return JsonResponse({
+                "error": "Invalid options",
+                "details": options_serializer.errors
+            }, status=400)
+        
+        options = options_serializer.validated_data
+        
+        summarizer = get_summarizer_service()
+        result = summarizer.generate_summary(text, **summary_kwargs(options))
+        
+        return JsonResponse({
+            "summary": result,
+            "status": "success"
+        })
+        
+    except UploadTooLarge as e:
+        return JsonResponse({
+            "error": "Upload too large",
+            "details": str(e)
+        }, status=413)
+    except UploadError as e:
+        return JsonResponse({
+            "error": "Invalid upload",
+            "details": str(e)
+        }, status=400)
+    except OffloadBusy as e:
+        return _busy(e)
+    except Exception as e:
+        logger.error(f"Error in upload summarization: {str(e)}")
+        return JsonResponse({
+            "error": "Error generating summary",
+            "details": str(e)
+        }, status=500)
+
+@api_view(['POST'])
+def batch_summarize(request):
+    """Summarize a list of texts concurrently; failures are reported per item"""
+    try:
+        serializer = BatchSummarizeSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                "error": "Invalid request data",
+                "details": serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        summarizer = get_summarizer_service()
+        batch = summarizer.summarize_batch(
+            data['items'],
+            user_id=data['user_id'],
+            conversation_id=data['conversation_id'],
+            concurrency=data.get('concurrency')
+        )
+        
+        return Response(dict(batch, status="success"))
+        
+    except Exception as e:
+        logger.error(f"Error in batch summarization: {str(e)}")
+        return Response({
+            "error": "Error generating batch summaries",
+            "details": str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
 @api_view(['GET'])
 def health_check(request):
     """Health check endpoint"""
+    cache = get_summary_cache()
+    near_duplicates = get_near_duplicate_index()
     return Response({
         "status": "healthy",
         "service": "Summarizer Agent",
         "version": "1.0.0",
-        "capabilities": ["general", "meeting", "news", "technical", "conversation", "log"]
+        "capabilities": get_prompt_registry().types(),
+        "cache": cache.stats() if cache is not None else None,
+        "near_duplicates": near_duplicates.stats() if near_duplicates is not None else None,
+        "metrics": metrics.registry.snapshot()
     })
 
+@require_GET
+def prometheus_metrics(request):
+    """Metrics in the Prometheus text format"""
+    if not settings.SUMMARIZER_METRICS:
+        return HttpResponse("Metrics are disabled\n", status=404, content_type='text/plain')
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @api_view(['POST'])
 def quick_summarize(request):
     """Quick summarization without AI"""
@@ -127,8 +268,14 @@ def quick_summarize(request):
                 "error": "No text provided"
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        method = request.data.get('method', 'extractive')
+        if method not in ('extractive', 'lead'):
+            return Response({
+                "error": "method must be 'extractive' or 'lead'"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         summarizer = QuickSummarizer()
-        summary = summarizer.create_bullet_summary(text)
+        summary = summarizer.create_bullet_summary(text, _max_bullets(request.data), method)
         
         return Response({
             "summary": summary,
@@ -142,6 +289,71 @@ def quick_summarize(request):
             "details": str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _max_bullets(data, default=5, limit=20):
+    """Bullet count requested for a quick summary, clamped to a sane range"""
+    try:
+        return min(max(int(data.get('max_bullets', default)), 1), limit)
+    except (TypeError, ValueError):
+        return default
+
+
+def _content_length(request):
+    """Declared body size, 0 when absent or malformed"""
+    try:
+        return max(0, int(request.META.get('CONTENT_LENGTH') or 0))
+    except ValueError:
+        return 0
+
+
+def _busy(error):
+    """503 for a request turned away because the preprocessing workers are saturated (also used by the async views)"""
+    response = JsonResponse({
+        "error": "Server busy",
+        "details": str(error)
+    }, status=503)
+    response['Retry-After'] = str(max(1, round(settings.SUMMARIZER_OFFLOAD_QUEUE_TIMEOUT)))
+    return response
+
+
+def _job_accepted(request, job):
+    """Acknowledgement body for a queued background job"""
+    return {
+        "status": "queued",
+        "job_id": job.request_id,
+        "status_url": request.build_absolute_uri(reverse('job-status', args=[job.request_id])),
+        "result_url": request.build_absolute_uri(reverse('job-result', args=[job.request_id])),
+    }
+
+@api_view(['GET'])
+def job_status_view(request, job_id):
+    """Status of a background summarization job"""
+    job = SummaryJob.objects.filter(request_id=job_id).first()
+    if job is None:
+        return Response({
+            "error": "Job not found"
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(job_status(job))
+
+@api_view(['GET'])
+def job_result_view(request, job_id):
+    """Result of a background summarization job (202 while it is still pending)"""
+    job = SummaryJob.objects.filter(request_id=job_id).first()
+    if job is None:
+        return Response({
+            "error": "Job not found"
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    if job.status == 'succeeded':
+        return Response(job.result)
+    if job.status == 'failed':
+        return Response({
+            "job_id": job.request_id,
+            "status": "failed",
+            "error": job.error
+        })
+    return Response(job_status(job), status=status.HTTP_202_ACCEPTED)
+
 def get_help_message():
     """Generate help message for users"""
     return """
@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -77,10 +77,19 @@ WSGI_APPLICATION = 'summarizer_agent.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite: WAL lets readers run alongside the writer; writers wait up to SQLITE_BUSY_TIMEOUT
+# seconds for the write lock instead of failing with "database is locked"
+SQLITE_WAL = config('SQLITE_WAL', default=False, cast=bool)
+SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=5, cast=int)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL' if SQLITE_WAL else '',
+        },
     }
 }
 
@@ -133,10 +142,152 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Point this at a shared backend (database, file, redis) so several workers share summaries
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='summarizer-agent'),
+    }
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # AI Configuration
-OPENAI_API_KEY = config('OPENAI_API_KEY', default='your-openai-api-key')
\ No newline at end of file
+OPENAI_API_KEY = config('OPENAI_API_KEY', default='your-openai-api-key')
+OPENAI_MODEL = config('OPENAI_MODEL', default='gpt-3.5-turbo')
+# Override to point at an OpenAI-compatible server (e.g. the benchmark stub)
+OPENAI_BASE_URL = config('OPENAI_BASE_URL', default=None)
+# Context window in tokens; 0 uses the known window of OPENAI_MODEL
+OPENAI_CONTEXT_TOKENS = config('OPENAI_CONTEXT_TOKENS', default=0, cast=int)
+# Pooled keep-alive connections held by the process-wide OpenAI clients
+OPENAI_POOL_SIZE = config('OPENAI_POOL_SIZE', default=20, cast=int)
+OPENAI_ASYNC_POOL_SIZE = config('OPENAI_ASYNC_POOL_SIZE', default=200, cast=int)
+OPENAI_KEEPALIVE_EXPIRY = config('OPENAI_KEEPALIVE_EXPIRY', default=30.0, cast=float)
+OPENAI_TIMEOUT = config('OPENAI_TIMEOUT', default=60.0, cast=float)
+OPENAI_CONNECT_TIMEOUT = config('OPENAI_CONNECT_TIMEOUT', default=5.0, cast=float)
+# Build the shared service and client in SummarizerConfig.ready() instead of on the first request
+SUMMARIZER_WARM_ON_STARTUP = config('SUMMARIZER_WARM_ON_STARTUP', default=False, cast=bool)
+
+# LLM backend: 'openai', or 'stub' (local, deterministic, no network) for load tests and CI
+SUMMARIZER_LLM_BACKEND = config('SUMMARIZER_LLM_BACKEND', default='openai')
+SUMMARIZER_STUB_LATENCY_MS = config('SUMMARIZER_STUB_LATENCY_MS', default=200.0, cast=float)
+# Spread of the log-normal latency around SUMMARIZER_STUB_LATENCY_MS (0 = constant)
+SUMMARIZER_STUB_LATENCY_SIGMA = config('SUMMARIZER_STUB_LATENCY_SIGMA', default=0.0, cast=float)
+# Share of calls failing with a rate-limit, server or connection error
+SUMMARIZER_STUB_ERROR_RATE = config('SUMMARIZER_STUB_ERROR_RATE', default=0.0, cast=float)
+SUMMARIZER_STUB_SEED = config('SUMMARIZER_STUB_SEED', default=0, cast=int)
+
+# Summary cache: 'locmem' (per-process LRU), 'django' (CACHES alias) or 'none'
+SUMMARIZER_CACHE_BACKEND = config('SUMMARIZER_CACHE_BACKEND', default='locmem')
+SUMMARIZER_CACHE_ALIAS = config('SUMMARIZER_CACHE_ALIAS', default='default')
+SUMMARIZER_CACHE_TTL = config('SUMMARIZER_CACHE_TTL', default=3600, cast=int)
+SUMMARIZER_CACHE_MAX_ENTRIES = config('SUMMARIZER_CACHE_MAX_ENTRIES', default=1024, cast=int)
+
+# Single-flight: identical concurrent requests share one LLM call (across processes with the 'django' cache backend)
+SUMMARIZER_SINGLEFLIGHT = config('SUMMARIZER_SINGLEFLIGHT', default=True, cast=bool)
+SUMMARIZER_SINGLEFLIGHT_TIMEOUT = config('SUMMARIZER_SINGLEFLIGHT_TIMEOUT', default=120, cast=int)
+
+# Prompt templates (built-ins plus active SummaryTemplate rows) are reloaded when a template is saved or deleted;
+# workers check the change stamp in the SUMMARIZER_CACHE_ALIAS cache at most every SUMMARIZER_TEMPLATE_REFRESH seconds
+SUMMARIZER_TEMPLATE_REFRESH = config('SUMMARIZER_TEMPLATE_REFRESH', default=5.0, cast=float)
+
+# Near-duplicate reuse: a text of SUMMARIZER_NEAR_DUPLICATE_MIN_WORDS to _MAX_WORDS words whose estimated Jaccard
+# similarity (5-word shingles, MinHash) to an earlier text with the same options reaches _THRESHOLD gets its summary.
+# Each worker indexes the newest _MAX_ENTRIES signatures and picks up those stored by others every _REFRESH seconds
+SUMMARIZER_NEAR_DUPLICATE = config('SUMMARIZER_NEAR_DUPLICATE', default=True, cast=bool)
+SUMMARIZER_NEAR_DUPLICATE_THRESHOLD = config('SUMMARIZER_NEAR_DUPLICATE_THRESHOLD', default=0.9, cast=float)
+SUMMARIZER_NEAR_DUPLICATE_MIN_WORDS = config('SUMMARIZER_NEAR_DUPLICATE_MIN_WORDS', default=50, cast=int)
+SUMMARIZER_NEAR_DUPLICATE_MAX_WORDS = config('SUMMARIZER_NEAR_DUPLICATE_MAX_WORDS', default=50000, cast=int)
+SUMMARIZER_NEAR_DUPLICATE_MAX_ENTRIES = config('SUMMARIZER_NEAR_DUPLICATE_MAX_ENTRIES', default=5000, cast=int)
+SUMMARIZER_NEAR_DUPLICATE_REFRESH = config('SUMMARIZER_NEAR_DUPLICATE_REFRESH', default=30.0, cast=float)
+
+# Per-stage timings and token, cache and error counters, served on /metrics; off makes instrumentation a no-op
+SUMMARIZER_METRICS = config('SUMMARIZER_METRICS', default=True, cast=bool)
+
+# Long-document map-reduce: documents above SUMMARIZER_LONG_DOCUMENT_TOKENS are split
+# into chunks of SUMMARIZER_CHUNK_TOKENS and summarized in parallel
+SUMMARIZER_LONG_DOCUMENT_TOKENS = config('SUMMARIZER_LONG_DOCUMENT_TOKENS', default=12000, cast=int)
+SUMMARIZER_CHUNK_TOKENS = config('SUMMARIZER_CHUNK_TOKENS', default=3000, cast=int)
+SUMMARIZER_CHUNK_OVERLAP_TOKENS = config('SUMMARIZER_CHUNK_OVERLAP_TOKENS', default=200, cast=int)
+SUMMARIZER_MAP_CONCURRENCY = config('SUMMARIZER_MAP_CONCURRENCY', default=4, cast=int)
+SUMMARIZER_MAX_REDUCE_DEPTH = config('SUMMARIZER_MAX_REDUCE_DEPTH', default=3, cast=int)
+
+# Answer with an extractive summary (marked degraded) when the LLM is unreachable or overloaded
+SUMMARIZER_EXTRACTIVE_FALLBACK = config('SUMMARIZER_EXTRACTIVE_FALLBACK', default=True, cast=bool)
+
+# LLM calls: seconds per attempt and in total (all calls and retries of one request),
+# attempts per call on 429/5xx/connection errors, and the jittered backoff between them
+SUMMARIZER_LLM_ATTEMPT_TIMEOUT = config('SUMMARIZER_LLM_ATTEMPT_TIMEOUT', default=30.0, cast=float)
+SUMMARIZER_LLM_DEADLINE = config('SUMMARIZER_LLM_DEADLINE', default=60.0, cast=float)
+SUMMARIZER_LLM_MAX_ATTEMPTS = config('SUMMARIZER_LLM_MAX_ATTEMPTS', default=3, cast=int)
+SUMMARIZER_LLM_BACKOFF_BASE = config('SUMMARIZER_LLM_BACKOFF_BASE', default=0.5, cast=float)
+SUMMARIZER_LLM_BACKOFF_MAX = config('SUMMARIZER_LLM_BACKOFF_MAX', default=8.0, cast=float)
+# Circuit breaker: open after this many consecutive failures, try again after the cooldown (seconds)
+SUMMARIZER_BREAKER_FAILURES = config('SUMMARIZER_BREAKER_FAILURES', default=5, cast=int)
+SUMMARIZER_BREAKER_COOLDOWN = config('SUMMARIZER_BREAKER_COOLDOWN', default=30.0, cast=float)
+
+# Limits of the shared OpenAI account (0 = none), enforced across workers through the SUMMARIZER_CACHE_ALIAS cache.
+# That only coordinates processes when the alias is a shared backend (Redis, Memcached, database): LocMemCache,
+# the default above, is per-process, so every worker would get the whole limit to itself.
+# Batch work (/summarize/batch, background jobs) may use SUMMARIZER_RATE_LIMIT_BATCH_SHARE of them;
+# a call waits at most SUMMARIZER_RATE_LIMIT_MAX_WAIT seconds for capacity
+OPENAI_REQUESTS_PER_MINUTE = config('OPENAI_REQUESTS_PER_MINUTE', default=0, cast=int)
+OPENAI_TOKENS_PER_MINUTE = config('OPENAI_TOKENS_PER_MINUTE', default=0, cast=int)
+SUMMARIZER_RATE_LIMIT_BATCH_SHARE = config('SUMMARIZER_RATE_LIMIT_BATCH_SHARE', default=0.8, cast=float)
+SUMMARIZER_RATE_LIMIT_MAX_WAIT = config('SUMMARIZER_RATE_LIMIT_MAX_WAIT', default=30.0, cast=float)
+
+# Saving SummaryRequest rows: 'sync' (on the request path) or 'write_behind' (buffered, written by a
+# background thread in bulk every SUMMARIZER_PERSIST_FLUSH_INTERVAL seconds or SUMMARIZER_PERSIST_BATCH_SIZE rows).
+# Write-behind loses at most that window of rows if the process is killed; a normal shutdown flushes
+SUMMARIZER_PERSISTENCE = config('SUMMARIZER_PERSISTENCE', default='sync')
+SUMMARIZER_PERSIST_BATCH_SIZE = config('SUMMARIZER_PERSIST_BATCH_SIZE', default=100, cast=int)
+SUMMARIZER_PERSIST_FLUSH_INTERVAL = config('SUMMARIZER_PERSIST_FLUSH_INTERVAL', default=1.0, cast=float)
+SUMMARIZER_PERSIST_MAX_BUFFER = config('SUMMARIZER_PERSIST_MAX_BUFFER', default=10000, cast=int)
+
+# How SummaryRequest.original_text is kept: plain, compressed (zlib) or hash (sha256 only);
+# prune_summary_requests deletes or archives rows older than SUMMARIZER_RETENTION_DAYS (0 keeps them forever)
+SUMMARIZER_ORIGINAL_TEXT_STORAGE = config('SUMMARIZER_ORIGINAL_TEXT_STORAGE', default='plain')
+SUMMARIZER_RETENTION_DAYS = config('SUMMARIZER_RETENTION_DAYS', default=90, cast=int)
+
+# Incremental conversation summaries (`"incremental": true` in /webhook options): most recent
+# stored messages read when a conversation is summarized for the first time or catches up
+SUMMARIZER_CONVERSATION_HISTORY_LIMIT = config('SUMMARIZER_CONVERSATION_HISTORY_LIMIT', default=200, cast=int)
+
+# Inputs of at least SUMMARIZER_OFFLOAD_MIN_CHARS characters are cleaned and counted in a pool of
+# SUMMARIZER_OFFLOAD_WORKERS processes (0 = always inline). Up to SUMMARIZER_OFFLOAD_MAX_QUEUE more wait for a
+# worker; beyond that a request waits SUMMARIZER_OFFLOAD_QUEUE_TIMEOUT seconds for room and is then rejected (503)
+SUMMARIZER_OFFLOAD_WORKERS = config('SUMMARIZER_OFFLOAD_WORKERS', default=2, cast=int)
+SUMMARIZER_OFFLOAD_MIN_CHARS = config('SUMMARIZER_OFFLOAD_MIN_CHARS', default=1000000, cast=int)
+SUMMARIZER_OFFLOAD_MAX_QUEUE = config('SUMMARIZER_OFFLOAD_MAX_QUEUE', default=2, cast=int)
+SUMMARIZER_OFFLOAD_QUEUE_TIMEOUT = config('SUMMARIZER_OFFLOAD_QUEUE_TIMEOUT', default=5.0, cast=float)
+
+# Background jobs (`background: true` on /webhook and /summarize, processed by run_summary_worker)
+SUMMARIZER_WORKER_CONCURRENCY = config('SUMMARIZER_WORKER_CONCURRENCY', default=4, cast=int)
+SUMMARIZER_JOB_MAX_ATTEMPTS = config('SUMMARIZER_JOB_MAX_ATTEMPTS', default=3, cast=int)
+SUMMARIZER_JOB_VISIBILITY_TIMEOUT = config('SUMMARIZER_JOB_VISIBILITY_TIMEOUT', default=300, cast=int)
+SUMMARIZER_JOB_BACKOFF_BASE = config('SUMMARIZER_JOB_BACKOFF_BASE', default=5.0, cast=float)
+SUMMARIZER_JOB_BACKOFF_MAX = config('SUMMARIZER_JOB_BACKOFF_MAX', default=300.0, cast=float)
+SUMMARIZER_JOB_CALLBACK_TIMEOUT = config('SUMMARIZER_JOB_CALLBACK_TIMEOUT', default=10.0, cast=float)
+# Hosts callback_url may point at (comma-separated; '.example.com' matches subdomains). When empty, any host
+# is accepted unless it resolves to a private, loopback, link-local or otherwise non-public address
+SUMMARIZER_JOB_CALLBACK_ALLOWED_HOSTS = config('SUMMARIZER_JOB_CALLBACK_ALLOWED_HOSTS', default='', cast=Csv())
+
+# 'log' summaries of at least SUMMARIZER_LOG_DIGEST_MIN_LINES lines are sent to the LLM as a digest
+# (templates with counts, samples and error bursts, at most SUMMARIZER_LOG_DIGEST_MAX_TEMPLATES templates)
+SUMMARIZER_LOG_DIGEST = config('SUMMARIZER_LOG_DIGEST', default=True, cast=bool)
+SUMMARIZER_LOG_DIGEST_MIN_LINES = config('SUMMARIZER_LOG_DIGEST_MIN_LINES', default=50, cast=int)
+SUMMARIZER_LOG_DIGEST_MAX_TEMPLATES = config('SUMMARIZER_LOG_DIGEST_MAX_TEMPLATES', default=40, cast=int)
+
+# Largest text accepted by /summarize/upload, in bytes after gzip decompression
+SUMMARIZER_UPLOAD_MAX_BYTES = config('SUMMARIZER_UPLOAD_MAX_BYTES', default=20 * 1024 * 1024, cast=int)
+
+# Batch summarization (/summarize/batch); 0 disables the token-per-minute budget
+SUMMARIZER_BATCH_MAX_ITEMS = config('SUMMARIZER_BATCH_MAX_ITEMS', default=500, cast=int)
+SUMMARIZER_BATCH_CONCURRENCY = config('SUMMARIZER_BATCH_CONCURRENCY', default=8, cast=int)
+SUMMARIZER_BATCH_TOKENS_PER_MINUTE = config('SUMMARIZER_BATCH_TOKENS_PER_MINUTE', default=0, cast=int)